@@ -3,10 +3,11 @@ Button
 
 Description:
 """
-import pygame, pygame.freetype, time
+import pygame, pygame.freetype
+import timers
 
 class Button:
-    def __init__(self, rect, label, callback=None, border_color=(160,160,160)):
+    def __init__(self, rect, label, callback=None, border_color=(160,160,160), scheduler=None):
         if isinstance(rect, pygame.Rect):
             self.rect = rect
         else:
@@ -15,13 +16,35 @@ class Button:
         self.callback = callback
         self.hovered = False
         self.pressed = False
-        self.last_pressed_time = 0
+        self.flashing = False
         self.flash_duration = 0.03
+        self.flash_timer = None
+        self.scheduler = scheduler if scheduler is not None else timers.scheduler
         self.border_color = border_color
 
-    def update_hover(self):
-        mx, my = pygame.mouse.get_pos()
-        self.hovered = self.rect.collidepoint(mx, my)
+    # --- Pooling (see widgetpool.py) ---
+    def reset(self, rect, label, callback=None, border_color=(160,160,160), scheduler=None):
+        self.stop_timers()
+        self.rect = pygame.Rect(rect)
+        self.label = label
+        self.callback = callback
+        self.hovered = self.pressed = self.flashing = False
+        self.scheduler = scheduler if scheduler is not None else timers.scheduler
+        self.border_color = border_color
+
+    # --- Timers ---
+    def stop_timers(self):
+        if self.flash_timer is not None:
+            self.flash_timer.cancel()
+            self.flash_timer = None
+        self.flashing = False
+
+    # --- Compositing (see compositor.py) ---
+    def layer_state(self):
+        return (self.label, self.pressed, self.flashing, self.hovered)
+
+    def layer_rect(self, font):
+        return self.rect
 
     def draw(self, screen, font):
         base_bg = (239,239,239)
@@ -29,10 +52,9 @@ class Button:
         highlight = (229,229,229)
         text_color = (0, 0, 0)
 
-        now = time.time()
         if self.pressed:
             bg = shadow
-        elif now - self.last_pressed_time < self.flash_duration:
+        elif self.flashing:
             bg = shadow
         elif self.hovered:
             bg = highlight
@@ -54,10 +76,21 @@ class Button:
         font.fgcolor = old_color
 
     def handle_event(self, event):
-        if event.type == pygame.MOUSEBUTTONDOWN and event.button == 1:
+        # Hover follows the pointer's events, not a poll every frame
+        if event.type == pygame.MOUSEMOTION:
+            self.hovered = self.rect.collidepoint(event.pos)
+        elif event.type == pygame.MOUSEBUTTONDOWN and event.button == 1:
+            self.hovered = self.rect.collidepoint(event.pos)
             if self.hovered:
                 self.pressed = True
         elif event.type == pygame.MOUSEBUTTONUP and event.button == 1:
             if self.pressed:
-                self.last_pressed_time = time.time()
+                self.flashing = True
+                if self.flash_timer is not None:
+                    self.flash_timer.cancel()
+                self.flash_timer = self.scheduler.call_later(self.flash_duration, self.end_flash)
             self.pressed = False
+
+    def end_flash(self):
+        self.flash_timer = None
+        self.flashing = False
@@ -8,17 +8,23 @@ picker to an exact colour by typing the RGB colour code into the input
 boxes.
 """
 import pygame, pygame.freetype, colorsys
+from collections import OrderedDict
 from Input import Input
+from fonts import get_font
+from diskcache import disk_cache
+
+GRADIENT_CACHE_SIZE = 16
+GRADIENT_VERSION = 1  # disk cache entries (see diskcache.py) of an older painting miss
+
+# (size, hue) -> painted saturation/value square, shared by every picker
+# and kept in the disk cache; painting one pixel by pixel takes tens of
+# milliseconds
+_gradients = OrderedDict()
 
 class ColorPicker:
-    def __init__(self, rect: pygame.Rect):
+    def __init__(self, rect: pygame.Rect, scheduler=None):
         # Position and size
-        self.PICKER_X, self.PICKER_Y = rect.x, rect.y
-        self.PICKER_SIZE = rect.width  # assume square picker
-        self.SLIDER_X, self.SLIDER_Y = self.PICKER_X, self.PICKER_Y + self.PICKER_SIZE + 20
-        self.SLIDER_W, self.SLIDER_H = self.PICKER_SIZE, 20
-        self.PREVIEW_X, self.PREVIEW_Y = self.PICKER_X + self.PICKER_SIZE + 30, self.PICKER_Y
-        self.RGB_X, self.RGB_Y = self.PREVIEW_X, self.PREVIEW_Y + 100
+        self.place(rect)
 
         # Color state
         self.current_hue = 0.0
@@ -28,11 +34,11 @@ class ColorPicker:
         # Surfaces
         self.picker_surface = pygame.Surface((self.PICKER_SIZE, self.PICKER_SIZE))
         self.slider_surface = pygame.Surface((self.SLIDER_W, self.SLIDER_H))
-        self.font = pygame.freetype.SysFont("Arial", 20)
+        self.font = get_font("Arial", 20)
         self.last_hue = -1
 
         # Input boxes for RGB
-        self.input_boxes = [Input(pygame.Rect(self.RGB_X, self.RGB_Y + i*40, 80, 30), str(c))
+        self.input_boxes = [Input(pygame.Rect(self.RGB_X, self.RGB_Y + i*40, 80, 30), str(c), scheduler=scheduler)
                             for i, c in enumerate(self.selected_color)]
 
         # Drag flags
@@ -44,11 +50,65 @@ class ColorPicker:
         self.render_slider()
         self.update_inputs_from_color()
 
+    def place(self, rect):
+        self.rect = pygame.Rect(rect)
+        self.PICKER_X, self.PICKER_Y = self.rect.x, self.rect.y
+        self.PICKER_SIZE = self.rect.width  # assume square picker
+        self.SLIDER_X, self.SLIDER_Y = self.PICKER_X, self.PICKER_Y + self.PICKER_SIZE + 20
+        self.SLIDER_W, self.SLIDER_H = self.PICKER_SIZE, 20
+        self.PREVIEW_X, self.PREVIEW_Y = self.PICKER_X + self.PICKER_SIZE + 30, self.PICKER_Y
+        self.RGB_X, self.RGB_Y = self.PREVIEW_X, self.PREVIEW_Y + 100
+
+    # --- Pooling (see widgetpool.py) ---
+    def reset(self, rect, scheduler=None):
+        """Start over at rect. The painted picker and slider are kept if the size is the same."""
+        size = self.PICKER_SIZE
+        self.place(rect)
+        self.current_hue = 0.0
+        self.selected_color = [255, 0, 0]
+        self.selected_pos = (self.PICKER_X, self.PICKER_Y)
+        if self.PICKER_SIZE != size:
+            self.picker_surface = pygame.Surface((self.PICKER_SIZE, self.PICKER_SIZE))
+            self.slider_surface = pygame.Surface((self.SLIDER_W, self.SLIDER_H))
+            self.last_hue = -1
+            self.render_slider()
+        for i, (box, c) in enumerate(zip(self.input_boxes, self.selected_color)):
+            box.reset(pygame.Rect(self.RGB_X, self.RGB_Y + i*40, 80, 30), str(c), scheduler=scheduler)
+        self.dragging_picker = False
+        self.dragging_slider = False
+        self.render_picker(self.current_hue)  # nothing to do if it shows hue 0 already
+        self.update_inputs_from_color()
+
+    def stop_timers(self):
+        """Cancel the RGB boxes' blink and key repeat timers."""
+        for box in self.input_boxes:
+            box.stop_timers()
+
     # --- Core functions ---
     def render_picker(self, hue):
         if hue == self.last_hue:
             return
         self.last_hue = hue
+        key = (self.PICKER_SIZE, hue)
+        gradient = _gradients.get(key)
+        if gradient is not None:
+            _gradients.move_to_end(key)
+            self.picker_surface.blit(gradient, (0, 0))
+            return
+        # Painted by an earlier launch?
+        disk_key = disk_cache.key("gradient", GRADIENT_VERSION, self.PICKER_SIZE, hue)
+        pixels = disk_cache.get(disk_key)
+        size = (self.PICKER_SIZE, self.PICKER_SIZE)
+        if pixels is not None and len(pixels) == size[0] * size[1] * 3:
+            self.picker_surface.blit(pygame.image.frombuffer(pixels, size, "RGB"), (0, 0))
+        else:
+            self.paint_picker(hue)
+            disk_cache.put(disk_key, pygame.image.tostring(self.picker_surface, "RGB"))
+        _gradients[key] = self.picker_surface.copy()
+        if len(_gradients) > GRADIENT_CACHE_SIZE:
+            _gradients.popitem(last=False)
+
+    def paint_picker(self, hue):
         block = 1  # 1x1 pixel blocks
         for y in range(self.PICKER_SIZE):
             v = 1 - y / self.PICKER_SIZE
@@ -83,6 +143,29 @@ class ColorPicker:
         self.render_picker(self.current_hue)
         self.selected_pos = (self.PICKER_X + int(s*self.PICKER_SIZE), self.PICKER_Y + int((1-v)*self.PICKER_SIZE))
 
+    def move(self, dx, dy):
+        """Shift the whole widget (picker, slider, preview and RGB boxes)."""
+        self.rect.move_ip(dx, dy)
+        self.PICKER_X += dx; self.PICKER_Y += dy
+        self.SLIDER_X += dx; self.SLIDER_Y += dy
+        self.PREVIEW_X += dx; self.PREVIEW_Y += dy
+        self.RGB_X += dx; self.RGB_Y += dy
+        self.selected_pos = (self.selected_pos[0] + dx, self.selected_pos[1] + dy)
+        for box in self.input_boxes:
+            box.rect = box.rect.move(dx, dy)
+
+    # --- Compositing (see compositor.py) ---
+    def layer_state(self):
+        return (tuple(self.selected_color), self.selected_pos, self.current_hue,
+                tuple(box.layer_state() for box in self.input_boxes))
+
+    def layer_rect(self, font=None):
+        """Picker (with the selection ring at its edges), hue slider, preview and RGB boxes."""
+        picker = pygame.Rect(self.PICKER_X, self.PICKER_Y, self.PICKER_SIZE, self.PICKER_SIZE).inflate(14, 14)
+        slider = pygame.Rect(self.SLIDER_X - 2, self.SLIDER_Y, self.SLIDER_W + 4, self.SLIDER_H)
+        preview = pygame.Rect(self.PREVIEW_X, self.PREVIEW_Y, 60, 60)
+        return picker.unionall([slider, preview] + [box.rect for box in self.input_boxes])
+
     # --- Public draw method ---
     def draw(self, screen, font=None):
         if font:
@@ -123,10 +206,10 @@ class ColorPicker:
         for box in self.input_boxes:
             box.handle_event(event)
 
-    # --- Update ---
-    def update(self, dt):
-        for box in self.input_boxes:
-            box.update(dt)
+        self.sync_inputs()
+
+    # --- Sync the RGB boxes with the selected color ---
+    def sync_inputs(self):
         if any(box.focused for box in self.input_boxes):
             try:
                 self.selected_color = [max(0,min(255,int(box.text))) for box in self.input_boxes]
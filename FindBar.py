@@ -0,0 +1,126 @@
+"""
+FindBar
+
+Description:
+Ctrl+F find-in-page box. Searches the active tab's document text index
+(see textindex.py) as the query is typed, highlights the matches that
+are in the viewport and scrolls to the selected one. Enter / Shift+Enter
+jump to the next / previous match, Escape closes the bar.
+"""
+import pygame
+from Input import Input
+from textindex import FindSession
+
+MATCH_COLOR = (255, 230, 0, 110)
+CURRENT_COLOR = (255, 140, 0, 150)
+
+class FindBar:
+    def __init__(self, tab, rect=None):
+        screen_w = pygame.display.get_surface().get_width()
+        self.rect = pygame.Rect(rect) if rect else pygame.Rect(screen_w - 430, 10, 410, 40)
+        self.tab = tab
+        self.session = FindSession(tab.dom.text_index())
+        self.input = Input(pygame.Rect(self.rect.x + 5, self.rect.y + 5, 280, 30),
+                           scheduler=tab.scheduler)
+        self.input.set_focused(True)
+        self.highlight = pygame.Surface((1, 1), pygame.SRCALPHA)
+        self.closed = False
+
+    def close(self):
+        self.input.stop_timers()
+        self.closed = True
+
+    # --- Searching ---
+    def sync(self):
+        """Search again if the query or the document changed. Returns True if it did."""
+        version = self.session.version
+        self.session.refresh()
+        if self.input.text != self.session.query:
+            self.session.search(self.input.text)
+            self.reveal()
+            return True
+        return version != self.session.version
+
+    def step(self, direction):
+        self.sync()
+        self.session.step(direction)
+        self.reveal()
+
+    def reveal(self):
+        """Scroll the tab so the current match is on screen."""
+        match = self.session.current_match()
+        display_list = self.tab.display_list
+        if match is None or display_list is None:
+            return
+        run, start = match
+        items = [item for item in display_list.text_for(run) if item[2][4][1] <= start]
+        if not items:
+            return  # hidden text has no layout
+        # The display list is in document coordinates
+        bounds = items[-1][1]
+        on_screen = bounds.move(0, -self.tab.scroll_y)
+        screen_h = pygame.display.get_surface().get_height()
+        if on_screen.top < self.rect.bottom or on_screen.bottom > screen_h:
+            self.tab.scroll_to(bounds.top - screen_h // 3)
+
+    # --- Events ---
+    def handle_event(self, event):
+        """Handle keyboard input. Returns True if the event was consumed."""
+        if event.type == pygame.KEYDOWN:
+            if event.key == pygame.K_ESCAPE:
+                self.close()
+            elif event.key == pygame.K_RETURN:
+                self.step(-1 if event.mod & pygame.KMOD_SHIFT else 1)
+            else:
+                self.input.handle_event(event)
+                self.sync()
+            return True
+        if event.type == pygame.KEYUP:
+            self.input.handle_event(event)
+            return True
+        return False
+
+    # --- Drawing ---
+    def draw_highlights(self, screen, display_list, scroll=0):
+        """Tint every match in the visible text lines. scroll: document y at the top of screen."""
+        needle = self.session.query.lower()
+        if not needle or display_list is None:
+            return
+        current = self.session.current_match()
+        for kind, bounds, args in display_list.items_in(screen.get_rect().move(0, scroll)):
+            if kind != "text" or args[4] is None:
+                continue
+            font, (x, y), line, _, (run, offset) = args
+            folded = line.lower()
+            if len(folded) != len(line):
+                continue
+            pos = folded.find(needle)
+            while pos != -1:
+                left = x + font.get_rect(line[:pos]).width if pos else x
+                width = font.get_rect(line[pos:pos + len(needle)]).width
+                is_current = current == (run, offset + pos)
+                self.tint(screen, (left, y - scroll, width, bounds.height),
+                          CURRENT_COLOR if is_current else MATCH_COLOR)
+                pos = folded.find(needle, pos + len(needle))
+
+    def tint(self, screen, rect, color):
+        rect = pygame.Rect(rect)
+        if self.highlight.get_size() != rect.size:
+            self.highlight = pygame.Surface(rect.size, pygame.SRCALPHA)
+        self.highlight.fill(color)
+        screen.blit(self.highlight, rect)
+
+    def draw(self, screen, font):
+        pygame.draw.rect(screen, (245, 245, 245), self.rect)
+        pygame.draw.rect(screen, (160, 160, 160), self.rect, 1)
+        self.input.draw(screen, font)
+
+        session = self.session
+        if session.query:
+            total = f"{len(session.matches)}{'+' if session.truncated else ''}"
+            status = f"{session.current + 1}/{total}" if session.matches else "No matches"
+        else:
+            status = "Find in page"
+        status_rect = font.get_rect(status)
+        font.render_to(screen, (self.input.rect.right + 10,
+                                self.rect.centery - status_rect.height // 2), status, fgcolor=(80, 80, 80))
@@ -4,9 +4,10 @@ input
 Description:
 """
 import pygame, pygame.freetype
+import timers
 
 class Input:
-    def __init__(self, rect, text=""):
+    def __init__(self, rect, text="", scheduler=None):
         if isinstance(rect, pygame.Rect):
             self.rect = rect
         else:
@@ -16,19 +17,22 @@ class Input:
         self.cursor_pos = len(text)
         self.focused = False
         self.cursor_visible = True
-        self.cursor_timer = 0
         self.cursor_blink_speed = 0.5
 
+        # Timers (blink and key repeat) only exist while they're needed
+        self.scheduler = scheduler if scheduler is not None else timers.scheduler
+        self.blink_timer = None
+
         # Backspace repeat
         self.backspace_held = False
-        self.backspace_timer = 0
+        self.backspace_timer = None
         self.backspace_initial_delay = 0.5
         self.backspace_repeat_delay = 0.05
 
         # Arrow keys repeat
         self.left_held = False
         self.right_held = False
-        self.arrow_timer = 0
+        self.arrow_timer = None
         self.arrow_initial_delay = 0.3
         self.arrow_repeat_delay = 0.05
 
@@ -39,42 +43,81 @@ class Input:
         # Shift tracking
         self.shift_held = False
 
-    def update(self, dt):
-        # Cursor blink
-        self.cursor_timer += dt
-        if self.cursor_timer > self.cursor_blink_speed:
-            self.cursor_visible = not self.cursor_visible
-            self.cursor_timer = 0
+    # --- Pooling (see widgetpool.py) ---
+    def reset(self, rect, text="", scheduler=None):
+        """Start over at rect with text, as if just built."""
+        self.stop_timers()
+        self.rect = pygame.Rect(rect)
+        self.text = text
+        self.cursor_pos = len(text)
+        self.focused = False
+        self.cursor_visible = True
+        self.scheduler = scheduler if scheduler is not None else timers.scheduler
+        self.selection_start = self.selection_end = None
+        self.shift_held = False
 
-        # Backspace repeat
-        if self.backspace_held:
-            self.backspace_timer += dt
-            if self.backspace_timer >= self.backspace_repeat_delay:
-                if self.selection_start is not None:
-                    self.text = self.text[:self.selection_start] + self.text[self.selection_end:]
-                    self.cursor_pos = self.selection_start
-                    self.selection_start = self.selection_end = None
-                elif self.cursor_pos > 0:
-                    self.text = self.text[:self.cursor_pos-1] + self.text[self.cursor_pos:]
-                    self.cursor_pos -= 1
-                self.backspace_timer = 0
+    # --- Timers ---
+    def set_focused(self, focused):
+        if focused == self.focused:
+            return
+        self.focused = focused
+        if focused:
+            self.cursor_visible = True
+            self.blink_timer = self.scheduler.call_every(self.cursor_blink_speed, self.blink)
+        else:
+            self.stop_timers()
 
-        # Arrow key repeat
-        if self.left_held or self.right_held:
-            self.arrow_timer += dt
-            if self.arrow_timer >= self.arrow_repeat_delay:
-                if self.left_held and self.cursor_pos > 0:
-                    self.cursor_pos -= 1
-                if self.right_held and self.cursor_pos < len(self.text):
-                    self.cursor_pos += 1
-                self.arrow_timer = 0
+    def stop_timers(self):
+        for timer in (self.blink_timer, self.backspace_timer, self.arrow_timer):
+            if timer is not None:
+                timer.cancel()
+        self.blink_timer = self.backspace_timer = self.arrow_timer = None
+        self.backspace_held = self.left_held = self.right_held = False
+
+    def blink(self):
+        self.cursor_visible = not self.cursor_visible
+
+    def repeat_backspace(self):
+        self.delete_backward()
+
+    def repeat_arrow(self):
+        if self.left_held and self.cursor_pos > 0:
+            self.cursor_pos -= 1
+        if self.right_held and self.cursor_pos < len(self.text):
+            self.cursor_pos += 1
+
+    def cancel_backspace_repeat(self):
+        self.backspace_held = False
+        if self.backspace_timer is not None:
+            self.backspace_timer.cancel()
+            self.backspace_timer = None
+
+    def cancel_arrow_repeat(self):
+        if self.arrow_timer is not None:
+            self.arrow_timer.cancel()
+            self.arrow_timer = None
+
+    def start_arrow_repeat(self):
+        self.cancel_arrow_repeat()
+        self.arrow_timer = self.scheduler.call_later(
+            self.arrow_initial_delay, self.repeat_arrow, self.arrow_repeat_delay)
+
+    # --- Editing ---
+    def delete_backward(self):
+        if self.selection_start is not None:
+            self.text = self.text[:self.selection_start] + self.text[self.selection_end:]
+            self.cursor_pos = self.selection_start
+            self.selection_start = self.selection_end = None
+        elif self.cursor_pos > 0:
+            self.text = self.text[:self.cursor_pos-1] + self.text[self.cursor_pos:]
+            self.cursor_pos -= 1
 
     def handle_event(self, event):
         mods = pygame.key.get_mods()
         ctrl_held = mods & (pygame.KMOD_LCTRL | pygame.KMOD_RCTRL)
 
         if event.type == pygame.MOUSEBUTTONDOWN and event.button == 1:
-            self.focused = self.rect.collidepoint(event.pos)
+            self.set_focused(self.rect.collidepoint(event.pos))
 
         elif event.type == pygame.KEYDOWN and self.focused:
             # Track shift
@@ -83,15 +126,11 @@ class Input:
 
             # Backspace
             elif event.key == pygame.K_BACKSPACE:
-                if self.selection_start is not None:
-                    self.text = self.text[:self.selection_start] + self.text[self.selection_end:]
-                    self.cursor_pos = self.selection_start
-                    self.selection_start = self.selection_end = None
-                elif self.cursor_pos > 0:
-                    self.text = self.text[:self.cursor_pos-1] + self.text[self.cursor_pos:]
-                    self.cursor_pos -= 1
+                self.delete_backward()
+                self.cancel_backspace_repeat()
                 self.backspace_held = True
-                self.backspace_timer = -self.backspace_initial_delay
+                self.backspace_timer = self.scheduler.call_later(
+                    self.backspace_initial_delay, self.repeat_backspace, self.backspace_repeat_delay)
 
             # Arrow keys
             elif event.key == pygame.K_LEFT:
@@ -99,14 +138,14 @@ class Input:
                     self.cursor_pos -= 1
                 self.selection_start = self.selection_end = None
                 self.left_held = True
-                self.arrow_timer = -self.arrow_initial_delay
+                self.start_arrow_repeat()
 
             elif event.key == pygame.K_RIGHT:
                 if self.cursor_pos < len(self.text):
                     self.cursor_pos += 1
                 self.selection_start = self.selection_end = None
                 self.right_held = True
-                self.arrow_timer = -self.arrow_initial_delay
+                self.start_arrow_repeat()
 
             elif event.key == pygame.K_UP:
                 self.cursor_pos = 0
@@ -162,19 +201,25 @@ class Input:
         # Special Keys
         elif event.type == pygame.KEYUP:
             if event.key == pygame.K_BACKSPACE:
-                self.backspace_held = False
-                self.backspace_timer = 0
+                self.cancel_backspace_repeat()
             elif event.key == pygame.K_LEFT:
                 self.left_held = False
-                self.arrow_timer = 0
+                if not self.right_held:
+                    self.cancel_arrow_repeat()
             elif event.key == pygame.K_RIGHT:
                 self.right_held = False
-                self.arrow_timer = 0
+                if not self.left_held:
+                    self.cancel_arrow_repeat()
             elif event.key in (pygame.K_LSHIFT, pygame.K_RSHIFT):
                 self.shift_held = False
 
-    def update_hover(self):
-        pass
+    # --- Compositing (see compositor.py) ---
+    def layer_state(self):
+        return (self.text, self.cursor_pos, self.focused and self.cursor_visible,
+                self.selection_start, self.selection_end)
+
+    def layer_rect(self, font):
+        return self.rect
 
     def draw(self, screen, font):
         # Draw input box
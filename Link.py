@@ -3,54 +3,108 @@ Link
 
 Description:
 Represents a clickable hyperlink in the DOM tree.
-For this browser, <a href="..."> always points to a local file.
+For this browser, <a href="..."> points to a local file or an http:// URL.
 When clicked, the file is opened and its contents can be re-rendered.
 """
 import pygame
-pygame.init()
+from network import resolve
+from resources import resources, URGENT
+
+MAX_TEXT_WIDTHS = 64  # measured widths a recycled link keeps
 
 class Link:
-    def __init__(self, rect, text, href="", callback=None):
+    def __init__(self, rect, text, href="", callback=None, paint=True, base_url=None):
+        """
+        paint: False when the page already draws the text and the link only handles clicks
+        base_url: URL of the downloaded document the link is on, that href is relative to
+        """
         # rect can be tuple or pygame.Rect
         self.rect = pygame.Rect(*rect) if not isinstance(rect, pygame.Rect) else rect
         self.text = text
         self.href = href.strip()
+        self.base_url = base_url
         self.callback = callback or self.open_file  # default to open file
+        self.paint = paint
+        # (rect, text) per wrapped line; rect stays the union of them
+        self.fragments = [(self.rect.copy(), text)]
+        self.text_widths = {}  # (font, text) -> width, so drawing doesn't re-measure
+
+    # --- Pooling (see widgetpool.py) ---
+    def reset(self, rect, text, href="", callback=None, paint=True, base_url=None):
+        """Start over as a new link. Measured widths are kept: pages reuse fonts and words."""
+        self.rect = pygame.Rect(rect)
+        self.text = text
+        self.href = href.strip()
+        self.base_url = base_url
+        self.callback = callback or self.open_file
+        self.paint = paint
+        self.fragments = [(self.rect.copy(), text)]
+        if len(self.text_widths) > MAX_TEXT_WIDTHS:
+            self.text_widths.clear()
+
+    def set_fragments(self, fragments):
+        """Use one hit box per line fragment of a wrapped link."""
+        self.fragments = [(pygame.Rect(rect), text) for rect, text in fragments]
+        self.rect = self.fragments[0][0].unionall([rect for rect, _ in self.fragments[1:]])
+
+    def move(self, dx, dy):
+        self.rect = self.rect.move(dx, dy)
+        self.fragments = [(rect.move(dx, dy), text) for rect, text in self.fragments]
+
+    # --- Compositing (see compositor.py) ---
+    def layer_state(self):
+        return (self.paint, self.text)
+
+    def layer_rect(self, font):
+        # Links the page paints have nothing to draw on top of it
+        return self.rect if self.paint else pygame.Rect(self.rect.topleft, (0, 0))
 
     def draw(self, screen, font):
         """Draws the link text in blue and underlined."""
+        if not self.paint:
+            return
         font.fgcolor = (0, 0, 255)
-        font.render_to(screen, (self.rect.x, self.rect.y), self.text)
-
-        # underline
-        text_rect = font.get_rect(self.text)
-        underline_y = self.rect.y + text_rect.height - 2
-        pygame.draw.line(
-            screen,
-            (0, 0, 255),
-            (self.rect.x, underline_y),
-            (self.rect.x + text_rect.width, underline_y),
-            1
-        )
+        for rect, text in self.fragments:
+            font.render_to(screen, (rect.x, rect.y), text)
+
+            # underline
+            size = self.text_widths.get((font, text))
+            if size is None:
+                text_rect = font.get_rect(text)
+                size = self.text_widths[(font, text)] = (text_rect.width, text_rect.height)
+            underline_y = rect.y + size[1] - 2
+            pygame.draw.line(
+                screen,
+                (0, 0, 255),
+                (rect.x, underline_y),
+                (rect.x + size[0], underline_y),
+                1
+            )
 
     def check_click(self, mouse_pos):
         """If the link is clicked, trigger its callback."""
-        if self.rect.collidepoint(mouse_pos):
+        if any(rect.collidepoint(mouse_pos) for rect, _ in self.fragments):
             print(f"Clicked link: '{self.text}' -> {self.href}")
             self.callback()
 
     def open_file(self):
-        """Default behavior: open the file this link points to."""
+        """Default behavior: open the file this link points to (read in the background, see resources.py)."""
         if not self.href:
             print("[ERROR] No href set for this link")
             return
+        resources.request(resolve(self.base_url, self.href), self.file_opened, priority=URGENT)
 
-        try:
-            with open(self.href, "r", encoding="utf-8") as f:
-                content = f.read()
-            print(f"[DEBUG] Successfully opened file: {self.href}")
-            # TODO: parse_html(content) and redraw the screen
-        except FileNotFoundError:
+    def file_opened(self, resource):
+        error = resource.error
+        if error is None:
+            try:
+                content = resource.data.decode("utf-8")
+                print(f"[DEBUG] Successfully opened file: {self.href}")
+                # TODO: parse_html(content) and redraw the screen
+                return
+            except UnicodeDecodeError as e:
+                error = e
+        if isinstance(error, FileNotFoundError):
             print(f"[ERROR] File not found: {self.href}")
-        except Exception as e:
-            print(f"[ERROR] Could not open '{self.href}': {e}")
+        else:
+            print(f"[ERROR] Could not open '{self.href}': {error}")
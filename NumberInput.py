@@ -5,7 +5,6 @@ Description:
 """
 from Input import Input
 import pygame
-pygame.init()
 
 class NumberInput(Input):
     def handle_event(self, event):
@@ -7,8 +7,12 @@ import pygame
 from Input import Input
 
 class PasswordInput(Input):
-    def __init__(self, rect, text="", mask="*"):
-        super().__init__(rect, text)
+    def __init__(self, rect, text="", mask="*", scheduler=None):
+        super().__init__(rect, text, scheduler=scheduler)
+        self.mask = mask
+
+    def reset(self, rect, text="", mask="*", scheduler=None):
+        super().reset(rect, text, scheduler=scheduler)
         self.mask = mask
 
     def draw(self, screen, font):
@@ -2,21 +2,75 @@
 RadioButton
 
 Description:
+Radio buttons and the groups that make them mutually exclusive. Groups
+belong to the document or form that owns the buttons (see
+render.radio_group) and only hold weak references to their members, so
+buttons of closed pages or replaced nodes can be freed.
 """
-import pygame, time
+import weakref
+import pygame
 from Button import Button
 
+class RadioGroup:
+    def __init__(self, name):
+        self.name = name
+        self.members = weakref.WeakSet()
+        self._selected = None  # weakref to the selected member
+
+    def __len__(self):
+        return len(self.members)
+
+    @property
+    def selected(self):
+        return self._selected() if self._selected is not None else None
+
+    def add(self, button):
+        self.members.add(button)
+        if button.selected:
+            self.select(button)
+
+    def remove(self, button):
+        self.members.discard(button)
+        if self.selected is button:
+            self._selected = None
+
+    def select(self, button):
+        """Select button, deselecting only the previously selected member."""
+        previous = self.selected
+        if previous is not None and previous is not button:
+            previous.selected = False
+        button.selected = True
+        self._selected = weakref.ref(button)
+
+
 class RadioButton(Button):
-    groups = {}  # class-level dict to track groups
+    def __init__(self, rect, label, group=None, selected=False, border_color=(160,160,160), scheduler=None):
+        """group: the RadioGroup this button belongs to, or None for a standalone button"""
+        super().__init__(rect, label, callback=None, border_color=border_color, scheduler=scheduler)
+        self.selected = selected
+        self.group = group
+        if group is not None:
+            group.add(self)
 
-    def __init__(self, rect, label, group=None, selected=False, border_color=(160,160,160)):
-        super().__init__(rect, label, callback=None, border_color=border_color)
+    # --- Pooling (see widgetpool.py) ---
+    def reset(self, rect, label, group=None, selected=False, border_color=(160,160,160), scheduler=None):
+        self.leave_group()
+        super().reset(rect, label, callback=None, border_color=border_color, scheduler=scheduler)
         self.selected = selected
         self.group = group
-        if group:
-            if group not in RadioButton.groups:
-                RadioButton.groups[group] = []
-            RadioButton.groups[group].append(self)
+        if group is not None:
+            group.add(self)
+
+    # --- Compositing (see compositor.py) ---
+    def layer_state(self):
+        return (self.label, self.selected)
+
+    def layer_rect(self, font):
+        """The circle and the label to its right."""
+        text_rect = font.get_rect(self.label)
+        width = self.rect.height + 5 + text_rect.width
+        height = max(self.rect.height, text_rect.height)
+        return pygame.Rect(self.rect.x, self.rect.y + (self.rect.height - height) // 2, width, height)
 
     def draw(self, screen, font):
         # Draw circle
@@ -48,8 +102,12 @@ class RadioButton(Button):
                 self.select()
 
     def select(self):
-        # Deselect other buttons in the same group
-        if self.group:
-            for btn in RadioButton.groups[self.group]:
-                btn.selected = False
-        self.selected = True
+        if self.group is not None:
+            self.group.select(self)
+        else:
+            self.selected = True
+
+    def leave_group(self):
+        if self.group is not None:
+            self.group.remove(self)
+            self.group = None
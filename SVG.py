@@ -4,13 +4,15 @@ svg.py
 Description: Parses SVG elements (rect and path) and provides functions to draw
 them onto a Pygame surface. Designed to integrate with a DOM rendering engine.
 """
-import pygame, re, math
+import pygame, re, math, os
+from diskcache import disk_cache, content_hash
 
 # --- CONFIG ---
 SAMPLES = 30        # cubic bezier samples
 LINE_SAMPLES = 10   # line interpolation samples
 ARC_SEGMENTS = 5    # rounded rectangle corner segments
 MARGIN = 0          # margin inside bounding box
+SVG_CACHE_VERSION = 1  # bump when parsing or scaling changes, so old disk cache entries miss
 
 # Optional: some basic named colors
 COLOR_NAMES = {
@@ -137,7 +139,9 @@ def rounded_rect_points(x,y,w,h,radius=0):
 
 def parse_svg_file(file_path):
     with open(file_path,"r",encoding="utf-8") as f:
-        data=f.read()
+        return parse_svg(f.read())
+
+def parse_svg(data):
     elements=[]
     for match in re.finditer(r'<(path|rect)([^>]*)/>', data):
         tag=match.group(1); attrs=match.group(2)
@@ -168,6 +172,38 @@ def parse_svg_file(file_path):
             elements.append({"fill":fill,"stroke":None,"points":points})
     return elements
 
+# ----------------- Shared cache -----------------
+
+_svg_cache = {}
+
+def load_svg(file_path, w, h, viewBox=(0,0,100,100), margin=MARGIN, data=None, mtime=None):
+    """
+    Parsed and scaled SVG elements, shared by every document (and tab) using the file.
+    data, mtime: the file's contents and mtime when the caller has already read it
+    (see resources.py), so nothing touches the filesystem here.
+    """
+    path = file_path if "://" in file_path else os.path.abspath(file_path)
+    if mtime is None:
+        mtime = os.path.getmtime(path)
+    key = (path, mtime, w, h, viewBox, margin)
+    elements = _svg_cache.get(key)
+    if elements is None:
+        if data is None:
+            with open(path,"r",encoding="utf-8") as f:
+                data = f.read()
+        elements = scaled_svg(data, w, h, viewBox, margin)
+        _svg_cache[key] = elements
+    return elements
+
+def scaled_svg(data, w, h, viewBox=(0,0,100,100), margin=MARGIN):
+    """Elements of SVG text scaled to w x h, kept in the disk cache across launches."""
+    disk_key = disk_cache.key("svg", SVG_CACHE_VERSION, content_hash(data.encode("utf-8")), w, h, viewBox, margin)
+    elements = disk_cache.get_object(disk_key)
+    if elements is None:
+        elements = scale_points(parse_svg(data), w, h, viewBox=viewBox, margin=margin)
+        disk_cache.put_object(disk_key, elements)
+    return elements
+
 # ----------------- Scaling -----------------
 
 def scale_points(elements, w, h, viewBox=(0,0,100,100), margin=MARGIN):
@@ -204,6 +240,15 @@ def fill_polygon(surface,points,color):
 
 # ----------------- Drawing -----------------
 
+def svg_bounds(elements, x, y, w, h):
+    """(x, y, w, h) draw_svg covers at offset (x, y): the w x h box, grown to fit shapes drawn outside it."""
+    left, top, right, bottom = 0, 0, w, h
+    for elem in elements:
+        for px,py in elem["points"]:
+            left = min(left, math.floor(px)-1); top = min(top, math.floor(py)-1)
+            right = max(right, math.ceil(px)+1); bottom = max(bottom, math.ceil(py)+1)
+    return (x+left, y+top, right-left, bottom-top)
+
 def draw_svg(elements, surface, offset=(0,0)):
     ox,oy = offset
     for elem in elements:
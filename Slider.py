@@ -21,11 +21,36 @@ class Slider:
         self.dragging = False
         self.update_handle_pos()
 
+    # --- Pooling (see widgetpool.py) ---
+    def reset(self, rect, min_val=0, max_val=100, value=0):
+        self.rect = pygame.Rect(rect)
+        self.min_val = min_val
+        self.max_val = max_val
+        self.value = max(min_val, min(max_val, value))
+        self.dragging = False
+        self.update_handle_pos()
+
     def update_handle_pos(self):
         fraction = (self.value - self.min_val) / (self.max_val - self.min_val)
         self.handle_x = self.rect.x + int(fraction * self.rect.width)
         self.handle_y = self.rect.y + self.rect.height // 2
 
+    def move(self, dx, dy):
+        self.rect = self.rect.move(dx, dy)
+        self.handle_x += dx
+        self.handle_y += dy
+
+    # --- Compositing (see compositor.py) ---
+    def layer_state(self):
+        return (self.handle_x, self.handle_y)
+
+    def layer_rect(self, font=None):
+        """The track, and the handle hanging over its ends."""
+        radius = self.handle_radius + 1
+        handle = pygame.Rect(self.rect.x - radius, self.handle_y - radius,
+                             self.rect.width + 2 * radius, 2 * radius)
+        return self.rect.union(handle)
+
     def draw(self, screen, font=None):
         # Always redraw the track background
         track_rect = pygame.Rect(
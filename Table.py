@@ -71,13 +71,14 @@ class Table:
         # Update total height
         self.rect.height = self.cell_height * total_rows
 
-    def draw(self, screen, font=None):
+    def draw(self, screen, font=None, offset=(0, 0)):
+        """offset shifts the table when drawing onto an offscreen surface"""
         if font:
             self.font = font
         if not self.font:
             raise ValueError("Font must be provided to draw table.")
 
-        x0, y0 = self.rect.x, self.rect.y
+        x0, y0 = self.rect.x + offset[0], self.rect.y + offset[1]
         y_offset = y0
 
         # Draw caption
@@ -0,0 +1,97 @@
+"""
+loading
+
+Description:
+Page loading benchmark. Opens a page the way main.py does, in a worker
+process (see loader.py), and runs main.py's frame (see window.py) until
+it has fully arrived, so what is measured is how long the window goes
+without a frame while a big page streams in, and how long the whole load
+takes.
+
+Reported: the load time, the number of frames, the slowest and the
+median frame with the cost of each phase of the slowest.
+
+--budget NAME=MS makes the run exit with status 1 when a figure goes
+over MS, as in replay.py: "frame" (the slowest frame), "median" or a
+phase name for its slowest frame. The slowest frame is normally the one
+that first paints the window, which doesn't grow with the page: a
+19000-block page from stress.py stays within --budget frame=150.
+
+Usage: python benchmarks/loading.py page [--dt S] [--budget NAME=MS ...]
+"""
+import argparse, os, statistics, sys, time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import pygame
+from window import PHASES
+from config import SCREEN_WIDTH, SCREEN_HEIGHT
+from replay import open_window, run_frame, DEFAULT_DT
+
+BUDGETS = ("frame", "median") + PHASES
+
+
+def load(page, dt=DEFAULT_DT):
+    """Frame costs ({phase: seconds} per frame) and seconds until page was loaded."""
+    started = time.perf_counter()
+    window = open_window(page, pygame.display.get_surface(), load_in_worker=True)
+    tab = window.tabs.active
+    frames = []
+    while True:
+        frames.append(run_frame(window, []))
+        if not tab.loading:
+            break
+        # The window sleeps on input between frames; don't spin on the pipe
+        time.sleep(max(0.0, dt - sum(frames[-1].values())))
+    elapsed = time.perf_counter() - started
+    tab.unload()
+    return frames, elapsed
+
+
+def summary(frames):
+    """Milliseconds per budget name (see BUDGETS)."""
+    totals = [sum(costs.values()) for costs in frames]
+    figures = {"frame": max(totals) * 1000, "median": statistics.median(totals) * 1000}
+    for phase in PHASES:
+        figures[phase] = max(costs.get(phase, 0) for costs in frames) * 1000
+    return figures
+
+
+def parse_budget(text):
+    name, _, ms = text.partition("=")
+    if name not in BUDGETS:
+        raise argparse.ArgumentTypeError(f"unknown budget {name!r} (expected one of {', '.join(BUDGETS)})")
+    return name, float(ms)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[1].strip())
+    parser.add_argument("page")
+    parser.add_argument("--dt", type=float, default=DEFAULT_DT, help="seconds per frame")
+    parser.add_argument("--budget", type=parse_budget, action="append", default=[],
+                        metavar="NAME=MS", help="fail if NAME goes over MS milliseconds")
+    args = parser.parse_args()
+    page = os.path.abspath(args.page)
+
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    pygame.init()
+    pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
+    frames, elapsed = load(page, args.dt)
+
+    totals = [sum(costs.values()) for costs in frames]
+    slowest = frames[max(range(len(frames)), key=totals.__getitem__)]
+    figures = summary(frames)
+    print(f"{os.path.basename(page)} loaded in {elapsed:.2f} s over {len(frames)} frames")
+    print(f"slowest frame {figures['frame']:8.1f} ms   median {figures['median']:6.1f} ms")
+    print("  " + "   ".join(f"{phase} {slowest.get(phase, 0) * 1000:.1f}" for phase in PHASES))
+    failed = False
+    for name, budget in args.budget:
+        if figures[name] > budget:
+            print(f"OVER BUDGET: {name} {figures[name]:.1f} ms > {budget:g} ms")
+            failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,254 @@
+"""
+memory
+
+Description:
+Allocation profiler. Loads a page (or a generated stress page, see
+stress.py) in a headless tab and uses tracemalloc to attribute memory to
+engine subsystems: parser, layout, widgets, SVG, tables, paint, resources
+and fonts.
+An allocation is charged to the innermost engine module on its traceback.
+
+Reported, per subsystem:
+    resident   memory still held after parsing and the first frame
+    relayout   memory held by a fresh layout of the whole page
+    per frame  net growth per steady frame (scrolling, widget updates
+               and drawing, like main.py), plus the total peak of
+               short-lived allocations in a frame
+
+Pixel buffers are allocated by SDL, outside tracemalloc; they are
+counted separately from the surfaces the tab and its widgets hold.
+
+--budget NAME=SIZE makes the run exit with status 1 when a figure goes
+over SIZE (e.g. 512K, 40MB). NAME is "resident", "relayout", "growth",
+"frame" or "pixels" for the totals, or "<subsystem>" for its resident
+memory.
+
+Usage: python benchmarks/memory.py [page] [--blocks N] [--mix ...] [--frames N] [--budget NAME=SIZE ...]
+"""
+import argparse, gc, os, sys, tempfile, time, tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+
+import pygame
+import stress
+from dom import parse_html
+from query import iter_subtree
+from tabs import Tab, TabManager, surface_bytes
+from window import Window, SCROLL_STEP
+from resources import resources
+from config import SCREEN_WIDTH, SCREEN_HEIGHT
+
+# Engine module -> subsystem
+SUBSYSTEMS = {
+    "parser": ("dom", "snapshot", "style", "query"),
+    "layout": ("render", "displaylist", "textindex"),
+    "widgets": ("Input", "PasswordInput", "NumberInput", "Button", "Link", "Slider",
+                "ColorInput", "RadioButton", "FindBar", "timers", "widgetpool"),
+    "svg": ("SVG",),
+    "tables": ("Table",),
+    "paint": ("tiles", "tabs", "compositor", "window"),
+    "resources": ("resources", "loader"),
+    "fonts": ("fonts", "config"),
+}
+SUBSYSTEM_NAMES = tuple(SUBSYSTEMS) + ("other",)
+TOTALS = ("resident", "relayout", "growth", "frame", "pixels")
+TRACEBACK_FRAMES = 12
+
+MODULE_SUBSYSTEM = {
+    os.path.join(ROOT, module + ".py"): name
+    for name, modules in SUBSYSTEMS.items() for module in modules
+}
+
+
+def parse_size(text):
+    """'512K', '40MB', '1.5G' or plain bytes -> bytes."""
+    text = text.strip().upper().rstrip("B")
+    scale = {"K": 1024, "M": 1024 ** 2, "G": 1024 ** 3}.get(text[-1:], 1)
+    return int(float(text.rstrip("KMG")) * scale)
+
+
+def parse_budget(text):
+    name, _, size = text.partition("=")
+    if name not in TOTALS and name not in SUBSYSTEM_NAMES:
+        raise argparse.ArgumentTypeError(f"unknown budget {name!r}")
+    return name, parse_size(size)
+
+
+def format_size(size):
+    for unit in ("B", "KB", "MB"):
+        if abs(size) < 1024:
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
+    return f"{size:.1f} GB"
+
+
+# --- Attribution ---
+_file_subsystem = {}
+
+def subsystem_of(traceback):
+    """Subsystem of the innermost engine frame of an allocation traceback."""
+    for frame in reversed(traceback):  # tracebacks list the oldest frame first
+        filename = frame.filename
+        name = _file_subsystem.get(filename)
+        if name is None:
+            name = _file_subsystem[filename] = MODULE_SUBSYSTEM.get(os.path.abspath(filename), "")
+        if name:
+            return name
+    return "other"
+
+
+def by_subsystem(snapshot, base=None):
+    """Bytes per subsystem held in snapshot (or gained since base)."""
+    totals = dict.fromkeys(SUBSYSTEM_NAMES, 0)
+    if base is None:
+        stats = snapshot.statistics("traceback")
+        for stat in stats:
+            totals[subsystem_of(stat.traceback)] += stat.size
+    else:
+        for stat in snapshot.compare_to(base, "traceback"):
+            totals[subsystem_of(stat.traceback)] += stat.size_diff
+    return totals
+
+
+def take_snapshot():
+    gc.collect()
+    # tracemalloc's own allocations have no engine frame and land in "other"
+    return tracemalloc.take_snapshot()
+
+
+def pixel_bytes(tab):
+    """SDL pixel buffers held by the tab: page, tiles and widget surfaces."""
+    total = tab.tiles.memory_usage + (surface_bytes(tab.page) if tab.page is not None else 0)
+    for widget in tab.interactive_elements:
+        for value in vars(widget).values():
+            if isinstance(value, pygame.Surface):
+                total += surface_bytes(value)
+    return total
+
+
+# --- Profiling ---
+def profile(page, frames=60):
+    """Run the page and return a report: {row: {subsystem: bytes}} plus totals."""
+    pygame.init()
+    screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
+    with open(page, "r", encoding="utf-8") as f:
+        source = f.read()
+    os.chdir(os.path.dirname(os.path.abspath(page)))  # SVG paths are relative to the page
+    draw_frame_seconds = []
+
+    tracemalloc.start(TRACEBACK_FRAMES)
+    try:
+        empty = take_snapshot()
+
+        # Parse directly (not through the snapshot cache) so the parser is measured
+        tab = Tab(page)
+        tab.dom = parse_html(source)
+        tab.dom.scheduler = tab.scheduler
+        tab.count_nodes()
+        tabs = TabManager()
+        tabs.add(tab)
+        window = Window(screen, tabs)  # frames run as in main.py
+        window.frame([])
+        resources.wait_idle()  # SVG images arrive in the background
+        window.frame([])
+        resident = by_subsystem(take_snapshot(), empty)
+
+        # A fresh layout of the whole page, after dropping the old one
+        tab.discard()
+        before = take_snapshot()
+        window.frame([])
+        relayout = by_subsystem(take_snapshot(), before)
+
+        # Steady frames: scroll through the page and back
+        before = take_snapshot()
+        peak = 0
+        direction = 1
+        for _ in range(frames):
+            if tab.scroll_y + SCREEN_HEIGHT >= tab.content_height or (tab.scroll_y == 0 and direction < 0):
+                direction = -direction
+            tab.scroll_by(direction * SCROLL_STEP)
+            current, _ = tracemalloc.get_traced_memory()
+            tracemalloc.reset_peak()
+            started = time.perf_counter()
+            window.frame([])
+            draw_frame_seconds.append(time.perf_counter() - started)
+            peak = max(peak, tracemalloc.get_traced_memory()[1] - current)
+        growth = {name: size / max(1, frames) for name, size in
+                  by_subsystem(take_snapshot(), before).items()}
+        pixels = pixel_bytes(tab)
+        nodes = sum(1 for _ in iter_subtree(tab.dom))
+        widgets = len(tab.interactive_elements)
+        tab.unload()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        "rows": {"resident": resident, "relayout": relayout, "growth": growth},
+        "totals": {
+            "resident": sum(resident.values()),
+            "relayout": sum(relayout.values()),
+            "growth": sum(growth.values()),
+            "frame": peak,
+            "pixels": pixels,
+        },
+        "nodes": nodes,
+        "widgets": widgets,
+        "frame_ms": 1000 * sorted(draw_frame_seconds)[len(draw_frame_seconds) // 2] if draw_frame_seconds else 0,
+    }
+
+
+def over_budget(report, budgets):
+    """[(name, used, budget)] for every budget the report exceeds."""
+    over = []
+    for name, budget in budgets:
+        used = report["totals"][name] if name in TOTALS else report["rows"]["resident"][name]
+        if used > budget:
+            over.append((name, used, budget))
+    return over
+
+
+def print_report(report):
+    print(f"{report['nodes']} nodes, {report['widgets']} widgets, "
+          f"median frame {report['frame_ms']:.1f} ms")
+    print(f"{'':12}" + "".join(f"{name:>11}" for name in SUBSYSTEM_NAMES) + f"{'total':>11}")
+    labels = {"resident": "resident", "relayout": "relayout", "growth": "growth/frame"}
+    for row, label in labels.items():
+        values = report["rows"][row]
+        print(f"{label:12}" + "".join(f"{format_size(values[n]):>11}" for n in SUBSYSTEM_NAMES)
+              + f"{format_size(report['totals'][row]):>11}")
+    print(f"peak short-lived allocations per frame: {format_size(report['totals']['frame'])}")
+    print(f"pixel buffers (untraced): {format_size(report['totals']['pixels'])}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[1].strip())
+    parser.add_argument("page", nargs="?", help="page to load (default: generate a stress page)")
+    parser.add_argument("--blocks", type=int, default=500, help="blocks in the generated page")
+    parser.add_argument("--mix", type=stress.parse_mix, default=stress.DEFAULT_MIX,
+                        help="block mix of the generated page, e.g. paragraph=5,table=1")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--frames", type=int, default=60)
+    parser.add_argument("--budget", type=parse_budget, action="append", default=[],
+                        metavar="NAME=SIZE", help="fail if NAME goes over SIZE")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        page = args.page or stress.write_page(tmp, args.blocks, args.mix, args.seed)
+        page = os.path.abspath(page)
+        cwd = os.getcwd()
+        try:
+            report = profile(page, args.frames)
+        finally:
+            os.chdir(cwd)
+
+    print_report(report)
+    over = over_budget(report, args.budget)
+    for name, used, budget in over:
+        print(f"OVER BUDGET: {name} {format_size(used)} > {format_size(budget)}")
+    sys.exit(1 if over else 0)
+
+
+if __name__ == "__main__":
+    main()
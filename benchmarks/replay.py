@@ -0,0 +1,326 @@
+"""
+replay
+
+Description:
+Input record/replay harness for interactive benchmarks. "record" opens a
+page in a window and writes every input event (keys, mouse buttons,
+motion and wheel), with its time, the pointer position and the modifier
+keys, to a session file until the window is closed. "play" loads the
+page headlessly and runs the session through main.py's frame (see
+window.py: timers, resource delivery, layout, event handling,
+compositing) at a fixed dt on a virtual clock. Every event goes to the first frame at
+or after its time, and cursor blink and key repeat fire at the same
+frames on every run, so typing, holding backspace, dragging a slider
+or the colour picker and clicking links and buttons can be timed and
+checked without a person at the keyboard.
+
+Reported: frame times, the cost of each phase of the slowest and the
+median frame, the time of frames with a keystroke early and late in the
+session (it grows when a key costs more as text gets longer),
+and the final state of every widget. --state writes that state as JSON;
+--expect compares against a state written by an earlier run and fails
+when they differ.
+
+Widgets read the pointer with pygame.mouse.get_pos(), which the dummy
+video driver doesn't move, so during play it returns the position
+recorded with the event being handled.
+
+--budget NAME=MS makes the run exit with status 1 when a figure goes
+over MS: "frame" (the slowest frame), "median", "keystroke" (the mean
+time of frames with a keystroke) or a phase name for its slowest frame.
+
+Usage:
+    python benchmarks/replay.py record page session.jsonl
+    python benchmarks/replay.py play page session.jsonl [--dt S] [--tail S] [--state out.json]
+                                                        [--expect state.json] [--budget NAME=MS ...]
+"""
+import argparse, json, math, os, statistics, sys, time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import pygame
+import timers
+from tabs import Tab, TabManager
+from timers import TimerScheduler
+from resources import resources
+from window import Window, PHASES
+from config import SCREEN_WIDTH, SCREEN_HEIGHT
+
+SESSION_VERSION = 1
+DEFAULT_DT = 1 / 60
+DEFAULT_TAIL = 1.0  # seconds played after the last event (key repeat, flashes)
+BUDGETS = ("frame", "median", "keystroke") + PHASES
+
+RECORDED = (pygame.KEYDOWN, pygame.KEYUP, pygame.MOUSEMOTION, pygame.MOUSEBUTTONDOWN,
+            pygame.MOUSEBUTTONUP, pygame.MOUSEWHEEL)
+EVENT_TYPES = {pygame.event.event_name(kind): kind for kind in RECORDED}
+
+# Widget attributes kept in the final state, where a widget has them
+STATE_ATTRS = ("text", "cursor_pos", "focused", "selection_start", "selection_end", "value",
+               "selected", "selected_color", "current_hue", "pressed", "href")
+
+
+def parse_budget(text):
+    name, _, ms = text.partition("=")
+    if name not in BUDGETS:
+        raise argparse.ArgumentTypeError(f"unknown budget {name!r} (expected one of {', '.join(BUDGETS)})")
+    return name, float(ms)
+
+
+# --- Sessions ---
+def encode_event(event, t, mouse, mods):
+    attrs = {}
+    for key, value in event.dict.items():
+        if isinstance(value, (bool, int, float, str)):
+            attrs[key] = value
+        elif isinstance(value, tuple) and all(isinstance(v, (int, float)) for v in value):
+            attrs[key] = list(value)
+    return {"t": round(t, 4), "type": pygame.event.event_name(event.type),
+            "mouse": list(mouse), "mods": mods, "attrs": attrs}
+
+
+def decode_event(record):
+    attrs = {key: tuple(value) if isinstance(value, list) else value
+             for key, value in record["attrs"].items()}
+    return pygame.event.Event(EVENT_TYPES[record["type"]], attrs)
+
+
+def read_session(path):
+    """(header, event records in time order)"""
+    with open(path, "r", encoding="utf-8") as f:
+        lines = [json.loads(line) for line in f if line.strip()]
+    if not lines or lines[0].get("version") != SESSION_VERSION:
+        raise ValueError(f"{path} is not a version {SESSION_VERSION} session")
+    return lines[0], sorted(lines[1:], key=lambda record: record["t"])
+
+
+# --- Frames ---
+class VirtualClock:
+    """A clock for TimerScheduler that only moves when told to."""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class PhaseTimer:
+    def __init__(self):
+        self.costs = {}
+        self.last = time.perf_counter()
+
+    def end(self, phase):
+        now = time.perf_counter()
+        self.costs[phase] = now - self.last
+        self.last = now
+
+
+def run_frame(window, events, prepare=None):
+    """
+    One frame of main.py's loop (see window.py). prepare(event) runs
+    before each event is handled. Returns the seconds spent in each phase.
+    """
+    phases = PhaseTimer()
+    window.frame(events, phases, prepare)
+    return phases.costs
+
+
+def open_window(page, screen, scheduler=None, load_in_worker=False):
+    """A window with page in its only tab, laid out with its images loaded."""
+    os.chdir(os.path.dirname(page))  # SVG paths are relative to the page
+    tab = Tab(page, load_in_worker=load_in_worker)
+    if scheduler is not None:
+        tab.scheduler = scheduler
+    tab.load()
+    tabs = TabManager(load_in_worker=load_in_worker)
+    tabs.add(tab)
+    if not tab.loading:
+        tab.render()
+        resources.wait_idle()  # SVG images arrive in the background
+    return Window(screen, tabs)
+
+
+def widget_state(widget):
+    state = {"widget": type(widget).__name__, "rect": list(widget.rect)}
+    for name in STATE_ATTRS:
+        value = getattr(widget, name, None)
+        if value is not None:
+            state[name] = list(value) if isinstance(value, (tuple, list)) else value
+    boxes = getattr(widget, "input_boxes", None)
+    if boxes:
+        state["boxes"] = [box.text for box in boxes]
+    return state
+
+
+# --- Record ---
+def record(page, path):
+    pygame.init()
+    screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
+    caption = f"Recording {os.path.basename(page)} - close the window to stop"
+    clock = pygame.time.Clock()
+    count = 0
+    cwd = os.getcwd()
+    try:
+        window = open_window(page, screen)
+        tab = window.tabs.active
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(json.dumps({"version": SESSION_VERSION, "page": os.path.basename(page),
+                                "size": [SCREEN_WIDTH, SCREEN_HEIGHT]}) + "\n")
+            start = time.monotonic()
+            running = True
+            while running:
+                clock.tick(60)
+                events = []
+                for event in pygame.event.get():
+                    if event.type == pygame.QUIT:
+                        running = False
+                    elif event.type in RECORDED:
+                        events.append(event)
+                        f.write(json.dumps(encode_event(event, time.monotonic() - start,
+                                                        pygame.mouse.get_pos(), pygame.key.get_mods())) + "\n")
+                        count += 1
+                run_frame(window, events)
+                pygame.display.set_caption(caption)  # over the tab title the frame put up
+        tab.unload()
+    finally:
+        os.chdir(cwd)
+    print(f"recorded {count} events to {path}")
+
+
+# --- Play ---
+def play(page, path, dt=DEFAULT_DT, tail=DEFAULT_TAIL):
+    """Run the session against page and return a report."""
+    _, records = read_session(path)
+    pygame.init()
+    screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
+    clock = VirtualClock()
+    shared_clock = timers.scheduler.clock
+    timers.scheduler.clock = clock
+    pointer = [0, 0]
+    get_pos = pygame.mouse.get_pos
+    pygame.mouse.get_pos = lambda: tuple(pointer)
+    cwd = os.getcwd()
+    try:
+        window = open_window(page, screen, TimerScheduler(clock))
+        tab = window.tabs.active
+        run_frame(window, [])  # first paint, not measured
+
+        recorded = {}  # id(event) -> its record, for prepare()
+        def prepare(event):
+            record = recorded[id(event)]
+            pointer[:] = record["mouse"]
+            pygame.key.set_mods(record["mods"])
+
+        end = (records[-1]["t"] if records else 0) + tail
+        frames, keystrokes = [], []
+        index = 0
+        for frame in range(1, int(math.ceil(end / dt)) + 1):
+            clock.now = frame * dt
+            batch = []
+            while index < len(records) and records[index]["t"] <= clock.now:
+                event = decode_event(records[index])
+                recorded[id(event)] = records[index]
+                batch.append(event)
+                index += 1
+            if batch:
+                pointer[:] = recorded[id(batch[-1])]["mouse"]  # where the mouse is this frame
+            started = time.perf_counter()
+            costs = run_frame(window, batch, prepare)
+            seconds = time.perf_counter() - started
+            frames.append((seconds, costs))
+            if any(event.type == pygame.KEYDOWN for event in batch):
+                keystrokes.append(seconds)
+            recorded.clear()
+        state = {"scroll_y": tab.scroll_y,
+                 "widgets": [widget_state(widget) for widget in tab.interactive_elements]}
+        tab.unload()
+    finally:
+        pygame.mouse.get_pos = get_pos
+        timers.scheduler.clock = shared_clock
+        os.chdir(cwd)
+
+    return {"events": len(records), "frames": frames, "keystrokes": keystrokes, "state": state}
+
+
+def summary(report):
+    """Milliseconds per budget name (see BUDGETS)."""
+    times = [seconds for seconds, _ in report["frames"]]
+    figures = {"frame": max(times, default=0) * 1000,
+               "median": statistics.median(times) * 1000 if times else 0,
+               "keystroke": statistics.mean(report["keystrokes"]) * 1000 if report["keystrokes"] else 0}
+    for phase in PHASES:
+        figures[phase] = max((costs[phase] for _, costs in report["frames"]), default=0) * 1000
+    return figures
+
+
+def print_report(report):
+    frames = report["frames"]
+    figures = summary(report)
+    print(f"{report['events']} events, {len(frames)} frames, "
+          f"median frame {figures['median']:.2f} ms, slowest {figures['frame']:.2f} ms")
+    by_time = sorted(frames, key=lambda frame: frame[0])
+    rows = {"slowest": by_time[-1][1], "median": by_time[len(by_time) // 2][1]} if frames else {}
+    print(f"{'phase ms':10}" + "".join(f"{phase:>11}" for phase in PHASES))
+    for label, costs in rows.items():
+        print(f"{label:10}" + "".join(f"{costs[phase] * 1000:11.3f}" for phase in PHASES))
+    keystrokes = report["keystrokes"]
+    if keystrokes:
+        quarter = max(1, len(keystrokes) // 4)
+        first = statistics.mean(keystrokes[:quarter]) * 1000
+        last = statistics.mean(keystrokes[-quarter:]) * 1000
+        print(f"{len(keystrokes)} keystroke frames: {first:.3f} ms in the first quarter, "
+              f"{last:.3f} ms in the last")
+    for i, state in enumerate(report["state"]["widgets"]):
+        fields = ", ".join(f"{key}={value!r}" for key, value in state.items() if key not in ("widget", "rect"))
+        print(f"  {i:3} {state['widget']:14} {fields}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[1].strip())
+    commands = parser.add_subparsers(dest="command", required=True)
+    recorder = commands.add_parser("record", help="record input against a page")
+    recorder.add_argument("page")
+    recorder.add_argument("session")
+    player = commands.add_parser("play", help="replay a session headlessly")
+    player.add_argument("page")
+    player.add_argument("session")
+    player.add_argument("--dt", type=float, default=DEFAULT_DT, help="seconds per frame")
+    player.add_argument("--tail", type=float, default=DEFAULT_TAIL,
+                        help="seconds to keep playing after the last event")
+    player.add_argument("--state", help="write the final widget state to this JSON file")
+    player.add_argument("--expect", help="fail unless the final widget state equals this JSON file's")
+    player.add_argument("--budget", type=parse_budget, action="append", default=[],
+                        metavar="NAME=MS", help="fail if NAME goes over MS milliseconds")
+    args = parser.parse_args()
+    page = os.path.abspath(args.page)
+
+    if args.command == "record":
+        record(page, os.path.abspath(args.session))
+        return
+
+    if args.dt <= 0:
+        parser.error("--dt must be positive")
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    report = play(page, os.path.abspath(args.session), args.dt, args.tail)
+    print_report(report)
+    if args.state:
+        with open(args.state, "w", encoding="utf-8") as f:
+            json.dump(report["state"], f, indent=1)
+    failed = False
+    if args.expect:
+        with open(args.expect, "r", encoding="utf-8") as f:
+            if json.load(f) != json.loads(json.dumps(report["state"])):
+                print(f"STATE DIFFERS from {args.expect}")
+                failed = True
+    figures = summary(report)
+    for name, budget in args.budget:
+        if figures[name] > budget:
+            print(f"OVER BUDGET: {name} {figures[name]:.3f} ms > {budget:g} ms")
+            failed = True
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
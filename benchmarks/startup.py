@@ -0,0 +1,81 @@
+"""
+startup
+
+Description:
+Startup-time benchmark. Measures, in fresh interpreter processes, how long
+it takes to import the engine, parse a page and paint the first frame.
+"cold" runs delete the on-disk font cache first so the system font list
+is scanned, "warm" runs reuse the cache written by the previous run.
+
+Usage: python benchmarks/startup.py [page] [--runs N]
+"""
+import argparse, os, subprocess, sys, tempfile, time, statistics
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_PAGE = os.path.join(ROOT, "samples", "demo_page", "demo.txt")
+
+CHILD = r"""
+import os, sys, time
+start = time.perf_counter()
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+sys.path.insert(0, {root!r})
+import fonts
+fonts.registry.cache_path = {cache!r}
+import pygame
+from dom import parse_html
+from render import draw_node
+from displaylist import DisplayList
+from config import SCREEN_WIDTH, SCREEN_HEIGHT, fonts as font_table
+imported = time.perf_counter()
+pygame.init()
+screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
+with open({page!r}, "r", encoding="utf-8") as f:
+    dom = parse_html(f.read())
+display_list = DisplayList()
+draw_node(dom, 20, display_list, font_table, [])
+display_list.replay(screen)
+painted = time.perf_counter()
+print(imported - start, painted - start)
+"""
+
+
+def run_once(page, cache_path):
+    code = CHILD.format(root=ROOT, cache=cache_path, page=page)
+    started = time.perf_counter()
+    out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True,
+                         cwd=os.path.dirname(page), check=True).stdout
+    total = time.perf_counter() - started
+    imported, painted = (float(v) for v in out.split()[-2:])
+    return total, imported, painted
+
+
+def report(label, samples):
+    totals, imports, paints = zip(*samples)
+    print(f"{label:5} process {statistics.median(totals)*1000:8.1f} ms   "
+          f"import {statistics.median(imports)*1000:8.1f} ms   "
+          f"first paint {statistics.median(paints)*1000:8.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[1].strip())
+    parser.add_argument("page", nargs="?", default=DEFAULT_PAGE)
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+    page = os.path.abspath(args.page)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        cache_path = os.path.join(tmp, "fonts.json")
+        cold, warm = [], []
+        for _ in range(args.runs):
+            if os.path.exists(cache_path):
+                os.remove(cache_path)
+            cold.append(run_once(page, cache_path))
+            warm.append(run_once(page, cache_path))
+
+    print(f"{args.runs} runs of {os.path.relpath(page, ROOT)} (median)")
+    report("cold", cold)
+    report("warm", warm)
+
+
+if __name__ == "__main__":
+    main()
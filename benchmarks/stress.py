@@ -0,0 +1,153 @@
+"""
+stress
+
+Description:
+Synthetic page generator for stress tests. Writes a page of any size made
+of a weighted mix of block types (paragraphs, lists, tables, inputs and
+SVG images), plus the SVG files it references. The same size, mix and
+seed always produce the same page.
+
+Usage: python benchmarks/stress.py out_dir [--blocks N] [--mix paragraph=5,table=1] [--seed S]
+"""
+import argparse, os, random
+
+# Relative weight of each block type
+DEFAULT_MIX = {"paragraph": 50, "list": 15, "table": 10, "input": 20, "svg": 5}
+BLOCK_TYPES = tuple(DEFAULT_MIX)
+
+PAGE_NAME = "stress.txt"
+SVG_SHAPES = 8
+SVG_SIZES = (48, 64, 100, 150)
+INPUT_TYPES = ("text", "password", "number", "range", "radio", "color", "button")
+INLINE_TAGS = ("a", "b", "em", "code", "span")
+
+WORDS = ("lorem ipsum dolor sit amet consectetur adipiscing elit sed do eiusmod tempor "
+         "incididunt ut labore et dolore magna aliqua enim ad minim veniam quis nostrud "
+         "exercitation ullamco laboris nisi aliquip ex ea commodo consequat").split()
+
+
+def parse_mix(text):
+    """'paragraph=5,table=1' -> {"paragraph": 5, "table": 1}"""
+    mix = {}
+    for part in text.split(","):
+        if not part.strip():
+            continue
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in BLOCK_TYPES:
+            raise ValueError(f"unknown block type {name!r} (expected one of {', '.join(BLOCK_TYPES)})")
+        mix[name] = float(weight) if weight else 1.0
+    return mix
+
+
+# --- Blocks ---
+def sentence(rng, words):
+    return " ".join(rng.choice(WORDS) for _ in range(words))
+
+
+def paragraph(rng, i):
+    parts = []
+    for _ in range(rng.randint(1, 4)):
+        parts.append(sentence(rng, rng.randint(4, 30)))
+        if rng.random() < 0.5:
+            tag = rng.choice(INLINE_TAGS)
+            href = f' href="#p{i}"' if tag == "a" else ""
+            parts.append(f"<{tag}{href}>{sentence(rng, rng.randint(1, 4))}</{tag}>")
+    if rng.random() < 0.1:
+        level = rng.randint(1, 3)
+        return f"<h{level}>{sentence(rng, rng.randint(2, 6))}</h{level}>\n"
+    return f"<p>{' '.join(parts)}</p>\n"
+
+
+def list_block(rng, i):
+    tag = rng.choice(("ul", "ol"))
+    items = "".join(f"  <li>{sentence(rng, rng.randint(2, 12))}</li>\n" for _ in range(rng.randint(2, 8)))
+    return f"<{tag}>\n{items}</{tag}>\n"
+
+
+def table(rng, i):
+    columns = rng.randint(2, 6)
+    rows = [" ".join(f"<th>{sentence(rng, 1)}</th>" for _ in range(columns))]
+    for _ in range(rng.randint(2, 12)):
+        rows.append(" ".join(f"<td>{sentence(rng, rng.randint(1, 3))}</td>" for _ in range(columns)))
+    return "<table>\n" + "".join(f"  <tr>{row}</tr>\n" for row in rows) + "</table>\n"
+
+
+def input_block(rng, i):
+    kind = rng.choice(INPUT_TYPES)
+    if kind == "button":
+        return f"<button>{sentence(rng, rng.randint(1, 3))}</button>\n"
+    if kind == "radio":
+        name = f"group{i}"
+        return "".join(f'<input type="radio" name="{name}" value="{n}"{" checked" if n == 0 else ""}><br>\n'
+                       for n in range(rng.randint(2, 4)))
+    if kind == "range":
+        return f'<input type="range" min="0" max="100" value="{rng.randint(0, 100)}">\n'
+    if kind == "number":
+        return f'<input type="number" value="{rng.randint(0, 1000)}">\n'
+    if kind == "color":
+        return f'<input type="color" value="#{rng.randrange(0x1000000):06x}">\n'
+    return f'<input type="{kind}" value="{sentence(rng, rng.randint(1, 3))}">\n'
+
+
+def svg(rng, i):
+    size = rng.choice(SVG_SIZES)
+    return f'<svg src="shape{rng.randrange(SVG_SHAPES)}.txt" width="{size}" height="{size}"/>\n'
+
+
+BLOCKS = {"paragraph": paragraph, "list": list_block, "table": table, "input": input_block, "svg": svg}
+
+
+def svg_shape(rng):
+    elements = []
+    for _ in range(rng.randint(1, 5)):
+        x, y = rng.randint(0, 60), rng.randint(0, 60)
+        color = f"#{rng.randrange(0x1000000):06x}"
+        if rng.random() < 0.5:
+            elements.append(f'  <rect x="{x}" y="{y}" width="{rng.randint(10, 40)}" '
+                            f'height="{rng.randint(10, 40)}" rx="{rng.randint(0, 8)}" fill="{color}"/>')
+        else:
+            elements.append(f'  <path d="M{x},{y}c{rng.randint(5, 30)}-20 30-20 {rng.randint(20, 40)},0z" '
+                            f'fill="{color}" stroke="#000"/>')
+    return '<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 100 100">\n' + "\n".join(elements) + "\n</svg>\n"
+
+
+# --- Pages ---
+def generate(blocks, mix=None, seed=0):
+    """HTML for a page of `blocks` blocks drawn from mix (block type -> weight)."""
+    mix = {name: weight for name, weight in (mix or DEFAULT_MIX).items() if weight > 0}
+    if not mix:
+        raise ValueError("the block mix is empty")
+    rng = random.Random(seed)
+    kinds = rng.choices(list(mix), weights=list(mix.values()), k=blocks)
+    body = "".join(BLOCKS[kind](rng, i) for i, kind in enumerate(kinds))
+    return f"<!DOCTYPE html>\n<html>\n<body>\n<h1>Stress page: {blocks} blocks</h1>\n{body}</body>\n</html>\n"
+
+
+def write_page(directory, blocks, mix=None, seed=0):
+    """Write the page and its SVG files into directory. Returns the page path."""
+    os.makedirs(directory, exist_ok=True)
+    rng = random.Random(seed)
+    for n in range(SVG_SHAPES):
+        with open(os.path.join(directory, f"shape{n}.txt"), "w", encoding="utf-8") as f:
+            f.write(svg_shape(rng))
+    path = os.path.join(directory, PAGE_NAME)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(generate(blocks, mix, seed))
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[1].strip())
+    parser.add_argument("out_dir")
+    parser.add_argument("--blocks", type=int, default=5000)
+    parser.add_argument("--mix", type=parse_mix, default=DEFAULT_MIX,
+                        help="comma-separated type=weight pairs; types: " + ", ".join(BLOCK_TYPES))
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    path = write_page(args.out_dir, args.blocks, args.mix, args.seed)
+    print(f"{path}: {os.path.getsize(path) / 1024:.0f} KB, {args.blocks} blocks")
+
+
+if __name__ == "__main__":
+    main()
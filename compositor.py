@@ -0,0 +1,93 @@
+"""
+compositor
+
+Description:
+Builds each frame from layers, so animating widgets (a blinking cursor,
+a button's press flash, a dragged slider) don't repaint the page. The
+base layer is the tab's page surface, which is composed from cached
+tiles (see tabs.py) and only changes with layout or scrolling. Each
+widget on screen is a layer above it, covering widget.layer_rect(font).
+
+Every frame the compositor compares each layer's rect and
+widget.layer_state() with the previous frame's. Only the layers that
+changed are composited again: the base layer is copied back under
+their old and new rects, then the widgets there are drawn again,
+clipped to those rects. Only the damaged rects are sent to the
+display. A blinking cursor costs one input-sized blit and redraw.
+
+Widgets draw in screen coordinates, so a layer is a region of the frame
+rather than a surface of its own. A widget without layer_state is drawn
+again every frame; one without layer_rect is taken to draw inside its
+rect.
+"""
+import pygame
+from displaylist import merge_rects
+
+
+def layer_rect(widget, font):
+    rect = widget.layer_rect(font) if hasattr(widget, "layer_rect") else widget.rect
+    return pygame.Rect(rect)
+
+
+def layer_state(widget):
+    return widget.layer_state() if hasattr(widget, "layer_state") else None
+
+
+class Compositor:
+    def __init__(self):
+        self.base = None    # (page surface, version) the frame was built on
+        self.layers = {}    # widget -> (rect, state) as last composited
+        self.redrawn = 0    # widget draws in the last frame (for profiling)
+
+    def invalidate(self):
+        """Build the next frame in full (e.g. the window was exposed)."""
+        self.base = None
+
+    def compose(self, screen, page, version, widgets, font, overlay=False):
+        """
+        Bring screen up to date with page (the base layer; version changes
+        whenever it is repainted) and the widgets on it. overlay: something
+        else draws over the whole frame afterwards (the find bar), so it is
+        built in full now and again once the overlay is gone.
+        Returns the damaged screen rects.
+        """
+        bounds = screen.get_rect()
+        layers = {}
+        for widget in widgets:
+            rect = layer_rect(widget, font)
+            if rect.width and rect.height and rect.colliderect(bounds):
+                layers[widget] = (rect, layer_state(widget))
+
+        base = (page, version)
+        if overlay or base != self.base:
+            screen.blit(page, (0, 0))
+            for widget in layers:
+                widget.draw(screen, font)
+            self.redrawn = len(layers)
+            self.base = None if overlay else base
+            self.layers = layers
+            return [bounds]
+
+        damage = []
+        previous = self.layers
+        for widget, layer in layers.items():
+            old = previous.get(widget)
+            if old is None or old != layer or layer[1] is None:
+                damage.append(layer[0])
+                if old is not None and old[0] != layer[0]:
+                    damage.append(old[0])
+        for widget, old in previous.items():
+            if widget not in layers:
+                damage.append(old[0])
+        self.layers = layers
+        self.redrawn = 0
+        damage = [rect.clip(bounds) for rect in merge_rects(damage)]
+        for rect in damage:
+            screen.set_clip(rect)
+            screen.blit(page, rect, rect)
+            for widget, (widget_rect, _) in layers.items():
+                if widget_rect.colliderect(rect):
+                    widget.draw(screen, font)
+                    self.redrawn += 1
+        screen.set_clip(None)
+        return damage
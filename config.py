@@ -3,8 +3,7 @@ config
 
 Description:
 """
-import pygame, pygame.freetype
-pygame.init()
+from fonts import FontTable, registry, get_font
 
 # === USERDEF ===
 
@@ -16,15 +15,16 @@ LINE_HEIGHTS = {"h1": 50, "p": 30, "button": 40}
 CHAR_WIDTH = 12
 LEFT_MARGIN = 20
 
-fonts = {
-    "h1": pygame.freetype.SysFont("Arial", 32),
-    "h2": pygame.freetype.SysFont("Arial", 24),
-    "h3": pygame.freetype.SysFont("Arial", 19),
-    "h4": pygame.freetype.SysFont("Arial", 16),
-    "h5": pygame.freetype.SysFont("Arial", 13),
-    "h6": pygame.freetype.SysFont("Arial", 11),
-    "p": pygame.freetype.SysFont("Arial", 16),
-    "a": pygame.freetype.SysFont("Arial", 16),
-    "button": pygame.freetype.SysFont("Arial", 14)
-}
+# Fonts are created on first use (see fonts.py)
+fonts = FontTable({
+    "h1": ("Arial", 32),
+    "h2": ("Arial", 24),
+    "h3": ("Arial", 19),
+    "h4": ("Arial", 16),
+    "h5": ("Arial", 13),
+    "h6": ("Arial", 11),
+    "p": ("Arial", 16),
+    "a": ("Arial", 16),
+    "button": ("Arial", 14)
+}, registry)
 # ===================
@@ -0,0 +1,201 @@
+"""
+diskcache
+
+Description:
+Persistent cache for loaded resources and the forms derived from them,
+so later launches skip downloading, parsing and painting work that was
+already done. Holds downloaded responses (see network.py), DOM
+snapshots of downloaded pages (snapshot.py), parsed SVG geometry
+(SVG.py) and painted colour picker gradients (ColorInput.py).
+
+Entries are files named after a hash of their key. Keys are built from
+a content hash of the source (the SVG text, the response body) plus the
+parameters of the derived form, so a changed source simply misses.
+Several browser processes (tabs' page loader workers, other windows)
+share the directory:
+
+    - writes go to a temporary file that is renamed into place, so a
+      reader sees either the whole entry or none of it
+    - a read touches the entry's mtime; that is the LRU order
+    - past max_bytes the least recently used entries are deleted; an
+      entry deleted under a reader is just a miss
+
+Set SEQUOIA_CACHE_DIR to move the cache, or to "" to turn it off.
+"""
+import hashlib, os, pickle, time
+
+DISK_CACHE_DIR = os.environ.get(
+    "SEQUOIA_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "sequoia", "resources"))
+DISK_CACHE_BYTES = 256 * 1024 * 1024
+TRIM_TO = 0.8             # fraction of max_bytes left after trimming
+STALE_TMP_SECONDS = 3600  # temporary files older than this were left by a crashed writer
+
+
+def content_hash(data):
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+class DiskCache:
+    def __init__(self, directory=DISK_CACHE_DIR, max_bytes=DISK_CACHE_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.size = None  # bytes on disk, counted on the first write
+        self.hits = self.misses = 0  # for profiling
+
+    @property
+    def enabled(self):
+        return bool(self.directory)
+
+    def key(self, kind, *parts):
+        """Entry name for kind (e.g. "svg") and the parts that identify it."""
+        return content_hash(repr((kind,) + parts).encode("utf-8"))
+
+    def path(self, key):
+        return os.path.join(self.directory, key[:2], key)
+
+    # --- Reading ---
+    def get(self, key):
+        """The entry's bytes, or None."""
+        if not self.enabled:
+            return None
+        path = self.path(key)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+        except OSError:
+            self.misses += 1
+            return None
+        self.touch(path)
+        self.hits += 1
+        return data
+
+    def lookup(self, key):
+        """Path of an existing entry (for readers that mmap it), or None."""
+        if not self.enabled:
+            return None
+        path = self.path(key)
+        if not self.touch(path):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return path
+
+    def touch(self, path):
+        try:
+            os.utime(path)
+            return True
+        except OSError:
+            return False
+
+    def get_object(self, key):
+        data = self.get(key)
+        if data is None:
+            return None
+        try:
+            return pickle.loads(data)
+        except Exception:
+            return None  # written by an incompatible version
+
+    # --- Writing ---
+    def put(self, key, data):
+        """Store data under key. Failures (read-only disk, full disk) just don't cache."""
+        if not self.enabled:
+            return
+        path = self.path(key)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            replaced = self.file_size(path)  # a rewrite (e.g. after revalidation) only adds the difference
+            os.replace(tmp_path, path)
+        except OSError:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            return
+        if self.size is None:
+            self.size = self.disk_usage()
+        else:
+            self.size += len(data) - replaced
+        if self.size > self.max_bytes:
+            self.trim()
+
+    def put_object(self, key, value):
+        self.put(key, pickle.dumps(value, pickle.HIGHEST_PROTOCOL))
+
+    def remove(self, key):
+        if self.enabled:
+            path = self.path(key)
+            size = self.file_size(path)
+            try:
+                os.remove(path)
+            except OSError:
+                return
+            if self.size is not None:
+                self.size -= size
+
+    @staticmethod
+    def file_size(path):
+        """Bytes in the file at path, 0 if there is none."""
+        try:
+            return os.stat(path).st_size
+        except OSError:
+            return 0
+
+    # --- Size cap ---
+    def entries(self):
+        """[(mtime, size, path)] of every file in the cache."""
+        found = []
+        try:
+            buckets = os.listdir(self.directory)
+        except OSError:
+            return found
+        for bucket in buckets:
+            directory = os.path.join(self.directory, bucket)
+            try:
+                names = os.listdir(directory)
+            except OSError:
+                continue
+            for name in names:
+                path = os.path.join(directory, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue  # removed by another process
+                found.append((stat.st_mtime, stat.st_size, path))
+        return found
+
+    def disk_usage(self):
+        return sum(size for _, size, _ in self.entries())
+
+    def trim(self):
+        """Delete least recently used entries until under TRIM_TO of max_bytes."""
+        entries = sorted(self.entries())
+        total = sum(size for _, size, _ in entries)
+        now = time.time()
+        for mtime, size, path in entries:
+            stale_tmp = path.endswith(".tmp") and now - mtime > STALE_TMP_SECONDS
+            if total <= self.max_bytes * TRIM_TO and not stale_tmp:
+                continue
+            if path.endswith(".tmp") and not stale_tmp:
+                continue  # another process is writing it
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
+        self.size = total
+
+    def clear(self):
+        for _, _, path in self.entries():
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        self.size = 0
+
+
+# Shared by everything in this process
+disk_cache = DiskCache()
@@ -0,0 +1,278 @@
+"""
+displaylist
+
+Description:
+Retained-mode paint commands. Layout records what it would have drawn
+(text runs, rects, lines and callbacks for complex content such as SVGs
+and tables) together with each command's bounding box in document
+coordinates. The list is rebuilt only when layout or style changes and
+can be replayed onto any surface, clipped to a region (the viewport, a
+damage rect, a tile) and diffed against the previous list to find the
+regions that need repainting.
+
+A full diff hashes every item. An incremental layout, which relays out
+only the nodes that changed and copies the cached fragments of the rest
+(see render.draw_node), finds its damage with a LayoutDamage instead:
+only what the relaid-out nodes recorded themselves is compared with
+what they recorded before, and a copied fragment is damaged only when
+it moved.
+"""
+import pygame
+
+BAND_HEIGHT = 256  # height of the vertical buckets used to find items in a region
+
+
+def _freeze(value):
+    """Hashable stand-in for a command argument (used for diffing)."""
+    try:
+        hash(value)
+        return value
+    except TypeError:
+        return id(value)
+
+
+class DisplayList:
+    def __init__(self):
+        self.items = []    # (kind, bounds, args)
+        self.bands = {}    # band index -> [item index, ...]
+        self.bounds = None
+        self.sources = None  # node -> text items, built on demand by text_for
+        self.damage = None   # LayoutDamage while an incremental layout is recorded
+        self.laying_out = []  # (first item, y, old position) per node being laid out (see render.draw_node)
+
+    def __len__(self):
+        return len(self.items)
+
+    # --- Recording ---
+    def add(self, kind, bounds, args):
+        bounds = pygame.Rect(bounds)
+        index = len(self.items)
+        self.items.append((kind, bounds, args))
+        for band in range(bounds.top // BAND_HEIGHT, (bounds.bottom - 1) // BAND_HEIGHT + 1):
+            self.bands.setdefault(band, []).append(index)
+        self.bounds = bounds.copy() if self.bounds is None else self.bounds.union(bounds)
+
+    def text(self, font, pos, text, color, source=None, rect=None):
+        """
+        source: optional (node, offset) the text was taken from, used by
+        find-in-page. rect: font.get_rect(text) if the caller already has
+        it. Returns the measured text rect so callers don't measure the
+        same text again.
+        """
+        if rect is None:
+            rect = font.get_rect(text)
+        self.add("text", (pos[0], pos[1], rect.width + 1, max(rect.height, font.get_sized_height()) + 1),
+                 (font, tuple(pos), text, tuple(color), source))
+        return rect
+
+    def rect(self, color, rect, width=0):
+        self.add("rect", rect, (tuple(color), tuple(pygame.Rect(rect)), width))
+
+    def line(self, color, start, end, width=1):
+        x0, y0 = min(start[0], end[0]), min(start[1], end[1])
+        x1, y1 = max(start[0], end[0]), max(start[1], end[1])
+        self.add("line", (x0 - width, y0 - width, x1 - x0 + 2*width + 1, y1 - y0 + 2*width + 1),
+                 (tuple(color), tuple(start), tuple(end), width))
+
+    def call(self, bounds, paint, *args):
+        """
+        Record paint(target, rect, *args) for content drawn by other
+        modules; rect is bounds translated into target coordinates.
+        """
+        self.add("call", bounds, (paint,) + args)
+
+    def extend(self, items, dy=0):
+        """Append items recorded earlier (e.g. a cached layout fragment), moved down by dy."""
+        if dy:
+            items = [shift_item(item, dy) for item in items]
+        for kind, bounds, args in items:
+            self.add(kind, bounds, args)
+
+    # --- Queries ---
+    def items_in(self, region):
+        """Items whose bounds intersect region, in paint order."""
+        region = pygame.Rect(region)
+        if region.height <= 0 or region.width <= 0:
+            return []
+        indices = set()
+        for band in range(region.top // BAND_HEIGHT, (region.bottom - 1) // BAND_HEIGHT + 1):
+            indices.update(self.bands.get(band, ()))
+        items = self.items
+        return [items[i] for i in sorted(indices) if items[i][1].colliderect(region)]
+
+    def text_for(self, node):
+        """Text items recorded from node's text, in order."""
+        if self.sources is None:
+            self.sources = {}
+            for item in self.items:
+                if item[0] == "text" and item[2][4] is not None:
+                    self.sources.setdefault(item[2][4][0], []).append(item)
+        return self.sources.get(node, [])
+
+    @property
+    def height(self):
+        return self.bounds.bottom if self.bounds else 0
+
+    # --- Replay ---
+    def replay(self, target, clip=None, origin=(0, 0)):
+        """
+        Draw the recorded commands onto target. origin is the document
+        position that maps to the target's top-left corner, and clip is a
+        region in document coordinates (defaults to the whole target).
+        """
+        ox, oy = origin
+        if clip is None:
+            clip = pygame.Rect(ox, oy, target.get_width(), target.get_height())
+        clip = pygame.Rect(clip)
+        shift = (-ox, -oy)
+
+        old_clip = target.get_clip()
+        target.set_clip(clip.move(shift).clip(old_clip))
+        for kind, bounds, args in self.items_in(clip):
+            if kind == "text":
+                font, (x, y), text, color, _ = args
+                font.render_to(target, (x - ox, y - oy), text, fgcolor=color)
+            elif kind == "rect":
+                color, rect, width = args
+                pygame.draw.rect(target, color, pygame.Rect(rect).move(shift), width)
+            elif kind == "line":
+                color, (x0, y0), (x1, y1), width = args
+                pygame.draw.line(target, color, (x0 - ox, y0 - oy), (x1 - ox, y1 - oy), width)
+            elif kind == "call":
+                args[0](target, bounds.move(shift), *args[1:])
+        target.set_clip(old_clip)
+
+    # --- Invalidation ---
+    def keys(self):
+        return {item_key(item) for item in self.items}
+
+    def diff(self, previous, max_rects=16):
+        """
+        Regions (document coordinates) that differ between previous and
+        this list. Returns everything when there is no previous list.
+        """
+        if previous is None:
+            return [self.bounds.copy()] if self.bounds else []
+        old_keys, new_keys = previous.keys(), self.keys()
+        return damage_rects([pygame.Rect(key[1]) for key in old_keys ^ new_keys], max_rects)
+
+
+class LayoutDamage:
+    """
+    The regions an incremental layout changed, from what draw_node tells
+    it as it records the new list: each node it laid out again (relaid)
+    and each cached fragment it copied (reused), with where their items
+    were in the previous list (see render.cached_position). A node whose
+    previous items aren't known (it is new, or was moved or restyled)
+    gets its parent's whole old and new regions damaged; when that
+    reaches the top node, complete is False and the caller falls back to
+    a full diff.
+    """
+
+    def __init__(self, previous, max_rects=16):
+        self.previous = previous.items
+        self.max_rects = max_rects
+        self.changed = []
+        self.frames = []      # per node being relaid: its children's (new range, old range or None)
+        self.complete = True
+
+    def old_range(self, old):
+        if old is not None and old[0] is self.previous:
+            return old[1], old[2]
+        return None
+
+    def begin(self):
+        """A node is being laid out again; its children report until relaid()."""
+        self.frames.append([])
+
+    def relaid(self, items, start, end, old):
+        """The node recorded items[start:end]; old: where its items were before, or None."""
+        children = self.frames.pop()
+        old = self.old_range(old)
+        if old is not None:
+            if all(child_old is not None for _, child_old in children):
+                old_items = direct_items(self.previous, old, [child_old for _, child_old in children])
+                new_items = direct_items(items, (start, end), [child_new for child_new, _ in children])
+                old_keys = {item_key(item) for item in old_items}
+                new_keys = {item_key(item) for item in new_items}
+                self.changed.extend(pygame.Rect(key[1]) for key in old_keys ^ new_keys)
+            else:
+                self.add(items, start, end)
+                self.add(self.previous, *old)
+        self.report((start, end), old)
+
+    def reused(self, items, start, end, old, dy):
+        """A cached fragment (from old) was copied into items[start:end], moved down by dy."""
+        old = self.old_range(old)
+        if old is not None and dy:
+            self.add(items, start, end)
+            self.add(self.previous, *old)
+        self.report((start, end), old)
+
+    def report(self, new, old):
+        if self.frames:
+            self.frames[-1].append((new, old))
+        elif old is None:
+            self.complete = False
+
+    def add(self, items, start, end):
+        if start < end:
+            self.changed.append(items[start][1].unionall([item[1] for item in items[start + 1:end]]))
+
+    def rects(self):
+        return damage_rects(self.changed, self.max_rects)
+
+
+def item_key(item):
+    """Hashable identity of an item: equal keys paint the same pixels."""
+    kind, bounds, args = item
+    return (kind, tuple(bounds), tuple(_freeze(a) for a in args))
+
+
+def direct_items(items, span, children):
+    """items[span] without the children's ranges: what a node recorded itself."""
+    start, end = span
+    direct = []
+    for child_start, child_end in sorted(children):
+        direct.extend(items[start:child_start])
+        start = max(start, child_end)
+    direct.extend(items[start:end])
+    return direct
+
+
+def damage_rects(changed, max_rects=16):
+    """changed rects merged, or their union when there are more than max_rects."""
+    if len(changed) > max_rects:
+        return [changed[0].unionall(changed[1:])]
+    return merge_rects(changed)
+
+
+def shift_item(item, dy):
+    """Copy of a recorded item moved down by dy."""
+    kind, bounds, args = item
+    if kind == "text":
+        font, (x, y), text, color, source = args
+        args = (font, (x, y + dy), text, color, source)
+    elif kind == "rect":
+        color, (x, y, w, h), width = args
+        args = (color, (x, y + dy, w, h), width)
+    elif kind == "line":
+        color, (x0, y0), (x1, y1), width = args
+        args = (color, (x0, y0 + dy), (x1, y1 + dy), width)
+    return (kind, bounds.move(0, dy), args)
+
+
+def merge_rects(rects):
+    """Merge overlapping rects so each pixel is repainted once."""
+    merged = []
+    for rect in rects:
+        rect = rect.copy()
+        i = 0
+        while i < len(merged):
+            if merged[i].colliderect(rect):
+                rect.union_ip(merged.pop(i))
+                i = 0
+            else:
+                i += 1
+        merged.append(rect)
+    return merged
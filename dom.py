@@ -6,17 +6,291 @@ Parses elements of a provided HTML file as a DOM Tree and outputs it
 so it can be rendered in render.py. Supports SVG elements.
 """
 import re
+from style import StyleResolver
+from query import DocumentIndex, query_all, iter_subtree, is_inclusive_ancestor
+from textindex import TextIndex
+from widgetpool import widget_pool
+
+# Where nodes keep their widgets (see render.py)
+WIDGET_INSTANCES = ("input_instance", "button_instance", "link_instance")
 
 class Node:
+    # Caches filled in on demand (see style.py). Class-level defaults keep
+    # node creation cheap and let snapshot.py build nodes without __init__.
+    _style = None
+    _style_share = None
+    _classes = None
+
+    # Root of the owning document (None while detached) and, on document
+    # roots only, the DocumentIndex used by the query methods (see query.py)
+    document = None
+    index = None
+    _text_index = None  # find-in-page index (see textindex.py), built on first search
+    radio_groups = None  # name -> RadioGroup, on documents and forms (see render.radio_group)
+    resources = None  # ResourceGroup loading the document's files (see resources.py), on roots
+    base_url = None  # URL of a downloaded document, that relative links resolve against, on roots
+
+    # Cached layout of this subtree (see render.py). None doubles as the
+    # dirty bit: a node without a layout and its ancestors get laid out
+    # again, everything else is reused and only shifted.
+    _layout = None
+    _stale = None  # the layout dropped last, until the node is laid out again (see displaylist.LayoutDamage)
+    _text_content = None  # see text_content(); cleared with the layout
+    _source_hash = None  # hash of the source this subtree was parsed or patched from (see hotreload.py)
+
     def __init__(self, tag, attrs=None, text="", children=None):
         self.tag = tag
         self.attrs = attrs if attrs else {}
         self.text = text
-        self.children = children if children else []
+        self.parent = None
+        self.children = []
         self.link_instance = None
 
+        for child in children or []:
+            self.add_child(child)
+
+    # --- Mutation ---
     def add_child(self, child):
-        self.children.append(child)
+        self.insert_child(len(self.children), child)
+
+    append_child = add_child
+
+    def insert_child(self, index, child):
+        if child.parent is not None:
+            child.parent.remove_child(child)
+        child.parent = self
+        self.children.insert(index, child)
+        self._adopt(child)
+        self.mark_dirty()
+
+    def insert_before(self, child, reference):
+        """Insert child before reference (appends when reference is None)."""
+        if reference is None:
+            self.add_child(child)
+        else:
+            self.insert_child(self.children.index(reference), child)
+
+    def remove_child(self, child):
+        self.children.remove(child)
+        self._release(child)
+        child.parent = None
+        self.mark_dirty()
+        return child
+
+    def replace_child(self, new_child, old_child):
+        index = self.children.index(old_child)
+        self.remove_child(old_child)
+        self.insert_child(index, new_child)
+        return old_child
+
+    def move_child(self, index, child):
+        """
+        Move one of this node's children to index. Unlike remove_child +
+        insert_child the subtree stays in the document, widgets and all.
+        """
+        document = self.document
+        text_index = document._text_index if document is not None else None
+        if text_index is not None:
+            text_index.remove_subtree(child)
+        self.children.remove(child)
+        self.children.insert(index, child)
+        if text_index is not None:
+            text_index.insert_subtree(child)
+        if document is not None and document.index is not None:
+            document.index.positions = None
+        self.mark_dirty()
+
+    def remove(self):
+        if self.parent is not None:
+            self.parent.remove_child(self)
+
+    def set_text(self, text):
+        """Set the text of a text node, or replace an element's children with one text node."""
+        if self.tag == "text":
+            self.text = text
+            self.mark_dirty()
+        else:
+            for child in list(self.children):
+                self.remove_child(child)
+            self.text = ""
+            self.add_child(Node("text", text=text))
+        document = self.document
+        if document is not None and document._text_index is not None:
+            document._text_index.text_changed(self)
+
+    def mark_dirty(self):
+        """Drop the cached layout and text content of this node and every ancestor."""
+        # Walk all the way up: nodes that were never laid out on their own
+        # (list items, hidden subtrees) still have laid-out ancestors
+        node = self
+        while node is not None:
+            if node._layout is not None:
+                node._stale = node._layout
+            node._layout = None
+            node._text_content = None
+            node = node.parent
+
+    def text_content(self):
+        """Stripped text of this subtree, words from different nodes joined by spaces."""
+        text = self._text_content
+        if text is None:
+            if self.tag == "text":
+                text = self.text.strip()
+            else:
+                parts = [child.text_content() for child in self.children]
+                text = " ".join(part for part in parts if part)
+            self._text_content = text
+        return text
+
+    def _release(self, child):
+        """Detach a removed subtree from the document and stop its widgets' timers."""
+        document = child.document
+        if document is not None and document.index is not None:
+            document.index.remove_subtree(child)
+        if document is not None and document._text_index is not None:
+            document._text_index.remove_subtree(child)
+        for node in iter_subtree(child):
+            node.document = None
+            node._release_widgets()
+
+    def _release_widgets(self, recycle=False):
+        """Stop this node's widgets; recycle: also hand them to the widget pool (see widgetpool.py)."""
+        for attr in WIDGET_INSTANCES:
+            widget = getattr(self, attr, None)
+            if hasattr(widget, "stop_timers"):
+                widget.stop_timers()
+            if hasattr(widget, "leave_group"):
+                widget.leave_group()
+        self.radio_groups = None
+        if recycle:
+            for attr in WIDGET_INSTANCES:
+                widget = getattr(self, attr, None)
+                if widget is not None:
+                    widget_pool.release(widget)
+                    setattr(self, attr, None)
+
+    def unload(self):
+        """
+        Stop the widgets of this subtree, drop its radio groups and give the
+        widgets to the pool for other pages (the subtree is being thrown away).
+        """
+        for node in iter_subtree(self):
+            node._release_widgets(recycle=True)
+
+    def _adopt(self, child):
+        """Attach a newly inserted subtree to this node's document."""
+        if child._style is not None or child._layout is not None:
+            child.invalidate_style()  # it may inherit different styles here
+        child._stale = None  # its old layout was relative to its old parent's
+        document = self.document
+        index = document.index if document is not None else None
+        if document is not None and document._text_index is not None:
+            document._text_index.insert_subtree(child)
+        if not child.children:
+            # Fast path for single nodes (every insert made by the parser)
+            child.document = document
+            if index is not None:
+                index.add(child)
+            return
+        if child.document is not document:
+            for node in iter_subtree(child):
+                node.document = document
+        if index is not None:
+            index.add_subtree(child)
+
+    @property
+    def classes(self):
+        if self._classes is None:
+            self._classes = frozenset(self.attrs.get("class", "").split())
+        return self._classes
+
+    def set_attribute(self, key, value):
+        old_value = self.attrs.get(key)
+        self.attrs[key] = value
+        if key == "class":
+            self._classes = None
+        if key in ("id", "class") and self.document is not None and self.document.index is not None:
+            self.document.index.attribute_changed(self, key, old_value, value)
+        self.invalidate_style()
+
+    def remove_attribute(self, key):
+        if key not in self.attrs:
+            return
+        old_value = self.attrs.pop(key)
+        if key == "class":
+            self._classes = None
+        if key in ("id", "class") and self.document is not None and self.document.index is not None:
+            self.document.index.attribute_changed(self, key, old_value, None)
+        self.invalidate_style()
+
+    def invalidate_style(self):
+        """Drop cached computed styles (and the layouts built from them) for this subtree."""
+        stack = [self]
+        while stack:
+            node = stack.pop()
+            node._style = None
+            node._style_share = None
+            if node._layout is not None:
+                node._stale = node._layout
+            node._layout = None
+            stack.extend(node.children)
+        if self.parent is not None:
+            self.parent.mark_dirty()
+
+    # --- Queries ---
+    def document_index(self):
+        """The owning document's index, built on first use if the document has none."""
+        document = self.document
+        if document is None:
+            return None
+        if document.index is None:
+            document.index = DocumentIndex()
+            document.index.add_subtree(document)
+        return document.index
+
+    def text_index(self):
+        """The owning document's find-in-page TextIndex, built on first use."""
+        document = self.document
+        if document is None:
+            return None
+        if document._text_index is None:
+            document._text_index = TextIndex(document)
+        return document._text_index
+
+    def get_element_by_id(self, element_id):
+        index = self.document_index()
+        if index is None:
+            return next((n for n in iter_subtree(self) if n.attrs.get("id") == element_id), None)
+        matches = [n for n in index.ids.get(element_id, ())
+                   if self is self.document or is_inclusive_ancestor(self, n)]
+        return index.document_order(self.document, matches)[0] if matches else None
+
+    def get_elements_by_tag_name(self, tag):
+        return self.query_selector_all(tag.lower())
+
+    def get_elements_by_class_name(self, class_name):
+        return self.query_selector_all("." + class_name)
+
+    def query_selector_all(self, selectors):
+        """Elements under this node matching a CSS selector list, in document order."""
+        index = self.document_index()
+        if index is None:
+            # Detached subtree: index it on the fly
+            index = DocumentIndex()
+            index.add_subtree(self)
+            return query_all(self, selectors, index, self)
+        return query_all(self, selectors, index, self.document)
+
+    def query_selector(self, selectors):
+        found = self.query_selector_all(selectors)
+        return found[0] if found else None
+
+    # DOM-style aliases for automation scripts
+    getElementById = get_element_by_id
+    getElementsByTagName = get_elements_by_tag_name
+    getElementsByClassName = get_elements_by_class_name
+    querySelector = query_selector
+    querySelectorAll = query_selector_all
 
     def __repr__(self, level=0):
         indent = "  " * level
@@ -34,61 +308,144 @@ class Node:
         return s
 
 
-def parse_html(html):
-    """Improved HTML parser -> DOM tree (handles self-closing and optional tags)"""
-    # Remove DOCTYPE, <title>, <style> blocks
-    html = re.sub(r"<!DOCTYPE[^>]*>", "", html, flags=re.IGNORECASE)
-    html = re.sub(r"<title>.*?</title>", "", html, flags=re.IGNORECASE | re.DOTALL)
-    html = re.sub(r"<style[^>]*>.*?</style>", "", html, flags=re.IGNORECASE | re.DOTALL)
-
-    # Regex to match tags (opening, closing, self-closing)
-    tag_regex = re.compile(r"<(/?)(\w+)([^>]*)>", flags=re.DOTALL)
-
-    # Updated self-closing tags including svg
-    self_closing_tags = {"br", "img", "hr", "meta", "link", "input", "svg"}
-
-    stack = []
-    root = Node("document")
-    stack.append(root)
-    pos = 0
-
-    for match in tag_regex.finditer(html):
-        # Capture text between tags
-        text_between = html[pos:match.start()]
-        text_between = text_between.replace("\n", " ").strip()
-        if text_between:
-            stack[-1].add_child(Node("text", text=text_between))
-
-        closing, tag, attr_str = match.groups()
-        tag = tag.lower()
-
-        # --- Parse attributes ---
-        attrs = {}
-        for attr_match in re.finditer(r'(\w+(?:-\w+)?)(?:="([^"]*)")?', attr_str):
-            key, value = attr_match.groups()
-            attrs[key] = value if value is not None else ""
-
-        # Determine if self-closing
-        is_self_closing = (tag in self_closing_tags) or attr_str.strip().endswith("/")
-
-        if not closing:  # opening tag
-            new_node = Node(tag, attrs)
-            stack[-1].add_child(new_node)
-            if not is_self_closing:
-                stack.append(new_node)
-        else:  # closing tag
-            # Pop stack until matching tag or optional tags
-            for i in range(len(stack)-1, 0, -1):
-                if stack[i].tag == tag or stack[i].tag in {"head", "body"}:
-                    stack = stack[:i]
-                    break
-
-        pos = match.end()
-
-    # Remaining text after last tag
-    if pos < len(html):
-        remaining_text = html[pos:].replace("\n", " ").strip()
+# Tags whose neighbouring whitespace separates words on the same line
+INLINE_TAGS = {"a", "b", "i", "u", "em", "strong", "span", "small", "code", "mark", "sub", "sup"}
+
+
+def collapse_whitespace(text):
+    """
+    Collapse text to single-spaced words, keeping one leading/trailing
+    space where the source had whitespace so inline layout can tell
+    "word <b>bold</b>" from "word<b>bold</b>". Returns "" for blank text.
+    """
+    words = text.split()
+    if not words:
+        return ""
+    lead = " " if text[0].isspace() else ""
+    trail = " " if text[-1].isspace() else ""
+    return lead + " ".join(words) + trail
+
+
+# Tags whose content the parser removes (title) or collects (style) whole
+DOCTYPE_REGEX = re.compile(r"<!DOCTYPE[^>]*>", flags=re.IGNORECASE)
+TITLE_REGEX = re.compile(r"<title>.*?</title>", flags=re.IGNORECASE | re.DOTALL)
+STYLE_REGEX = re.compile(r"<style[^>]*>(.*?)</style>", flags=re.IGNORECASE | re.DOTALL)
+OPEN_BLOCK_REGEX = re.compile(r"<title>|<style[^>]*>", flags=re.IGNORECASE)
+CLOSE_BLOCK_REGEX = {"</title>": re.compile(r"</title>", flags=re.IGNORECASE),
+                     "</style>": re.compile(r"</style>", flags=re.IGNORECASE)}
+# Regex to match tags (opening, closing, self-closing)
+TAG_REGEX = re.compile(r"<(/?)(\w+)([^>]*)>", flags=re.DOTALL)
+ATTR_REGEX = re.compile(r'(\w+(?:-\w+)?)(?:="([^"]*)")?')
+# Updated self-closing tags including svg
+SELF_CLOSING_TAGS = {"br", "img", "hr", "meta", "link", "input", "svg"}
+
+
+class DocumentParser:
+    """
+    Improved HTML parser -> DOM tree (handles self-closing and optional
+    tags). Text can be fed in pieces as it is read or decoded (see
+    pagesource.py); each feed parses up to the last complete tag, holding
+    back <title> and <style> blocks until their closing tag arrives, so
+    the tree is the same however the text is split.
+    """
+
+    def __init__(self):
+        self.root = Node("document")
+        self.root.document = self.root
+        self.root.index = DocumentIndex()
+        self.stylesheets = []
+        self.stack = [self.root]
+        self.pending = ""  # text not parsed yet: after the last tag, or an unclosed block
+        self.closing = None  # end tag regex of the unclosed block pending ends in
+        self.searched = 0    # how much of pending has been searched for it
+
+    def feed(self, text):
+        html = self.pending + text
+        if self.closing is not None:
+            # Only the new text (and the end tag's length before it) can
+            # finish the block: don't scan all of it again on every feed
+            start = max(0, self.searched - len(self.closing.pattern) + 1)
+            if self.closing.search(html, start) is None:
+                self.pending, self.searched = html, len(html)
+                return
+            self.closing = None
+        end = html.rfind(">") + 1
+        # An unclosed <title>/<style> (or one whose end tag isn't here yet) waits for more text
+        lower = None
+        for block in OPEN_BLOCK_REGEX.finditer(html, 0, end):
+            lower = lower or html.lower()
+            closing = "</title>" if block.group().lower() == "<title>" else "</style>"
+            if lower.find(closing, block.end()) < 0:
+                end = block.start()
+                self.closing = CLOSE_BLOCK_REGEX[closing]
+                break
+        self.pending = html[end:]
+        if end:
+            self.pending = self.parse(html[:end]) + self.pending
+        self.searched = len(self.pending)
+
+    def close(self):
+        """Parse what is left and return the document."""
+        html = self.pending
+        self.pending = ""
+        remaining = self.parse(html)
+        # Remaining text after last tag
+        remaining_text = collapse_whitespace(remaining)
         if remaining_text:
-            stack[-1].add_child(Node("text", text=remaining_text))
+            self.stack[-1].add_child(Node("text", text=remaining_text))
+        self.root.style_resolver = StyleResolver(self.stylesheets)
+        return self.root
+
+    def parse(self, html):
+        """Parse complete tags in html; returns the text after the last one."""
+        # Remove DOCTYPE, <title>, <style> blocks (keeping the stylesheets)
+        html = DOCTYPE_REGEX.sub("", html)
+        html = TITLE_REGEX.sub("", html)
+        self.stylesheets.extend(STYLE_REGEX.findall(html))
+        html = STYLE_REGEX.sub("", html)
+
+        stack = self.stack
+        pos = 0
+        for match in TAG_REGEX.finditer(html):
+            # Capture text between tags
+            text_between = html[pos:match.start()]
+            collapsed = collapse_whitespace(text_between)
+            if collapsed:
+                stack[-1].add_child(Node("text", text=collapsed))
+            elif text_between and stack[-1].children and stack[-1].children[-1].tag in INLINE_TAGS:
+                # The space in "<b>a</b> <i>b</i>"
+                stack[-1].add_child(Node("text", text=" "))
+
+            closing, tag, attr_str = match.groups()
+            tag = tag.lower()
 
-    return root
+            # --- Parse attributes ---
+            attrs = {}
+            for attr_match in ATTR_REGEX.finditer(attr_str):
+                key, value = attr_match.groups()
+                attrs[key] = value if value is not None else ""
+
+            # Determine if self-closing
+            is_self_closing = (tag in SELF_CLOSING_TAGS) or attr_str.strip().endswith("/")
+
+            if not closing:  # opening tag
+                new_node = Node(tag, attrs)
+                stack[-1].add_child(new_node)
+                if not is_self_closing:
+                    stack.append(new_node)
+            else:  # closing tag
+                # Pop stack until matching tag or optional tags
+                for i in range(len(stack)-1, 0, -1):
+                    if stack[i].tag == tag or stack[i].tag in {"head", "body"}:
+                        del stack[i:]
+                        break
+
+            pos = match.end()
+        return html[pos:]
+
+
+def parse_html(html):
+    """Parse a whole page (see DocumentParser)."""
+    parser = DocumentParser()
+    parser.feed(html)
+    return parser.close()
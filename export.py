@@ -0,0 +1,192 @@
+"""
+export
+
+Description:
+Exports a whole page, however tall, to PNG. The page is painted from
+its display list in horizontal strips of strip_height rows, into one
+strip surface that is reused for every strip, and each strip is either
+streamed into a single PNG (PNGWriter compresses rows as they arrive)
+or saved as the next file of a numbered tile set. Only one strip is
+ever held, so memory use depends on the page width and the strip
+height, not on how tall the page is.
+
+Widgets are drawn into the strips they overlap, in the state they are
+in, and go back to their place on screen afterwards.
+
+Usage: python export.py page out.png [--tiles] [--strip-height N] [--level 0-9]
+    --tiles: write out-00000.png, out-00001.png, ... (one per strip) instead
+"""
+import argparse, os, struct, zlib
+import pygame
+from compositor import layer_rect
+from render import place_widget
+from tabs import Tab, BG_COLOR
+from resources import resources
+from config import SCREEN_WIDTH, SCREEN_HEIGHT, fonts
+
+STRIP_HEIGHT = 512           # rows painted at a time
+IDAT_BYTES = 256 * 1024      # compressed bytes per IDAT chunk
+COMPRESSION = 6              # zlib level for streamed PNGs
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+
+# --- PNG ---
+class PNGWriter:
+    """
+    Writes an 8-bit RGB PNG to a binary file row by row, so the image
+    is never held whole. Rows must add up to height before close().
+    """
+
+    def __init__(self, file, width, height, level=COMPRESSION):
+        self.file = file
+        self.width = width
+        self.height = height
+        self.rows = 0
+        self.compressor = zlib.compressobj(level)
+        self.pending = bytearray()  # compressed bytes not yet written as IDAT
+        file.write(PNG_SIGNATURE)
+        self.chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0))
+
+    def chunk(self, kind, data):
+        self.file.write(struct.pack(">I", len(data)) + kind)
+        self.file.write(data)
+        self.file.write(struct.pack(">I", zlib.crc32(data, zlib.crc32(kind))))
+
+    def write_rows(self, pixels):
+        """Append whole rows of RGB bytes, top to bottom."""
+        stride = self.width * 3
+        rows = len(pixels) // stride
+        if rows * stride != len(pixels) or self.rows + rows > self.height:
+            raise ValueError("pixels are not whole rows of the image")
+        # Every row starts with its filter type: 0 (None)
+        filtered = bytearray(rows * (stride + 1))
+        pixels = memoryview(pixels)
+        for row in range(rows):
+            start = row * (stride + 1) + 1
+            filtered[start:start + stride] = pixels[row * stride:(row + 1) * stride]
+        self.pending += self.compressor.compress(filtered)
+        self.rows += rows
+        while len(self.pending) >= IDAT_BYTES:
+            self.chunk(b"IDAT", bytes(self.pending[:IDAT_BYTES]))
+            del self.pending[:IDAT_BYTES]
+
+    def close(self):
+        if self.rows != self.height:
+            raise ValueError(f"{self.rows} of {self.height} rows written")
+        self.pending += self.compressor.flush()
+        if self.pending:
+            self.chunk(b"IDAT", bytes(self.pending))
+        self.pending = bytearray()
+        self.chunk(b"IEND", b"")
+
+
+# --- Strips ---
+def widget_spans(widget_rects, font):
+    """(top, bottom, widget, rect) of what each widget paints, in document coordinates, by top."""
+    spans = []
+    for widget, rect in widget_rects:
+        place_widget(widget, rect)
+        painted = layer_rect(widget, font)
+        if painted.width and painted.height:
+            spans.append((painted.top, painted.bottom, widget, rect))
+    spans.sort(key=lambda span: span[0])
+    return spans
+
+
+def paint_strips(display_list, widget_rects, width, height, font, background,
+                 strip_height=STRIP_HEIGHT):
+    """
+    Yield (strip surface, top, rows) for each strip of the page from the
+    top down. The same surface comes back every time: use it before
+    asking for the next strip. Only its first rows rows are page.
+    """
+    strip = pygame.Surface((width, strip_height))
+    spans = widget_spans(widget_rects, font)
+    started = 0   # spans[:started] start above the current strip's bottom
+    active = []   # those that may still reach into it
+    for top in range(0, height, strip_height):
+        bottom = top + strip_height
+        while started < len(spans) and spans[started][0] < bottom:
+            active.append(spans[started])
+            started += 1
+        active = [span for span in active if span[1] > top]
+        strip.fill(background)
+        display_list.replay(strip, origin=(0, top))
+        for _, _, widget, rect in active:
+            place_widget(widget, rect.move(0, -top))
+            widget.draw(strip, font)
+        yield strip, top, min(strip_height, height - top)
+
+
+def export_png(display_list, widget_rects, width, height, path, font, background,
+               strip_height=STRIP_HEIGHT, level=COMPRESSION):
+    """Stream the page into one PNG at path."""
+    with open(path, "wb") as file:
+        writer = PNGWriter(file, width, height, level)
+        for strip, _, rows in paint_strips(display_list, widget_rects, width, height,
+                                           font, background, strip_height):
+            area = strip if rows == strip.get_height() else strip.subsurface((0, 0, width, rows))
+            writer.write_rows(pygame.image.tostring(area, "RGB"))
+        writer.close()
+    return [path]
+
+
+def tile_path(path, index):
+    """out.png -> out-00003.png for the fourth strip."""
+    stem, extension = os.path.splitext(path)
+    return f"{stem}-{index:05d}{extension or '.png'}"
+
+
+def export_tiles(display_list, widget_rects, width, height, path, font, background,
+                 strip_height=STRIP_HEIGHT):
+    """Save each strip as a numbered file next to path (see tile_path)."""
+    paths = []
+    for strip, _, rows in paint_strips(display_list, widget_rects, width, height,
+                                       font, background, strip_height):
+        area = strip if rows == strip.get_height() else strip.subsurface((0, 0, width, rows))
+        paths.append(tile_path(path, len(paths)))
+        pygame.image.save(area, paths[-1])
+    return paths
+
+
+def export_tab(tab, path, tiles=False, strip_height=STRIP_HEIGHT, level=COMPRESSION):
+    """Export the whole of tab's page. Returns the files written."""
+    tab.render()  # lay out anything that changed
+    font = fonts.get("p", None)
+    args = (tab.display_list, tab.widget_rects, SCREEN_WIDTH, tab.content_height, path, font, BG_COLOR)
+    try:
+        if tiles:
+            return export_tiles(*args, strip_height=strip_height)
+        return export_png(*args, strip_height=strip_height, level=level)
+    finally:
+        tab.page_dirty = True  # puts the widgets back on screen
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export a page to PNG.")
+    parser.add_argument("page")
+    parser.add_argument("out")
+    parser.add_argument("--tiles", action="store_true", help="write one numbered PNG per strip")
+    parser.add_argument("--strip-height", type=int, default=STRIP_HEIGHT)
+    parser.add_argument("--level", type=int, default=COMPRESSION, choices=range(10),
+                        help="zlib compression level of the single PNG")
+    args = parser.parse_args()
+    if args.strip_height < 1:
+        parser.error("--strip-height must be at least 1")
+
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    pygame.init()
+    pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
+    tab = Tab(args.page)
+    tab.load()
+    tab.activate()
+    tab.render()
+    resources.wait_idle()  # SVG images arrive in the background
+    paths = export_tab(tab, args.out, args.tiles, args.strip_height, args.level)
+    print(f"{SCREEN_WIDTH}x{tab.content_height} page -> {len(paths)} file(s): {paths[0]}"
+          + (f" ... {paths[-1]}" if len(paths) > 1 else ""))
+    tab.unload()
+
+
+if __name__ == "__main__":
+    main()
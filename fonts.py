@@ -0,0 +1,120 @@
+"""
+fonts
+
+Description:
+Shared font registry. Fonts are only created the first time they are
+used, and every font is shared between all callers asking for the same
+family, size and style. Looking a family up in the system font list is
+slow (pygame scans every installed font), so the family -> file result
+is stored in an on-disk cache and later launches skip the scan.
+"""
+import json, os
+import pygame.freetype
+
+FONT_CACHE_PATH = os.path.join(os.path.expanduser("~"), ".cache", "sequoia", "fonts.json")
+FONT_CACHE_VERSION = 1
+
+
+class FontRegistry:
+    def __init__(self, cache_path=FONT_CACHE_PATH):
+        self.cache_path = cache_path
+        self.fonts = {}          # (family, size, bold, italic) -> Font
+        self.resolved = None     # "family|bold|italic" -> [path, fake_bold, fake_italic]
+        self.dirty = False
+
+    # --- Family resolution ---
+    def load_cache(self):
+        self.resolved = {}
+        if not self.cache_path:
+            return
+        try:
+            with open(self.cache_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("version") == FONT_CACHE_VERSION:
+                self.resolved = data.get("fonts", {})
+        except (OSError, ValueError):
+            pass
+
+    def save_cache(self):
+        """Atomically write the family -> file lookups to disk."""
+        if not self.dirty or not self.cache_path:
+            return
+        try:
+            os.makedirs(os.path.dirname(self.cache_path), exist_ok=True)
+            tmp_path = f"{self.cache_path}.{os.getpid()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump({"version": FONT_CACHE_VERSION, "fonts": self.resolved}, f)
+            os.replace(tmp_path, self.cache_path)
+            self.dirty = False
+        except OSError:
+            pass
+
+    def resolve(self, family, bold=False, italic=False):
+        """Return (path, fake_bold, fake_italic) for a family, scanning system fonts only on a cache miss."""
+        if self.resolved is None:
+            self.load_cache()
+        key = f"{family.lower()}|{int(bold)}|{int(italic)}"
+        entry = self.resolved.get(key)
+        if entry is not None and (entry[0] is None or os.path.exists(entry[0])):
+            return tuple(entry)
+
+        # Let pygame's SysFont do the search, capturing what it would load
+        found = []
+        def capture(path, size, fake_bold, fake_italic):
+            found.append([path, fake_bold, fake_italic])
+        pygame.freetype.SysFont(family, 1, bold, italic, constructor=capture)
+
+        self.resolved[key] = found[0]
+        self.dirty = True
+        self.save_cache()
+        return tuple(found[0])
+
+    # --- Font access ---
+    def get(self, family="Arial", size=16, bold=False, italic=False):
+        key = (family, int(size), bold, italic)
+        font = self.fonts.get(key)
+        if font is None:
+            if not pygame.freetype.get_init():
+                pygame.freetype.init()
+            path, fake_bold, fake_italic = self.resolve(family, bold, italic)
+            font = pygame.freetype.Font(path, int(size))
+            font.strong = fake_bold
+            font.oblique = fake_italic
+            self.fonts[key] = font
+        return font
+
+    def key_of(self, font):
+        """The (family, size, bold, italic) font was created for, or None."""
+        for key, value in self.fonts.items():
+            if value is font:
+                return key
+        return None
+
+    def clear(self):
+        self.fonts.clear()
+
+
+class FontTable:
+    """Maps names (e.g. tags) to font specs, creating each font on first lookup."""
+
+    def __init__(self, specs, registry):
+        self.specs = specs
+        self.registry = registry
+
+    def __getitem__(self, name):
+        return self.registry.get(*self.specs[name])
+
+    def __contains__(self, name):
+        return name in self.specs
+
+    def get(self, name, default=None):
+        if name in self.specs:
+            return self[name]
+        return default
+
+    def keys(self):
+        return self.specs.keys()
+
+
+registry = FontRegistry()
+get_font = registry.get
@@ -0,0 +1,376 @@
+"""
+hotreload
+
+Description:
+Reloads the page being viewed when its file, or an SVG image it shows,
+is edited, without restarting the browser or losing widget state.
+
+A FileWatcher notices the edits: through inotify on Linux (the
+directories are watched, since editors often save by renaming a new
+file over the old one), otherwise by polling mtimes. It runs on a
+background thread and, like the resource loader (see resources.py),
+hands changes to the UI thread in deliver(); notify wakes the main loop.
+
+patch() then brings the open document in line with the re-parsed page,
+changing only the nodes whose source changed. Nodes are matched by a
+hash of their subtree's source first (unchanged subtrees, even if
+moved), then by tag and id, or tag alone, in order, so untouched nodes
+keep their cached layout, text surfaces and widgets (e.g. what was
+typed into an Input), and only the edited part of the page is laid out
+and painted again.
+"""
+import ctypes, ctypes.util, os, struct, threading, time
+from render import forget_svg
+
+POLL_INTERVAL = 0.5  # seconds between mtime checks without inotify
+
+# inotify(7)
+IN_CLOSE_WRITE = 0x008
+IN_MOVED_TO = 0x080
+IN_Q_OVERFLOW = 0x4000
+WATCH_MASK = IN_CLOSE_WRITE | IN_MOVED_TO
+EVENT = struct.Struct("iIII")  # wd, mask, cookie, name length
+
+# Input attributes a widget is created from (see render.input_widget);
+# changing one of these replaces the widget, any other edit keeps it
+WIDGET_ATTRS = {"type", "min", "max", "name"}
+
+
+# --- Watching ---
+class Watch:
+    """Files one owner wants to hear about. cancel() stops watching them."""
+
+    def __init__(self, watcher, paths, callback):
+        self.watcher = watcher
+        self.paths = set()
+        self.callback = callback
+        self.update(paths)
+
+    def update(self, paths):
+        """Watch paths instead of the current set."""
+        paths = {os.path.abspath(path) for path in paths}
+        self.watcher._change(self, paths - self.paths, self.paths - paths)
+        self.paths = paths
+
+    def cancel(self):
+        self.update(())
+
+
+class FileWatcher:
+    def __init__(self, notify=None, poll_interval=POLL_INTERVAL):
+        self.notify = notify
+        self.poll_interval = poll_interval
+        self.watches = {}     # path -> set of Watch
+        self.directories = {}  # directory -> [inotify watch descriptor, number of paths]
+        self.descriptors = {}  # watch descriptor -> directory
+        self.mtimes = {}       # path -> (mtime, size), when polling
+        self.changed = set()   # paths waiting for deliver()
+        self.lock = threading.Lock()
+        self.thread = None
+        self.inotify = None    # (libc, fd), or None when polling
+
+    # --- Background thread ---
+    def _start(self):
+        self.inotify = self._open_inotify()
+        target = self._read_events if self.inotify is not None else self._poll
+        self.thread = threading.Thread(target=target, name="hotreload", daemon=True)
+        self.thread.start()
+
+    @staticmethod
+    def _open_inotify():
+        name = ctypes.util.find_library("c")
+        try:
+            libc = ctypes.CDLL(name, use_errno=True)
+            fd = libc.inotify_init1(os.O_CLOEXEC)
+        except (OSError, AttributeError):
+            return None  # not Linux
+        return (libc, fd) if fd >= 0 else None
+
+    def _read_events(self):
+        libc, fd = self.inotify
+        while True:
+            try:
+                data = os.read(fd, 64 * 1024)
+            except OSError:
+                return
+            paths = set()
+            with self.lock:
+                for wd, mask, _, length, name in self._parse_events(data):
+                    if mask & IN_Q_OVERFLOW:
+                        paths.update(self.watches)  # events were lost: check everything
+                        continue
+                    directory = self.descriptors.get(wd)
+                    if directory is not None:
+                        paths.add(os.path.join(directory, name))
+            self._report(paths)
+
+    @staticmethod
+    def _parse_events(data):
+        offset = 0
+        while offset + EVENT.size <= len(data):
+            wd, mask, cookie, length = EVENT.unpack_from(data, offset)
+            offset += EVENT.size
+            name = data[offset:offset + length].split(b"\0", 1)[0]
+            offset += length
+            yield wd, mask, cookie, length, os.fsdecode(name)
+
+    def _poll(self):
+        while True:
+            time.sleep(self.poll_interval)
+            with self.lock:
+                paths = list(self.watches)
+            changed = set()
+            for path in paths:
+                stamp = self._stamp(path)
+                with self.lock:
+                    if path in self.mtimes and self.mtimes[path] != stamp:
+                        changed.add(path)
+                    if path in self.watches:
+                        self.mtimes[path] = stamp
+            self._report(changed)
+
+    @staticmethod
+    def _stamp(path):
+        try:
+            stat = os.stat(path)
+            return stat.st_mtime_ns, stat.st_size
+        except OSError:
+            return None
+
+    def _report(self, paths):
+        with self.lock:
+            paths = {path for path in paths if path in self.watches}
+            if not paths:
+                return
+            # One wake-up per batch: the UI delivers everything that piled up
+            wake = not self.changed
+            self.changed |= paths
+        if wake and self.notify is not None:
+            self.notify()
+
+    # --- Watches (UI thread) ---
+    def watch(self, paths, callback):
+        """Call callback(changed paths) on the UI thread (from deliver) when any of paths changes."""
+        if self.thread is None:
+            self._start()
+        return Watch(self, paths, callback)
+
+    def _change(self, watch, added, removed):
+        with self.lock:
+            for path in added:
+                owners = self.watches.setdefault(path, set())
+                if not owners:
+                    self._add_path(path)
+                owners.add(watch)
+            for path in removed:
+                owners = self.watches.get(path)
+                if owners is None:
+                    continue
+                owners.discard(watch)
+                if not owners:
+                    del self.watches[path]
+                    self._remove_path(path)
+
+    def _add_path(self, path):
+        if self.inotify is None:
+            self.mtimes[path] = self._stamp(path)
+            return
+        directory = os.path.dirname(path)
+        entry = self.directories.get(directory)
+        if entry is None:
+            libc, fd = self.inotify
+            wd = libc.inotify_add_watch(fd, os.fsencode(directory), WATCH_MASK)
+            if wd < 0:
+                return  # missing directory: nothing to hear about
+            entry = self.directories[directory] = [wd, 0]
+            self.descriptors[wd] = directory
+        entry[1] += 1
+
+    def _remove_path(self, path):
+        self.mtimes.pop(path, None)
+        if self.inotify is None:
+            return
+        directory = os.path.dirname(path)
+        entry = self.directories.get(directory)
+        if entry is None:
+            return
+        entry[1] -= 1
+        if not entry[1]:
+            libc, fd = self.inotify
+            libc.inotify_rm_watch(fd, entry[0])
+            del self.directories[directory]
+            del self.descriptors[entry[0]]
+
+    # --- Delivery (UI thread) ---
+    def deliver(self):
+        """Run the callbacks of watches whose files changed. Returns how many ran."""
+        with self.lock:
+            if not self.changed:
+                return 0
+            changed, self.changed = self.changed, set()
+            calls = {}
+            for path in changed:
+                for watch in self.watches.get(path, ()):
+                    calls.setdefault(watch, set()).add(path)
+        for watch, paths in calls.items():
+            watch.callback(paths)
+        return len(calls)
+
+
+# --- Patching ---
+def hash_subtree(root):
+    """
+    Set _source_hash, a hash of the tag, text, attributes and (recursively)
+    children, on root and the nodes under it that don't have one yet.
+    Documents keep theirs from one reload to the next, so only the fresh
+    parse is hashed in full.
+    """
+    stack, order = [root], []
+    while stack:
+        node = stack.pop()
+        if node._source_hash is None:
+            order.append(node)
+            stack.extend(node.children)
+    # Children come after their parent in order, so reversed they come first
+    for node in reversed(order):
+        children = node.children
+        node._source_hash = hash((node.tag, node.text, tuple(node.attrs.items()),
+                                  tuple([child._source_hash for child in children]) if children else ()))
+
+
+def node_key(node):
+    """
+    What a changed node is matched by: its tag and id, or else its tag.
+    update_node keeps the old node's tag, so an id never matches across tags.
+    """
+    element_id = node.attrs.get("id") if node.tag != "text" else None
+    return ("#", node.tag, element_id) if element_id else node.tag
+
+
+class PatchStats:
+    """What patch() changed, in nodes."""
+
+    def __init__(self):
+        self.updated = self.inserted = self.removed = self.moved = 0
+
+    @property
+    def changed(self):
+        return self.updated + self.inserted + self.removed + self.moved
+
+    def __repr__(self):
+        return (f"<PatchStats updated={self.updated} inserted={self.inserted} "
+                f"removed={self.removed} moved={self.moved}>")
+
+
+def patch(document, new_document):
+    """
+    Change document, in place, into new_document (a fresh parse of the
+    same page). new_document is taken apart in the process.
+    """
+    stats = PatchStats()
+    hash_subtree(document)
+    hash_subtree(new_document)
+    new_resolver = getattr(new_document, "style_resolver", None)
+    old_resolver = getattr(document, "style_resolver", None)
+    if new_resolver is not None and (old_resolver is None or old_resolver.sources != new_resolver.sources):
+        document.style_resolver = new_resolver
+        document.invalidate_style()
+    # Pairs of matched nodes; a loop rather than recursion, since unclosed
+    # tags can nest pages thousands of levels deep
+    pairs = [(document, new_document)]
+    while pairs:
+        old, new = pairs.pop()
+        if old._source_hash == new._source_hash:
+            continue
+        update_node(old, new, stats)
+        pairs.extend(patch_children(old, new, stats))
+        old._source_hash = new._source_hash
+    return stats
+
+
+def update_node(old, new, stats):
+    """Copy new's text and attributes onto old (same tag)."""
+    changed = False
+    if old.text != new.text:
+        if old.tag == "text":
+            old.set_text(new.text)
+        else:
+            old.text = new.text
+            old.mark_dirty()
+        changed = True
+    if old.attrs != new.attrs:
+        if old.tag == "input" and any(old.attrs.get(key) != new.attrs.get(key) for key in WIDGET_ATTRS):
+            old._release_widgets(recycle=True)
+        if old.tag == "svg":
+            forget_svg(old)
+        for key in [key for key in old.attrs if key not in new.attrs]:
+            old.remove_attribute(key)
+        for key, value in new.attrs.items():
+            if old.attrs.get(key) != value:
+                old.set_attribute(key, value)
+        changed = True
+    if changed:
+        stats.updated += 1
+
+
+def patch_children(old, new, stats):
+    """Make old's children match new's; returns the (old, new) child pairs left to patch."""
+    old_children, new_children = old.children, new.children
+    # Unchanged runs at either end (most edits touch one spot)
+    start = 0
+    end = min(len(old_children), len(new_children))
+    while start < end and old_children[start]._source_hash == new_children[start]._source_hash:
+        start += 1
+    old_end, new_end = len(old_children), len(new_children)
+    while (old_end > start and new_end > start
+           and old_children[old_end - 1]._source_hash == new_children[new_end - 1]._source_hash):
+        old_end -= 1
+        new_end -= 1
+    old_middle, new_middle = old_children[start:old_end], new_children[start:new_end]
+    if not old_middle and not new_middle:
+        return []
+
+    # Unchanged subtrees that moved, then changed nodes with the same id or tag
+    by_hash, by_key = {}, {}
+    for child in old_middle:
+        by_hash.setdefault(child._source_hash, []).append(child)
+    matches = [None] * len(new_middle)
+    for i, child in enumerate(new_middle):
+        candidates = by_hash.get(child._source_hash)
+        if candidates:
+            matches[i] = candidates.pop(0)
+    matched = set(match for match in matches if match is not None)
+    for child in old_middle:
+        if child not in matched:
+            by_key.setdefault(node_key(child), []).append(child)
+    pairs = []
+    for i, child in enumerate(new_middle):
+        if matches[i] is None:
+            candidates = by_key.get(node_key(child))
+            if candidates:
+                matches[i] = candidates.pop(0)
+                matched.add(matches[i])
+                pairs.append((matches[i], child))
+
+    for child in old_middle:
+        if child not in matched:
+            old.remove_child(child)
+            child.unload()  # the subtree is dropped: its widgets go back to the pool
+            stats.removed += 1
+    wanted = old_children[:start] + [match or child for match, child in zip(matches, new_middle)]
+    for index in range(start, start + len(new_middle)):
+        node = wanted[index]
+        if index < len(old.children) and old.children[index] is node:
+            continue
+        if node.parent is old:
+            old.move_child(index, node)
+            stats.moved += 1
+        else:
+            node.parent = None  # taken out of the new tree, which is thrown away
+            old.insert_child(index, node)
+            stats.inserted += 1
+    return pairs
+
+
+# Shared by every tab
+watcher = FileWatcher()
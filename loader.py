@@ -0,0 +1,512 @@
+"""
+loader
+
+Description:
+Loads pages in a worker process so the window keeps running while big
+pages are read, parsed and laid out. The worker lays the document out
+headlessly with the browser's fonts and viewport width (config.py) and
+sends the result back over a pipe in chunks:
+
+    progress   phase, done, total (parsing and the worker-side phases)
+    document   stylesheets and node count
+    nodes      pre-order node records: tag, text, parent index, attrs
+    display    item and widget counts of the layout
+    svgs       the parsed SVG images, the nodes showing them and the
+               nodes whose images are left to this side
+    layout     display list items, and the widgets placed among them
+    fragments  per-node cached layouts (see render.draw_node)
+    done       (or error, message)
+
+Display list items refer to fonts, DOM nodes and widgets, none of which
+can cross a process boundary, so they travel as font registry keys and
+node indices and are rebuilt on this side. PageLoader.pump adopts what
+has arrived within a time budget per frame, so the top of the page is
+shown while the rest is still coming. Messages are kept small, so
+receiving one never waits long on the pipe, and their records are
+adopted in batches of APPLY_BATCH, checking the budget between batches:
+what doesn't fit in a frame is carried over to the next. Full
+collections of the cyclic GC, which rescan the growing page and would
+cost a frame tens of ms, are held off meanwhile (see pause_collector).
+
+http:// pages are downloaded in this process, through the shared
+connection pool and response cache (see network.py and resources.py),
+and fed to the worker on its stdin.
+
+Local pages are parsed as the worker reads them, compressed or not (see
+pagesource.py), so "parsing" progress covers reading the file too.
+
+Worker usage: python loader.py page_path pipe_fd [- [charset]]
+    (- : read the page from stdin; charset: the encoding it was served in)
+"""
+import gc, os, subprocess, sys, threading, time
+from collections import deque
+from multiprocessing.connection import Connection
+import pygame
+from dom import Node
+from query import iter_subtree
+from style import StyleResolver
+from displaylist import DisplayList
+from render import (paint_svg, paint_table, table_widget,
+                    input_widget, button_widget, link_widget)
+from fonts import registry, get_font
+from network import is_url
+from resources import resources, URGENT, DeferredResources
+
+CHUNK_NODES = 1000       # node records per message
+CHUNK_ITEMS = 500        # display list items per message
+APPLY_BATCH = 100        # records adopted between checks of the frame's budget
+PUMP_BUDGET = 0.008      # seconds per frame spent adopting chunks
+
+PHASE_LABELS = {
+    "starting": "Starting",
+    "downloading": "Downloading",
+    "parsing": "Parsing",
+    "nodes": "Building document",
+    "layout": "Laying out",
+    "display": "Painting",
+}
+
+
+# ----------------- Worker -----------------
+
+def font_keys():
+    keys = {}
+    def key(font):
+        value = keys.get(font)
+        if value is None:
+            value = keys[font] = registry.key_of(font)
+        return value
+    return key
+
+
+def encode_item(item, ids, font_key, svg_index):
+    """
+    A display list item with fonts and nodes replaced by keys and indices.
+    svg_index: id(svg elements) -> index in the svgs message.
+    """
+    kind, bounds, args = item
+    bounds = tuple(bounds)
+    if kind == "text":
+        font, pos, text, color, source = args
+        if source is not None:
+            source = (ids[source[0]], source[1])
+        return ("text", bounds, (font_key(font), pos, text, color, source))
+    if kind == "call":
+        paint = args[0]
+        if paint is paint_svg:
+            return ("svg", bounds, (svg_index[id(args[1])], args[2]))
+        if paint is paint_table:
+            return ("table", bounds, (ids[args[1].node], font_key(args[2])))
+        raise ValueError(f"can't send paint callback {paint.__name__}")
+    return (kind, bounds, args)  # rect and line args are plain tuples
+
+
+def widget_owners(nodes, ids):
+    """id(widget) -> (kind, node index) for the widgets layout created."""
+    owners = {}
+    for node in nodes:
+        for kind, attr in (("input", "input_instance"), ("button", "button_instance"), ("link", "link_instance")):
+            widget = getattr(node, attr, None)
+            if widget is not None:
+                owners[id(widget)] = (kind, ids[node])
+    return owners
+
+
+def encode_widget(widget, owners):
+    kind, index = owners[id(widget)]
+    if kind == "link":
+        fragments = [(tuple(rect), text) for rect, text in widget.fragments]
+        return (kind, index, tuple(widget.rect), (widget.href, fragments))
+    return (kind, index, tuple(widget.rect), None)
+
+
+def run_worker(path, conn, data=None, charset=None):
+    """
+    Lay out the page at path (or data, its contents when given, served
+    in charset) and send it over conn.
+    """
+    from snapshot import parse_html_cached, parse_file_cached
+    from render import draw_node
+    from timers import TimerScheduler
+    from tabs import page_not_found, PAGE_TOP
+    from config import fonts
+
+    send = conn.send
+    try:
+        send(("progress", "parsing", 0, 1))
+        try:
+            if data is None:
+                root = parse_file_cached(path, lambda done, total: send(("progress", "parsing", done, total)))
+            else:
+                root = parse_html_cached(data, path, charset)
+                del data
+        except FileNotFoundError:
+            root = page_not_found(path)
+        if is_url(path):
+            # Remote images come through this process's connection pool and cache
+            root.base_url = path
+            root.resources = DeferredResources()
+
+        nodes = list(iter_subtree(root))
+        ids = {node: i for i, node in enumerate(nodes)}
+        resolver = getattr(root, "style_resolver", None)
+        send(("document", list(getattr(resolver, "sources", ())), len(nodes)))
+        for start in range(0, len(nodes), CHUNK_NODES):
+            send(("nodes", [(node.tag, node.text, ids[node.parent] if node.parent is not None else -1,
+                             node.attrs) for node in nodes[start:start + CHUNK_NODES]]))
+
+        send(("progress", "layout", 0, 1))
+        root.scheduler = TimerScheduler()
+        display_list, widgets = DisplayList(), []
+        draw_node(root, PAGE_TOP, display_list, fonts, widgets)
+
+        # SVG images were read and parsed here; send each one once, so the
+        # UI side never goes back to the filesystem for them
+        svgs, svg_index, svg_nodes, deferred = [], {}, [], []
+        for node in nodes:
+            elements = getattr(node, "svg_elements", None)
+            if elements is None:
+                if node.tag == "svg" and node.attrs.get("src"):
+                    deferred.append(ids[node])
+                continue
+            if id(elements) not in svg_index:
+                svg_index[id(elements)] = len(svgs)
+                svgs.append(elements)
+            svg_nodes.append((ids[node], svg_index[id(elements)]))
+        font_key = font_keys()
+        items = display_list.items
+        owners = widget_owners(nodes, ids)
+        send(("display", len(items), len(widgets)))
+        send(("svgs", svgs, svg_nodes, deferred))
+        next_widget = 0
+        for start in range(0, len(items), CHUNK_ITEMS):
+            chunk = items[start:start + CHUNK_ITEMS]
+            encoded = [encode_item(item, ids, font_key, svg_index) for item in chunk]
+            # Widgets go out with the items they sit among
+            bottom = max(bounds.bottom for _, bounds, _ in chunk)
+            end = next_widget
+            while end < len(widgets) and widgets[end].rect.top < bottom:
+                end += 1
+            send(("layout", encoded, [encode_widget(w, owners) for w in widgets[next_widget:end]]))
+            next_widget = end
+        if next_widget < len(widgets):
+            send(("layout", [], [encode_widget(w, owners) for w in widgets[next_widget:]]))
+
+        # Per-node layout caches, so later DOM changes relayout incrementally
+        widget_index = {id(w): i for i, w in enumerate(widgets)}
+        records = []
+        for node in nodes:
+            layout = node._layout
+            if layout is None:
+                continue
+            y, indent, parent_tag, height, _, start, end, fragment_widgets = layout
+            records.append((ids[node], y, indent, parent_tag, height, start, end,
+                            [(widget_index[id(w)], tuple(rect)) for w, rect in fragment_widgets]))
+            if len(records) >= CHUNK_NODES:
+                send(("fragments", records))
+                records = []
+        send(("fragments", records))
+        send(("done",))
+    except Exception as error:
+        send(("error", f"{type(error).__name__}: {error}"))
+        raise
+    finally:
+        conn.close()
+
+
+# ----------------- UI side -----------------
+
+class PageLoader:
+    """
+    Runs the worker for one page and rebuilds its document, display list
+    and widgets in this process as the chunks arrive.
+    """
+
+    def __init__(self, path, scheduler=None):
+        self.path = path
+        self.process = self.conn = None
+        self.download = None  # resources.Request while an http:// page downloads
+
+        # The document being built; node records fill it in
+        self.root = Node("document")
+        self.root.document = self.root
+        self.root.scheduler = scheduler
+        self.nodes = []
+        self.node_count = 0
+        self.text_bytes = 0    # counted as nodes arrive, for the tab's memory estimate
+        self.svg_nodes = []    # for the tab's file watcher
+
+        self.display_list = DisplayList()
+        self.svgs = []
+        self.deferred = []  # indices of nodes whose images the worker left to this side
+        self.widgets = []
+        self.widget_rects = []   # (widget, rect in document coordinates)
+        self.item_count = self.widget_count = 0
+
+        self.phase, self.done, self.total = "starting", 0, 1
+        self.backlog = deque()   # (handler, args) received but not adopted yet, in order
+        self.paused = False      # holds off full collections (see pause_collector)
+        self.finished = False
+        self.error = None
+
+        if is_url(path):
+            self.phase = "downloading"
+            self.download = resources.request(path, self.downloaded, URGENT)
+        else:
+            self.start()
+
+    def start(self, data=None, url=None, charset=None):
+        """
+        Start the worker; data: the page's contents when they were
+        downloaded here (from url, served in charset).
+        """
+        read_fd, write_fd = os.pipe()
+        try:
+            self.process = subprocess.Popen(
+                [sys.executable, os.path.abspath(__file__), url or self.path, str(write_fd)]
+                + (["-"] + ([charset] if charset else []) if data is not None else []),
+                pass_fds=(write_fd,), stdin=subprocess.PIPE if data is not None else None,
+                env=dict(os.environ, PYGAME_HIDE_SUPPORT_PROMPT="1"))
+        finally:
+            os.close(write_fd)
+        self.conn = Connection(read_fd, writable=False)
+        self.paused = True
+        pause_collector()
+        if data is not None:
+            # Written from a thread: a big page would fill the pipe and stall the frame
+            threading.Thread(target=feed, args=(self.process.stdin, data), daemon=True).start()
+
+    def downloaded(self, resource):
+        self.download = None
+        if self.finished:
+            return
+        if resource.error is not None:
+            self.fail(str(resource.error))
+            return
+        self.root.base_url = resource.url
+        self.start(resource.data, resource.url, resource.charset)
+
+    # --- Progress ---
+    @property
+    def progress(self):
+        """(label, fraction done or None when the phase can't tell)."""
+        label = PHASE_LABELS.get(self.phase, self.phase)
+        if self.phase == "nodes":
+            return label, len(self.nodes) / max(1, self.node_count)
+        if self.phase == "display":
+            return label, len(self.display_list) / max(1, self.item_count)
+        if self.phase in ("downloading", "layout"):
+            return label, None
+        return label, self.done / max(1, self.total)
+
+    # --- Receiving ---
+    def pump(self, budget=PUMP_BUDGET):
+        """
+        Adopt what the worker has sent for up to budget seconds. Returns
+        the document rects that got new paint items.
+        """
+        deadline = time.perf_counter() + budget
+        damage = []
+        while not self.finished and time.perf_counter() < deadline:
+            if not self.backlog:
+                if self.conn is None:
+                    break
+                try:
+                    if not self.conn.poll():
+                        break
+                    self.queue(self.conn.recv())
+                except (EOFError, OSError):
+                    self.fail("the loader process exited")
+                    break
+                continue
+            handler, args = self.backlog.popleft()
+            rect = handler(*args)
+            if rect is not None:
+                damage.append(rect)
+        return damage
+
+    def queue(self, message):
+        """Add a message to the backlog, its records split into batches of APPLY_BATCH."""
+        kind, args = message[0], message[1:]
+        if kind == "layout":
+            items, widgets = args
+            parts = [(items[i:i + APPLY_BATCH], []) for i in range(0, len(items), APPLY_BATCH)]
+            parts += [([], widgets[i:i + APPLY_BATCH]) for i in range(0, len(widgets), APPLY_BATCH)]
+        elif kind in ("nodes", "fragments"):
+            records = args[0]
+            parts = [(records[i:i + APPLY_BATCH],) for i in range(0, len(records), APPLY_BATCH)]
+        else:
+            parts = [args]
+        handler = getattr(self, "on_" + kind)
+        self.backlog.extend((handler, part) for part in parts)
+
+    def on_progress(self, phase, done, total):
+        self.phase, self.done, self.total = phase, done, total
+
+    def on_document(self, stylesheets, node_count):
+        self.root.style_resolver = StyleResolver(stylesheets)
+        self.node_count = node_count
+        self.phase = "nodes"
+
+    def on_nodes(self, records):
+        # Built without Node.__init__ like snapshot.deserialize; the
+        # document's query and text indexes are built on first use
+        nodes, root, svg_nodes = self.nodes, self.root, self.svg_nodes
+        new_node = Node.__new__
+        text_bytes = 0
+        for tag, text, parent, attrs in records:
+            text_bytes += len(text)
+            if parent < 0:
+                root.tag, root.text, root.attrs = tag, text, attrs
+                nodes.append(root)
+                continue
+            parent = nodes[parent]
+            node = new_node(Node)
+            node.__dict__ = {"tag": tag, "attrs": attrs, "text": text, "parent": parent,
+                             "children": [], "document": root, "link_instance": None}
+            parent.children.append(node)
+            nodes.append(node)
+            if tag == "svg":
+                svg_nodes.append(node)
+        self.text_bytes += text_bytes
+
+    def on_display(self, item_count, widget_count):
+        self.item_count, self.widget_count = item_count, widget_count
+        self.phase = "display"
+
+    def on_svgs(self, svgs, svg_nodes, deferred):
+        self.svgs = svgs
+        self.deferred = deferred
+        for index, svg in svg_nodes:
+            self.nodes[index].svg_elements = svgs[svg]
+
+    def on_layout(self, items, widgets):
+        nodes, add = self.nodes, self.display_list.add
+        damage = None
+        for kind, bounds, args in items:
+            if kind == "text":
+                key, pos, text, color, source = args
+                if source is not None:
+                    source = (nodes[source[0]], source[1])
+                add(kind, bounds, (get_font(*key), pos, text, color, source))
+            elif kind == "svg":
+                add("call", bounds, (paint_svg, self.svgs[args[0]], args[1]))
+            elif kind == "table":
+                node, key = nodes[args[0]], args[1]
+                table = table_widget(node, bounds[0], bounds[1])
+                add("call", bounds, (paint_table, table, get_font(*key)))
+            else:
+                add(kind, bounds, args)
+            damage = pygame.Rect(bounds) if damage is None else damage.union(bounds)
+        self.display_list.sources = None
+
+        for kind, index, rect, extra in widgets:
+            node, rect = nodes[index], pygame.Rect(rect)
+            if kind == "input":
+                widget = input_widget(node, rect)
+            elif kind == "button":
+                widget = button_widget(node, rect)
+            else:
+                href, fragments = extra
+                widget = link_widget(node, href, fragments)
+            self.widgets.append(widget)
+            self.widget_rects.append((widget, rect))
+        return damage
+
+    def on_fragments(self, records):
+        nodes, items, widgets = self.nodes, self.display_list.items, self.widgets
+        for index, y, indent, parent_tag, height, start, end, fragment_widgets in records:
+            # Only the root's cache refers to its list (see render.draw_node)
+            nodes[index]._layout = (y, indent, parent_tag, height, items if index == 0 else None, start, end,
+                                    [(widgets[w], pygame.Rect(rect)) for w, rect in fragment_widgets])
+
+    def on_done(self):
+        self.finished = True
+        self.resume()
+        self.close()  # reaps the worker, which exits right after sending this
+        # Lay the images the worker didn't load out again, which requests them
+        for index in self.deferred:
+            self.nodes[index].mark_dirty()
+
+    def on_error(self, message):
+        self.fail(message)
+
+    def fail(self, message):
+        self.error = message
+        self.finished = True
+        self.resume()
+        self.close()
+
+    # --- Shutdown ---
+    def cancel(self):
+        """Stop loading (the tab was closed)."""
+        if self.download is not None:
+            self.download.cancel()
+            self.download = None
+        if self.process is not None and self.process.poll() is None:
+            self.process.kill()
+        self.finished = True
+        self.resume()
+        self.close()
+
+    def resume(self):
+        """Let full collections run again as far as this load goes, once."""
+        if self.paused:
+            self.paused = False
+            resume_collector()
+
+    def close(self):
+        if self.process is None:
+            return
+        self.conn.close()
+        try:
+            self.process.wait(timeout=1)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+            self.process.wait()
+
+
+# --- Collector ---
+# Adopting a page allocates hundreds of thousands of objects that live as
+# long as the page, and no garbage: every full collection on the way
+# rescans the part that has arrived. Full collections are held off while
+# any page is adopted; the young generations, which stay small, still run.
+collector = {"pauses": 0, "threshold": None}
+
+
+def pause_collector():
+    if collector["pauses"] == 0:
+        collector["threshold"] = gc.get_threshold()
+        gen0, gen1, _ = collector["threshold"]
+        gc.set_threshold(gen0, gen1, 2 ** 30)
+    collector["pauses"] += 1
+
+
+def resume_collector():
+    collector["pauses"] -= 1
+    if collector["pauses"] == 0:
+        gc.set_threshold(*collector["threshold"])
+
+
+def feed(stream, data):
+    try:
+        stream.write(data)
+    except (BrokenPipeError, ValueError):
+        pass  # the worker was stopped
+    finally:
+        try:
+            stream.close()
+        except BrokenPipeError:
+            pass
+
+
+if __name__ == "__main__":
+    from_stdin = sys.argv[3:4] == ["-"]
+    data = sys.stdin.buffer.read() if from_stdin else None
+    charset = sys.argv[4] if from_stdin and len(sys.argv) > 4 else None
+    run_worker(sys.argv[1], Connection(int(sys.argv[2]), readable=False), data, charset)
+    # The page is sent: exit without freeing it object by object, so the
+    # UI side doesn't wait on that when it reaps this process
+    sys.stdout.flush()
+    sys.stderr.flush()
+    os._exit(0)
@@ -3,63 +3,56 @@ main
 
 Description: Simple DOM renderer with interactive elements
 """
-import pygame, sys
-from dom import parse_html, Node
-from render import Button, draw_node
-from config import current_page, SCREEN_WIDTH, SCREEN_HEIGHT, fonts
-
-BG_COLOR = (255, 255, 255)
+import pygame, sys, math
+from tabs import TabManager
+from window import Window
+from timers import scheduler
+from resources import resources
+from hotreload import watcher
+from config import current_page, SCREEN_WIDTH, SCREEN_HEIGHT
+
+FPS = 60  # upper bound while something is animating
+BUDGET_CHECK_INTERVAL = 30  # seconds between memory budget checks
+RESOURCES_READY = pygame.USEREVENT + 1  # posted by the resource loader thread to wake the loop
+FILES_CHANGED = pygame.USEREVENT + 2  # posted by the file watcher thread (see hotreload.py)
 
 pygame.init()
 screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
 clock = pygame.time.Clock()
-running = True
-
-def load_page(file_path):
-    try:
-        with open(file_path, "r") as f:
-            html_content = f.read()
-        dom = parse_html(html_content)
-        return dom
-    except FileNotFoundError:
-        root = Node("document")
-        root.add_child(Node("p", text=f"Page not found: {file_path}"))
-        return root
-
-dom = load_page(current_page)
+resources.notify = lambda: pygame.event.post(pygame.event.Event(RESOURCES_READY))
+watcher.notify = lambda: pygame.event.post(pygame.event.Event(FILES_CHANGED))
+
+def wait_for_events(timeout):
+    """Block until there is input or the timeout (in seconds) runs out."""
+    if timeout is None:
+        events = [pygame.event.wait()]
+    else:
+        event = pygame.event.wait(max(1, math.ceil(timeout * 1000)))
+        events = [] if event.type == pygame.NOEVENT else [event]
+    events.extend(pygame.event.get())
+    return events
+
+def next_timeout(*schedulers):
+    timeouts = [t for t in (s.time_until_next() for s in schedulers) if t is not None]
+    return min(timeouts) if timeouts else None
+
+# One tab per page given on the command line, loaded in worker processes
+tabs = TabManager(load_in_worker=True)
+for path in sys.argv[1:] or [current_page]:
+    tabs.open(path, activate=tabs.active is None)
+scheduler.call_every(BUDGET_CHECK_INTERVAL, tabs.enforce_budget)
+
+window = Window(screen, tabs)
+needs_frame = True  # pending invalidation, e.g. the first paint
 
 # --- Main loop ---
-while running:
-    dt = clock.tick(60) / 1000
-    screen.fill(BG_COLOR)
-
-    # Collect interactive elements during rendering
-    interactive_elements = []
-    draw_node(dom, 20, screen, fonts, interactive_elements)
-
-    # --- Update elements ---
-    for elem in interactive_elements:
-        if hasattr(elem, "update_hover"):
-            elem.update_hover()
-        if hasattr(elem, "update"):
-            elem.update(dt)
-
-    # --- Event handling ---
-    for event in pygame.event.get():
-        if event.type == pygame.QUIT:
-            running = False
-
-        for elem in interactive_elements:
-            if hasattr(elem, "handle_event"):
-                elem.handle_event(event)
-            if hasattr(elem, "check_click") and event.type == pygame.MOUSEBUTTONDOWN:
-                elem.check_click(event.pos)
-
-    # --- Draw all interactive elements ---
-    for elem in interactive_elements:
-        if hasattr(elem, "draw"):
-            elem.draw(screen, fonts.get("p", None))
-
-    pygame.display.flip()
+while window.running:
+    # Sleep until input arrives, a timer is due or something was invalidated
+    if not needs_frame:
+        events = wait_for_events(next_timeout(scheduler, tabs.active.scheduler))
+    else:
+        events = pygame.event.get()  # don't sleep, but don't miss input either
+    clock.tick(FPS)
+    needs_frame = window.frame(events)
 
 sys.exit()
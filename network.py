@@ -0,0 +1,391 @@
+"""
+network
+
+Description:
+http:// (and https://) loading for pages and the files they refer to.
+Connections are kept alive in a small pool per host and reused, so
+repeat requests skip the TCP handshake. Responses are decoded (gzip,
+deflate) and kept in a ResponseCache that follows Cache-Control, ETag
+and Last-Modified:
+
+    fresh entries       served without a request (max-age, Expires)
+    stale entries       revalidated with If-None-Match / If-Modified-Since;
+                        a 304 reuses the cached body
+    no-store            never stored; no-cache is always revalidated
+
+The shared cache is backed by the disk cache (see diskcache.py), so a
+page visited in an earlier launch is revalidated rather than downloaded.
+
+fetch() blocks; the browser calls it from the resource loader's threads
+(see resources.py) and headless tools call it directly.
+"""
+import gzip, http.client, json, threading, time, zlib
+from collections import OrderedDict
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlsplit, urljoin
+from diskcache import disk_cache, content_hash
+
+TIMEOUT = 10                 # seconds to wait on a server
+MAX_IDLE_PER_HOST = 4        # idle keep-alive connections kept per host
+IDLE_TIMEOUT = 30            # seconds before an idle connection is dropped instead of reused
+MAX_REDIRECTS = 5
+READ_BLOCK = 64 * 1024       # bytes read between progress callbacks
+RESPONSE_CACHE_BYTES = 32 * 1024 * 1024
+USER_AGENT = "Sequoia"
+REDIRECTS = (301, 302, 303, 307, 308)
+
+
+class HTTPError(OSError):
+    """A response the page can't be shown from (4xx, 5xx, too many redirects, a corrupt body)."""
+
+    def __init__(self, url, status, reason=""):
+        super().__init__(f"{status} {reason}".strip() + f" for {url}")
+        self.url = url
+        self.status = status
+
+
+def is_url(path):
+    return path.startswith(("http://", "https://"))
+
+
+def content_charset(headers):
+    """The charset parameter of a response's Content-Type, or None."""
+    for parameter in headers.get("content-type", "").split(";")[1:]:
+        name, _, value = parameter.partition("=")
+        if name.strip().lower() == "charset":
+            return value.strip().strip('"') or None
+    return None
+
+
+def resolve(base, reference):
+    """reference relative to the document at base (only URLs are resolved; local paths stay as they are)."""
+    return urljoin(base, reference) if base and is_url(base) else reference
+
+
+class Response:
+    """
+    A decoded response. source: "network", "revalidated" (a 304 reused
+    the cached body) or "cache" (fresh, no request was made).
+    """
+
+    def __init__(self, url, status, headers, body, source="network", version=None):
+        self.url = url
+        self.status = status
+        self.headers = headers  # lower-case name -> value
+        self.body = body
+        self.source = source
+        # Changes whenever the body does (ETag, Last-Modified or a checksum)
+        self.version = version if version is not None else (
+            headers.get("etag") or headers.get("last-modified") or zlib.crc32(body))
+
+
+# --- Connections ---
+class ConnectionPool:
+    """Idle keep-alive connections per (scheme, host, port)."""
+
+    def __init__(self, max_idle=MAX_IDLE_PER_HOST, idle_timeout=IDLE_TIMEOUT):
+        self.max_idle = max_idle
+        self.idle_timeout = idle_timeout
+        self.idle = {}  # key -> [(connection, time it went idle)], most recent last
+        self.lock = threading.Lock()
+        self.opened = self.reused = 0  # for profiling
+
+    def get(self, scheme, host, port):
+        """(connection, reused) for a request to host."""
+        key = (scheme, host, port)
+        now = time.monotonic()
+        with self.lock:
+            idle = self.idle.get(key, [])
+            while idle:
+                connection, since = idle.pop()
+                if now - since < self.idle_timeout:
+                    self.reused += 1
+                    return connection, True
+                connection.close()
+            self.opened += 1
+        cls = http.client.HTTPSConnection if scheme == "https" else http.client.HTTPConnection
+        return cls(host, port, timeout=TIMEOUT), False
+
+    def put(self, scheme, host, port, connection):
+        """Give back a connection whose response has been read completely."""
+        with self.lock:
+            idle = self.idle.setdefault((scheme, host, port), [])
+            if len(idle) >= self.max_idle:
+                idle.pop(0)[0].close()
+            idle.append((connection, time.monotonic()))
+
+    def close(self):
+        with self.lock:
+            for idle in self.idle.values():
+                for connection, _ in idle:
+                    connection.close()
+            self.idle.clear()
+
+
+# --- Cache ---
+def cache_directives(value):
+    """'max-age=60, no-cache' -> {"max-age": "60", "no-cache": ""}"""
+    directives = {}
+    for part in (value or "").split(","):
+        name, _, argument = part.strip().partition("=")
+        if name:
+            directives[name.lower()] = argument.strip('"')
+    return directives
+
+
+def http_date(value):
+    """Seconds since the epoch for an HTTP date, or None."""
+    try:
+        return parsedate_to_datetime(value).timestamp() if value else None
+    except (TypeError, ValueError):
+        return None
+
+
+class CacheEntry:
+    __slots__ = ("body", "headers", "version", "stored", "expires")
+
+    def __init__(self, body, headers, version):
+        self.body = body
+        self.version = version
+        self.update(headers)
+
+    def update(self, headers):
+        """Take freshness and validators from a 200 or 304 response."""
+        self.headers = headers
+        self.stored = time.time()
+        self.expires = freshness_deadline(headers, self.stored)
+
+    @property
+    def fresh(self):
+        return self.expires is not None and time.time() < self.expires
+
+    def validators(self):
+        headers = {}
+        if "etag" in self.headers:
+            headers["If-None-Match"] = self.headers["etag"]
+        if "last-modified" in self.headers:
+            headers["If-Modified-Since"] = self.headers["last-modified"]
+        return headers
+
+
+def freshness_deadline(headers, now):
+    """When a response stops being fresh (None: revalidate every time)."""
+    directives = cache_directives(headers.get("cache-control"))
+    if "no-cache" in directives or "must-revalidate" in directives and "max-age" not in directives:
+        return None
+    try:
+        age = float(headers.get("age", 0) or 0)
+    except ValueError:
+        return None  # how old it already is can't be told
+    if "max-age" in directives:
+        try:
+            return now + int(directives["max-age"]) - age
+        except ValueError:
+            return None
+    expires = http_date(headers.get("expires"))
+    if expires is not None:
+        date = http_date(headers.get("date")) or now
+        return now + (expires - date) - age
+    return None
+
+
+def cacheable(response):
+    """Worth keeping: allowed, and either fresh for a while or revalidatable."""
+    if response.status != 200:
+        return False
+    directives = cache_directives(response.headers.get("cache-control"))
+    if "no-store" in directives:
+        return False
+    headers = response.headers
+    return ("etag" in headers or "last-modified" in headers or "max-age" in directives
+            or "expires" in headers)
+
+
+class ResponseCache:
+    """
+    Decoded responses by URL, least recently used dropped past max_bytes.
+    With a disk cache (see diskcache.py) entries outlive the process: the
+    headers are stored per URL and the body under its content hash.
+    """
+
+    def __init__(self, max_bytes=RESPONSE_CACHE_BYTES, disk=None):
+        self.max_bytes = max_bytes
+        self.disk = disk
+        self.entries = OrderedDict()  # url -> CacheEntry
+        self.size = 0
+        self.lock = threading.Lock()
+
+    def get(self, url):
+        with self.lock:
+            entry = self.entries.get(url)
+            if entry is not None:
+                self.entries.move_to_end(url)
+                return entry
+        entry = self.load(url)
+        if entry is not None:
+            self.add(url, entry)
+        return entry
+
+    def store(self, url, response):
+        if not cacheable(response) or len(response.body) > self.max_bytes:
+            self.remove(url)
+            return
+        entry = CacheEntry(response.body, response.headers, response.version)
+        self.add(url, entry)
+        self.save(url, entry, body=True)
+
+    def revalidated(self, url, entry, headers):
+        """A 304 came back for entry: take its headers and freshness."""
+        entry.update(dict(entry.headers, **headers))
+        self.save(url, entry)
+
+    def add(self, url, entry):
+        with self.lock:
+            old = self.entries.pop(url, None)
+            if old is not None:
+                self.size -= len(old.body)
+            self.entries[url] = entry
+            self.size += len(entry.body)
+            while self.size > self.max_bytes:
+                _, dropped = self.entries.popitem(last=False)
+                self.size -= len(dropped.body)
+
+    def remove(self, url):
+        with self.lock:
+            old = self.entries.pop(url, None)
+            if old is not None:
+                self.size -= len(old.body)
+        if self.disk is not None:
+            self.disk.remove(self.disk.key("response", url))
+
+    # --- Disk ---
+    def save(self, url, entry, body=False):
+        if self.disk is None:
+            return
+        body_key = self.disk.key("body", content_hash(entry.body))
+        if body:
+            self.disk.put(body_key, entry.body)
+        record = {"headers": entry.headers, "version": entry.version, "body": body_key,
+                  "stored": entry.stored, "expires": entry.expires}
+        self.disk.put(self.disk.key("response", url), json.dumps(record).encode("utf-8"))
+
+    def load(self, url):
+        if self.disk is None:
+            return None
+        data = self.disk.get(self.disk.key("response", url))
+        if data is None:
+            return None
+        try:
+            record = json.loads(data)
+            body = self.disk.get(record["body"])
+            if body is None:
+                return None  # trimmed away
+            entry = CacheEntry(body, record["headers"], record["version"])
+            entry.stored, entry.expires = record["stored"], record["expires"]
+            return entry
+        except (ValueError, KeyError, TypeError):
+            return None
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.size = 0
+
+
+# --- Fetching ---
+def decode(body, encoding):
+    encoding = (encoding or "identity").strip().lower()
+    if encoding in ("gzip", "x-gzip"):
+        return gzip.decompress(body)
+    if encoding == "deflate":
+        try:
+            return zlib.decompress(body)
+        except zlib.error:
+            return zlib.decompress(body, -zlib.MAX_WBITS)  # raw deflate, sent by some servers
+    return body
+
+
+def read_body(response, progress=None):
+    total = int(response.getheader("Content-Length") or 0)
+    blocks, done = [], 0
+    while True:
+        block = response.read(READ_BLOCK)
+        if not block:
+            break
+        blocks.append(block)
+        done += len(block)
+        if progress is not None:
+            progress(done, total)
+    return b"".join(blocks)
+
+
+def request(url, headers, progress=None, pool=None):
+    """One GET over a pooled connection: (status, reason, headers, raw body)."""
+    pool = pool or connections
+    parts = urlsplit(url)
+    scheme, host = parts.scheme, parts.hostname
+    port = parts.port or (443 if scheme == "https" else 80)
+    target = (parts.path or "/") + (f"?{parts.query}" if parts.query else "")
+    headers = dict(headers, **{"Host": parts.netloc, "User-Agent": USER_AGENT,
+                               "Accept-Encoding": "gzip, deflate"})
+    while True:
+        connection, reused = pool.get(scheme, host, port)
+        try:
+            connection.request("GET", target, headers=headers)
+            response = connection.getresponse()
+            body = read_body(response, progress)
+        except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+            connection.close()
+            if reused:
+                continue  # the server closed an idle connection; GET is safe to retry
+            raise
+        except Exception:
+            connection.close()
+            raise
+        if response.will_close:
+            connection.close()
+        else:
+            pool.put(scheme, host, port, connection)
+        return response.status, response.reason, {k.lower(): v for k, v in response.getheaders()}, body
+
+
+def fetch(url, progress=None, pool=None, cache=None):
+    """
+    GET url, following redirects, through the pool and response cache.
+    progress(done, total) is called as the body arrives (total is 0 when
+    the server doesn't say). Raises HTTPError or OSError, also for
+    malformed responses and bodies that don't decode.
+    """
+    cache = cache if cache is not None else responses
+    status = 0
+    for _ in range(MAX_REDIRECTS + 1):
+        entry = cache.get(url)
+        if entry is not None and entry.fresh:
+            return Response(url, 200, entry.headers, entry.body, "cache", entry.version)
+        try:
+            status, reason, headers, body = request(url, entry.validators() if entry else {}, progress, pool)
+        except (http.client.HTTPException, ValueError) as error:
+            # A malformed response (e.g. a truncated body, a bad Content-Length)
+            raise OSError(f"bad response from {url}: {error!r}") from error
+        if status == 304 and entry is not None:
+            cache.revalidated(url, entry, headers)
+            return Response(url, 200, entry.headers, entry.body, "revalidated", entry.version)
+        if status in REDIRECTS and "location" in headers:
+            url = urljoin(url, headers["location"])
+            continue
+        if status >= 400:
+            cache.remove(url)
+            raise HTTPError(url, status, reason)
+        try:
+            body = decode(body, headers.get("content-encoding"))
+        except (zlib.error, OSError, EOFError) as error:  # gzip raises BadGzipFile and EOFError
+            raise HTTPError(url, status, f"corrupt {headers['content-encoding']} body") from error
+        response = Response(url, status, headers, body)
+        cache.store(url, response)
+        return response
+    raise HTTPError(url, status, "too many redirects")
+
+
+# Shared by every tab (and by the resource loader's threads)
+connections = ConnectionPool()
+responses = ResponseCache(disk=disk_cache)
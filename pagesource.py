@@ -0,0 +1,163 @@
+"""
+pagesource
+
+Description:
+Reads page files for the parser without copying them whole into
+memory first. Pages can be plain or compressed (.gz, .bz2, .xz):
+compressed pages are decompressed as a stream, and large plain ones are
+memory-mapped. The bytes are decoded incrementally in the page's
+encoding and fed to dom.DocumentParser block by block.
+
+The encoding comes from, in order: a byte order mark, the caller (e.g.
+an HTTP Content-Type charset), a <meta charset> or <meta http-equiv>
+in the first PRESCAN_BYTES of the page, and UTF-8.
+"""
+import bz2, codecs, gzip, lzma, mmap, os, re
+from dom import DocumentParser
+
+READ_BLOCK = 1 << 20           # bytes decoded and parsed at a time
+MMAP_THRESHOLD = 1 << 20       # plain files at least this big are memory-mapped
+PRESCAN_BYTES = 1024           # how far into the page <meta charset> is looked for
+DEFAULT_ENCODING = "utf-8"
+
+COMPRESSED = {".gz": gzip.open, ".bz2": bz2.open, ".xz": lzma.open}  # each takes a file object
+
+BOMS = (
+    (codecs.BOM_UTF32_LE, "utf-32-le"),  # before UTF-16 LE, which it starts with
+    (codecs.BOM_UTF32_BE, "utf-32-be"),
+    (codecs.BOM_UTF8, "utf-8"),
+    (codecs.BOM_UTF16_LE, "utf-16-le"),
+    (codecs.BOM_UTF16_BE, "utf-16-be"),
+)
+META_CHARSET = re.compile(rb"""<meta[^>]*?charset\s*=\s*["']?\s*([-\w.:]+)""", re.IGNORECASE)
+
+
+# --- Encoding ---
+def known_encoding(name):
+    """Python's codec name for a charset label, or None if there is no such codec."""
+    try:
+        return codecs.lookup(name.strip()).name
+    except (LookupError, AttributeError):
+        return None
+
+
+def detect_encoding(head, hint=None):
+    """
+    (encoding, BOM length) for a page starting with head. hint: an
+    encoding the page came with (e.g. from a Content-Type header).
+    """
+    for bom, encoding in BOMS:
+        if head.startswith(bom):
+            return encoding, len(bom)
+    encoding = known_encoding(hint) if hint else None
+    if encoding is None:
+        match = META_CHARSET.search(head[:PRESCAN_BYTES])
+        if match:
+            encoding = known_encoding(match.group(1).decode("ascii", "replace"))
+            # A page that says UTF-16 but has no BOM was transcoded; its
+            # meta tag was readable as ASCII, so it isn't UTF-16 any more
+            if encoding is not None and encoding.startswith(("utf-16", "utf-32")):
+                encoding = DEFAULT_ENCODING
+    return encoding or DEFAULT_ENCODING, 0
+
+
+def decode_page(data, hint=None):
+    """All of a page's bytes as text (for pages that are already in memory)."""
+    encoding, bom = detect_encoding(bytes(data[:PRESCAN_BYTES]), hint)
+    return codecs.decode(data[bom:], encoding, "replace")
+
+
+# --- Reading ---
+class PageFile:
+    """
+    A page file opened for reading: iterate over it for its (decompressed)
+    bytes in blocks. raw is the file as stored: an mmap of it for plain
+    files (hash it without reading it into memory), or its bytes.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, "rb")
+        self.size = os.fstat(self.file.fileno()).st_size
+        self.mapped = None
+        self.stream = None
+        opener = COMPRESSED.get(os.path.splitext(path)[1].lower())
+        if opener is not None:
+            self.stream = opener(self.file)
+        elif self.size >= MMAP_THRESHOLD:
+            self.mapped = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    @property
+    def raw(self):
+        if self.mapped is not None:
+            return self.mapped
+        self.file.seek(0)
+        return self.file.read()
+
+    @property
+    def position(self):
+        """Bytes of the stored file consumed so far (for progress)."""
+        return self.file.tell()
+
+    def __iter__(self):
+        if self.mapped is not None:
+            for start in range(0, self.size, READ_BLOCK):
+                self.file.seek(min(self.size, start + READ_BLOCK))  # keeps position honest
+                yield self.mapped[start:start + READ_BLOCK]
+            return
+        self.file.seek(0)
+        stream = self.stream or self.file
+        for block in iter(lambda: stream.read(READ_BLOCK), b""):
+            yield block
+
+    def close(self):
+        if self.stream is not None:
+            self.stream.close()
+        if self.mapped is not None:
+            self.mapped.close()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def parse_blocks(blocks, hint=None, progress=None):
+    """
+    Decode and parse a page arriving as byte blocks. progress() is called
+    after each block.
+    """
+    parser = DocumentParser()
+    decoder = None
+    head = b""
+    for block in blocks:
+        if decoder is None:
+            # Wait for enough of the page to find its encoding
+            head += block
+            if len(head) < PRESCAN_BYTES:
+                continue
+            encoding, bom = detect_encoding(head, hint)
+            decoder = codecs.getincrementaldecoder(encoding)("replace")
+            block = head[bom:]
+        parser.feed(decoder.decode(block))
+        if progress is not None:
+            progress()
+    if decoder is None:
+        encoding, bom = detect_encoding(head, hint)
+        decoder = codecs.getincrementaldecoder(encoding)("replace")
+        parser.feed(decoder.decode(head[bom:]))
+    parser.feed(decoder.decode(b"", final=True))
+    return parser.close()
+
+
+def parse_file(page, hint=None, progress=None):
+    """
+    Parse an open PageFile. progress(done, total) reports bytes of the
+    stored file consumed.
+    """
+    report = None
+    if progress is not None:
+        report = lambda: progress(page.position, page.size)
+    return parse_blocks(page, hint, report)
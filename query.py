@@ -0,0 +1,183 @@
+"""
+query
+
+Description:
+Indexes and selector queries for DOM documents. A DocumentIndex maps ids,
+tags and classes to the elements that carry them. It is filled while the
+page is parsed and kept up to date as nodes are added, removed or have
+their id/class changed. querySelector(All) starts from the most
+selective index bucket for the rightmost compound selector and only
+runs the full right-to-left match on those candidates.
+"""
+from functools import lru_cache
+from style import parse_selector, matches
+
+
+class DocumentIndex:
+    def __init__(self):
+        # Buckets are dicts used as ordered sets: node -> None
+        self.ids = {}
+        self.tags = {}
+        self.classes = {}
+        self.positions = None  # node -> document order, rebuilt lazily
+
+    # --- Maintenance ---
+    @staticmethod
+    def _bucket_add(buckets, key, node):
+        bucket = buckets.get(key)
+        if bucket is None:
+            bucket = buckets[key] = {}
+        bucket[node] = None
+
+    @staticmethod
+    def _bucket_remove(buckets, key, node):
+        bucket = buckets.get(key)
+        if bucket is not None:
+            bucket.pop(node, None)
+            if not bucket:
+                del buckets[key]
+
+    def add(self, node):
+        if node.tag == "text":
+            return
+        self._bucket_add(self.tags, node.tag, node)
+        id_ = node.attrs.get("id")
+        if id_:
+            self._bucket_add(self.ids, id_, node)
+        for class_name in node.classes:
+            self._bucket_add(self.classes, class_name, node)
+        self.positions = None
+
+    def remove(self, node):
+        if node.tag == "text":
+            return
+        self._bucket_remove(self.tags, node.tag, node)
+        id_ = node.attrs.get("id")
+        if id_:
+            self._bucket_remove(self.ids, id_, node)
+        for class_name in node.classes:
+            self._bucket_remove(self.classes, class_name, node)
+        self.positions = None
+
+    def add_subtree(self, root):
+        for node in iter_subtree(root):
+            self.add(node)
+
+    def remove_subtree(self, root):
+        for node in iter_subtree(root):
+            self.remove(node)
+
+    def attribute_changed(self, node, key, old_value, new_value):
+        """Move node between the id/class buckets after one of those attributes changed."""
+        if node.tag == "text":
+            return
+        if key == "id":
+            if old_value:
+                self._bucket_remove(self.ids, old_value, node)
+            if new_value:
+                self._bucket_add(self.ids, new_value, node)
+        elif key == "class":
+            old_classes = set((old_value or "").split())
+            new_classes = set((new_value or "").split())
+            for class_name in old_classes - new_classes:
+                self._bucket_remove(self.classes, class_name, node)
+            for class_name in new_classes - old_classes:
+                self._bucket_add(self.classes, class_name, node)
+
+    # --- Ordering ---
+    def document_order(self, document, nodes):
+        if len(nodes) < 2:
+            return list(nodes)
+        if self.positions is None:
+            self.positions = {node: i for i, node in enumerate(iter_subtree(document))}
+        positions = self.positions
+        return sorted(nodes, key=positions.__getitem__)
+
+
+def iter_subtree(root):
+    """Pre-order (document order) walk of root and its descendants."""
+    stack = [root]
+    while stack:
+        node = stack.pop()
+        yield node
+        stack.extend(reversed(node.children))
+
+
+def is_inclusive_ancestor(ancestor, node):
+    while node is not None:
+        if node is ancestor:
+            return True
+        node = node.parent
+    return False
+
+
+@lru_cache(maxsize=256)
+def parse_selector_list(selectors):
+    parsed = []
+    for selector in selectors.split(","):
+        parts = parse_selector(selector)
+        if parts is None:
+            raise ValueError(f"Unsupported selector: {selector.strip()!r}")
+        parsed.append(parts)
+    return parsed
+
+
+def bucket_for(index, compound):
+    """Index bucket every element matching compound must be in, or None for "*"."""
+    tag, id_, classes = compound
+    if id_ is not None:
+        return index.ids.get(id_, {})
+    if classes:
+        return min((index.classes.get(c, {}) for c in classes), key=len)
+    if tag is not None:
+        return index.tags.get(tag, {})
+    return None
+
+
+def candidates(index, scope, parts):
+    """
+    Elements that could match a selector. Usually the bucket of the
+    rightmost compound, but when an ancestor compound reachable through
+    child combinators only (or carrying an id) has a smaller bucket,
+    walk down from those anchors instead.
+    """
+    best = bucket_for(index, parts[0][0])
+    best_depth = 0
+    for depth in range(1, len(parts)):
+        bucket = bucket_for(index, parts[depth][0])
+        exact = parts[depth - 1][1] == ">"
+        if bucket is not None and (best is None or len(bucket) < len(best)) \
+                and (exact or parts[depth][0][1] is not None):
+            best, best_depth = bucket, depth
+        if not exact and parts[depth][0][1] is None:
+            break
+
+    if best is None:
+        return (node for node in iter_subtree(scope) if node.tag != "text")
+    if best_depth == 0:
+        return best
+
+    exact = all(parts[d][1] == ">" for d in range(best_depth))
+    def walk():
+        # Selectors only match elements: leave out the text nodes met on the way
+        for anchor in best:
+            if exact:
+                level = [anchor]
+                for _ in range(best_depth):
+                    level = [child for node in level for child in node.children]
+                yield from (node for node in level if node.tag != "text")
+            else:
+                nodes = iter_subtree(anchor)
+                next(nodes)
+                yield from (node for node in nodes if node.tag != "text")
+    return walk()
+
+
+def query_all(scope, selectors, index, document):
+    found = {}
+    for parts in parse_selector_list(selectors):
+        for node in candidates(index, scope, parts):
+            if node is not scope and node not in found and matches(node, parts) \
+                    and (scope is document or is_inclusive_ancestor(scope, node)):
+                found[node] = None
+    return index.document_order(document, found)
@@ -2,84 +2,521 @@
 render
 
 Description: Has base information on drawing the DOM Elements after being parsed from DOM.PY
+Layout records paint commands into a DisplayList (see displaylist.py)
+instead of drawing straight to the screen. Widgets are positioned here and
+drawn every frame by the main loop.
+
+Each laid-out node keeps the fragment it produced (start y, paint items,
+widgets and height) in node._layout. DOM mutations clear that cache on
+the changed node and its ancestors (Node.mark_dirty), so a relayout only
+re-measures dirty subtrees; clean ones are copied, shifted down or up if
+something above them changed height.
+
+Text and inline elements (b, i, span, a, ...) between two blocks form an
+inline formatting context (layout_inline): their words are broken into
+shared line boxes and each line records one text run per change of style
+or source node, aligned on a common baseline.
 """
 # Libraries
-import pygame, time
+import pygame, time, re
 import pygame.freetype
-pygame.init()
+from functools import lru_cache
 
 # Configuration
 from config import (SCREEN_WIDTH, SCREEN_HEIGHT, LINE_HEIGHTS, 
-                   CHAR_WIDTH, LEFT_MARGIN, fonts)
+                   CHAR_WIDTH, LEFT_MARGIN, fonts, get_font)
+from style import computed_style
+from textindex import run_text, TEXT_TAGS
 
 # Components
 from Input import Input, wrap_text, wrap_text_pixel
 from PasswordInput import PasswordInput
 from Slider import Slider
-from RadioButton import RadioButton
+from RadioButton import RadioButton, RadioGroup
 from ColorInput import ColorPicker
-from SVG import parse_svg_file, scale_points, draw_svg
+from SVG import load_svg, draw_svg, svg_bounds
+from network import fetch, is_url, resolve
 from Button import Button
 from Link import Link
 from Table import Table
-
-pygame.init()
+from widgetpool import widget_pool
 
 def get_node_text(node):
-    """Recursively collect all text from node and children."""
+    """All text from node and its children (cached on the node, see Node.text_content)."""
+    return node.text_content()
+
+
+def font_for(style):
+    """Font matching a computed style."""
+    return get_font(style["font-family"], style["font-size"],
+                    style["font-weight"] == "bold", style["font-style"] == "italic")
+
+
+def line_height_for(style, font):
+    line_height = style["line-height"]
+    if isinstance(line_height, float):
+        return int(font.get_sized_height() * line_height)
+    return line_height
+
+
+def document_scheduler(node):
+    """Timer scheduler of the document (tab) owning node, or None for the shared one."""
+    return getattr(node.document, "scheduler", None)
+
+
+def paint_svg(target, rect, elements, inset=(0, 0)):
+    """inset: where the image box starts inside rect (shapes can spill out of the box)."""
+    draw_svg(elements, target, offset=(rect.x + inset[0], rect.y + inset[1]))
+
+
+def paint_table(target, rect, table, font):
+    table.draw(target, font, offset=(rect.x - table.rect.x, rect.y - table.rect.y))
+
+
+def radio_group(node, name):
+    """
+    The RadioGroup for name, scoped like HTML: to the nearest enclosing
+    form, or else to the document. Unnamed radios get no group.
+    """
+    if not name:
+        return None
+    scope = node.parent
+    while scope is not None and scope.tag != "form":
+        scope = scope.parent
+    if scope is None:
+        scope = node.document if node.document is not None else node
+    if scope.radio_groups is None:
+        scope.radio_groups = {}
+    group = scope.radio_groups.get(name)
+    if group is None:
+        group = scope.radio_groups[name] = RadioGroup(name)
+    return group
+
+
+# --- Inline layout ---
+WORD_RE = re.compile(r"\S+")
+ATOMIC_INLINE = ("input", "button", "svg", "table", "img", "select", "textarea")
+
+
+@lru_cache(maxsize=65536)
+def text_width(font, text):
+    return font.get_rect(text).width
+
+
+@lru_cache(maxsize=256)
+def space_width(font):
+    return text_width(font, "a a") - text_width(font, "aa")
+
+
+def is_inline(node):
+    """Whether node lays out inside an inline formatting context."""
+    if node.tag in ("text", "br"):
+        return True
+    if node.tag in ATOMIC_INLINE:
+        return False  # widgets keep their own line
+    display = computed_style(node)["display"]
+    if display == "none":
+        return True  # contributes nothing, but doesn't split the context
+    return display == "inline" and all(is_inline(child) for child in node.children)
+
+
+def inline_pieces(nodes):
+    """Flatten inline nodes into (node, style, anchor) text pieces and ("br", style) breaks."""
+    pieces = []
+    def walk(node, anchor):
+        style = computed_style(node)
+        if style["display"] == "none":
+            return
+        if node.tag == "br":
+            pieces.append(("br", style, None))
+            return
+        if node.text and (node.tag == "text" or node.tag in TEXT_TAGS):
+            pieces.append((node, style, anchor))
+        if node.tag == "a":
+            anchor = node
+        for child in node.children:
+            walk(child, anchor)
+    for node in nodes:
+        parent = node.parent
+        while parent is not None and parent.tag != "a" and is_inline(parent):
+            parent = parent.parent
+        walk(node, parent if parent is not None and parent.tag == "a" else None)
+    return pieces
+
+
+class LineBox:
+    """
+    Runs placed on one line: [node, style, font, gap, words, offset, anchor]
+    where gap is the space before the run. x is the estimated pen position
+    used for line breaking; runs are placed from their measured widths.
+    """
+
+    def __init__(self, x):
+        self.x = x
+        self.runs = []
+
+
+def layout_inline(nodes, y, display_list, interactive_elements, indent):
+    """
+    Lay out a sequence of inline nodes as one paragraph starting at y and
+    return the y below it.
+    """
+    return layout_pieces(inline_pieces(nodes), y, display_list, interactive_elements, indent)
+
+
+def layout_pieces(pieces, y, display_list, interactive_elements, indent):
+    left = LEFT_MARGIN + indent
+    right = SCREEN_WIDTH - LEFT_MARGIN
+    line = LineBox(left)
+    links = {}  # text node -> [(hit box, text)] of its link fragments
+    pending_space = False
+
+    def finish_line():
+        nonlocal y, line
+        if not line.runs:
+            return
+        measured = []
+        for run in line.runs:
+            text = " ".join(run[4])
+            measured.append((text, run[2].get_rect(text)))
+        # Align baselines: the tallest ink on the line starts at y
+        ascent = max(rect.y for _, rect in measured)
+        x = left
+        for (node, style, font, gap, _, offset, anchor), (text, rect) in zip(line.runs, measured):
+            x += gap
+            top = y + ascent - rect.y
+            display_list.text(font, (x, top), text, style["color"], (node, offset), rect)
+            if style["text-decoration"] == "underline":
+                underline_y = y + ascent + 2  # just below the shared baseline
+                display_list.line(style["color"], (x, underline_y), (x + rect.width, underline_y), 1)
+            if anchor is not None:
+                links.setdefault(node, (anchor, []))[1].append(
+                    (pygame.Rect(x, top, rect.width, rect.height), text))
+            x += rect.width
+        y += max(line_height_for(run[1], run[2]) for run in line.runs)
+        line = LineBox(left)
+
+    for node, style, anchor in pieces:
+        if node == "br":
+            if line.runs:
+                finish_line()
+            else:
+                y += line_height_for(style, font_for(style))
+            pending_space = False
+            continue
+
+        font = font_for(style)
+        raw = node.text
+        text = run_text(node)
+        pending_space = pending_space or raw[:1].isspace()
+        run = None
+        for match in WORD_RE.finditer(text):
+            word = match.group()
+            width = text_width(font, word)
+            gap = space_width(font) if pending_space and line.runs else 0
+            if line.runs and line.x + gap + width > right:
+                finish_line()
+                gap, run = 0, None
+            if run is None:
+                run = [node, style, font, gap, [word], match.start(), anchor]
+                line.runs.append(run)
+            else:
+                run[4].append(word)
+            line.x += gap + width
+            pending_space = True
+        if text:
+            pending_space = raw[-1:].isspace()
+
+    finish_line()
+
+    # One Link per text node inside <a>, with a hit box per line fragment
+    for node, (anchor, fragments) in links.items():
+        interactive_elements.append(link_widget(node, anchor.attrs.get("href", ""), fragments))
+    return y
+
+
+def layout_children(node, y, display_list, interactive_elements, indent):
+    """Lay out children, grouping runs of inline children into inline formatting contexts."""
+    inline = []
+    for child in node.children:
+        if is_inline(child):
+            inline.append(child)
+            continue
+        if inline:
+            y = layout_inline(inline, y, display_list, interactive_elements, indent)
+            inline = []
+        y = draw_node(child, y, display_list, fonts, interactive_elements, indent, parent_tag=node.tag)
+    if inline:
+        y = layout_inline(inline, y, display_list, interactive_elements, indent)
+    return y
+
+
+def line_offset(text, line, start):
+    """Where a wrapped line begins in the text it was wrapped from."""
+    offset = text.find(line, start)
+    return offset if offset >= 0 else start
+
+
+# --- Widgets ---
+# Widgets live on their DOM nodes and survive relayouts; these create them
+# on first layout (also used by loader.py to rebuild a layout made elsewhere),
+# reusing the widgets of closed pages where they can (see widgetpool.py)
+
+def input_widget(node, rect):
+    """The widget for an <input>, created the first time it is laid out."""
+    if getattr(node, "input_instance", None) is not None:
+        place_widget(node.input_instance, rect)
+        return node.input_instance
+
+    initial_text = node.attrs.get("value", node.text)
+    input_type = node.attrs.get("type", "text").lower()
+    scheduler = document_scheduler(node)
+    if input_type == "password":
+        from PasswordInput import PasswordInput
+        node.input_instance = widget_pool.acquire(PasswordInput, rect, initial_text, scheduler=scheduler)
+    elif input_type == "number":
+        from NumberInput import NumberInput
+        node.input_instance = widget_pool.acquire(NumberInput, rect, initial_text, scheduler=scheduler)
+    elif input_type == "color":
+        from ColorInput import ColorPicker
+        node.input_instance = widget_pool.acquire(ColorPicker, rect, scheduler=scheduler)
+    elif input_type == "range":
+        min_val = float(node.attrs.get("min", 0))
+        max_val = float(node.attrs.get("max", 100))
+        value = float(node.attrs.get("value", (min_val+max_val)/2))
+        from Slider import Slider
+        node.input_instance = widget_pool.acquire(Slider, rect, min_val, max_val, value)
+    elif input_type == "radio":
+        group = radio_group(node, node.attrs.get("name"))  # HTML uses 'name' to group radios
+        selected = node.attrs.get("checked") is not None
+        node.input_instance = widget_pool.acquire(
+            RadioButton,
+            rect,
+            label=initial_text,
+            group=group,
+            selected=selected,
+            scheduler=scheduler
+        )
+    else:
+        node.input_instance = widget_pool.acquire(Input, rect, initial_text, scheduler=scheduler)
+    return node.input_instance
+
+
+def button_label(node):
+    label = node.text.strip() if node.text else ""
+    if not label:
+        label = " ".join(c.text.strip() for c in node.children if c.tag=="text")
+    return label or "Button"
+
+
+def button_widget(node, rect):
+    label = button_label(node)
+    if getattr(node, "button_instance", None) is None:
+        node.button_instance = widget_pool.acquire(
+            Button,
+            (rect.x, rect.y, rect.width, rect.height),
+            label,
+            callback=lambda n=node: print(f"Clicked '{label}'"),
+            scheduler=document_scheduler(node)
+        )
+    node.button_instance.rect = rect
+    node.button_instance.label = label
+    return node.button_instance
+
+
+def link_widget(node, href, fragments):
+    """The Link of a text node inside <a>; fragments: [(hit box, text)] per line."""
+    link_text = get_node_text(node)
+    document = node.document
+    base_url = document.base_url if document is not None else None
+    if getattr(node, "link_instance", None) is None:
+        # The text itself is painted through the display list
+        node.link_instance = widget_pool.acquire(Link, fragments[0][0], link_text, href=href,
+                                                 paint=False, base_url=base_url)
+    node.link_instance.text = link_text
+    node.link_instance.href = href.strip()
+    node.link_instance.base_url = base_url
+    node.link_instance.set_fragments(fragments)
+    return node.link_instance
+
+
+def table_widget(node, x, y):
+    """A Table for the node's current rows (rebuilt on every layout of the table)."""
+    # Start with a reasonable initial rect height; Table will compute exact height
+    node.table_instance = Table(pygame.Rect(x, y, 400, 200), node)
+    return node.table_instance
+
+
+def svg_elements(node, top=None):
+    """
+    Scaled shapes of an <svg src=...>, kept on the node. In documents with
+    a resource group (see resources.py) the file is read in the background:
+    this returns None until it arrives, and the node is laid out again
+    then. top: where the image is on the page, which sets its priority.
+    """
+    if getattr(node, "svg_elements", None) is None:
+        src = node.attrs.get("src")
+        if not src:
+            return None
+        width = int(node.attrs.get("width", 200))
+        height = int(node.attrs.get("height", 200))
+        document = node.document
+        src = resolve(document.base_url if document is not None else None, src)
+        group = document.resources if document is not None else None
+        if group is not None:
+            if getattr(node, "svg_request", None) is None:
+                node.svg_request = group.request(
+                    src, lambda resource: svg_loaded(node, resource, width, height), top)
+            return None
+        try:
+            if is_url(src):
+                response = fetch(src)
+                node.svg_elements = load_svg(src, width, height, viewBox=(0,0,100,100), margin=0,
+                                             data=response.body.decode("utf-8"), mtime=response.version)
+            else:
+                node.svg_elements = load_svg(src, width, height, viewBox=(0,0,100,100), margin=0)
+        except OSError:  # a missing file or a failed fetch
+            node.svg_elements = []
+    return node.svg_elements
+
+
+def svg_loaded(node, resource, width, height):
+    node.svg_request = None
+    if resource.error is not None:
+        node.svg_elements = []
+    else:
+        node.svg_elements = load_svg(resource.path, width, height, viewBox=(0,0,100,100), margin=0,
+                                     data=resource.data.decode("utf-8"), mtime=resource.mtime)
+    node.mark_dirty()
+
+
+def forget_svg(node):
+    """Drop an <svg>'s image (its file changed) so the next layout loads it again."""
+    request = getattr(node, "svg_request", None)
+    if request is not None:
+        request.cancel()
+    node.svg_elements = node.svg_request = None
+    node.mark_dirty()
+
+
+def place_widget(widget, rect):
+    """Move a widget to rect, letting widgets with inner geometry move themselves."""
+    if widget.rect == rect:
+        return
+    if hasattr(widget, "move"):
+        widget.move(rect.x - widget.rect.x, rect.y - widget.rect.y)
+    else:
+        widget.rect = pygame.Rect(rect)
+
+
+def draw_node(node, y, display_list, fonts, interactive_elements, indent=0, parent_tag=None):
+    """
+    Lay node out at y, or copy its cached layout when it is clean.
+
+    The cache (node._layout) is (y, indent, parent_tag, height, items,
+    start, end, widgets), relative to the parent's: the node's display
+    items are start:end past its parent's first, its y is past its
+    parent's y and its widgets' rects are relative to its own y. Only a
+    node laid out at the top keeps its list in items, with absolute
+    positions. Copying a fragment thus leaves the caches inside it valid
+    wherever it moves, and no list outlives the next layout.
+    """
+    parent = display_list.laying_out[-1] if display_list.laying_out else None
+    layout = node._layout
+    if layout is not None and layout[1] == indent and layout[2] == parent_tag:
+        old = cached_position(layout, parent)
+        if old is not None:
+            return reuse_layout(node, layout, old, y, display_list, interactive_elements)
+
+    old = cached_position(node._stale, parent) if node._stale is not None else None
+    damage = display_list.damage
+    if damage is not None:
+        damage.begin()
+    first_item, first_widget = len(display_list), len(interactive_elements)
+    display_list.laying_out.append((first_item, y, old))
+    end = layout_node(node, y, display_list, fonts, interactive_elements, indent, parent_tag)
+    display_list.laying_out.pop()
+    widgets = [(w, w.rect.move(0, -y)) for w in interactive_elements[first_widget:]]
+    node._layout = layout_cache(parent, y, indent, parent_tag, end - y, display_list, first_item, widgets)
+    node._stale = None
+    if damage is not None:
+        damage.relaid(display_list.items, first_item, len(display_list), old)
+    return end
+
+
+def cached_position(layout, parent):
+    """
+    (items, start, end, y) of a cached layout in the list it was last
+    laid out or copied into, or None when that can't be told (it is
+    outside its parent's, or its parent's isn't known).
+    """
+    if parent is None:
+        return (layout[4], layout[5], layout[6], layout[0]) if layout[4] is not None else None
+    base = parent[2]
+    if base is None:
+        return None
+    items, first, last, y = base
+    start, end = first + layout[5], first + layout[6]
+    return (items, start, end, y + layout[0]) if end <= last else None
+
+
+def layout_cache(parent, y, indent, parent_tag, height, display_list, first_item, widgets):
+    """node._layout for a node recorded at y from first_item on (see draw_node)."""
+    end = len(display_list)
+    if parent is None:
+        return (y, indent, parent_tag, height, display_list.items, first_item, end, widgets)
+    first, top, _ = parent
+    return (y - top, indent, parent_tag, height, None, first_item - first, end - first, widgets)
+
+
+def reuse_layout(node, layout, old, y, display_list, interactive_elements):
+    """Replay a clean node's cached fragment (at old, see cached_position) at y."""
+    _, indent, parent_tag, height, _, _, _, widgets = layout
+    items, start, end, old_y = old
+    first_item = len(display_list)
+    display_list.extend(items[start:end], y - old_y)
+    parent = display_list.laying_out[-1] if display_list.laying_out else None
+    node._layout = layout_cache(parent, y, indent, parent_tag, height, display_list, first_item, widgets)
+    if display_list.damage is not None:
+        display_list.damage.reused(display_list.items, first_item, len(display_list), old, y - old_y)
+    for widget, rect in widgets:
+        rect = rect.move(0, y)
+        place_widget(widget, rect)
+        interactive_elements.append(widget)
+    return y + height
+
+
+def layout_node(node, y, display_list, fonts, interactive_elements, indent=0, parent_tag=None):
+    style = computed_style(node)
+    if style["display"] == "none":
+        return y
+
+    # Text nodes share their parent's style, so box properties only apply to elements
     if node.tag == "text":
-        return node.text.strip()
-    text_parts = [get_node_text(c) for c in node.children]
-    return " ".join([t for t in text_parts if t])
+        return _draw_node(node, style, y, display_list, fonts, interactive_elements, indent, parent_tag)
 
+    y += style["margin-top"]
+    y = _draw_node(node, style, y, display_list, fonts, interactive_elements,
+                   indent + style["margin-left"], parent_tag)
+    return y + style["margin-bottom"]
 
-def draw_node(node, y, screen, fonts, interactive_elements, indent=0, parent_tag=None):
+
+def _draw_node(node, style, y, display_list, fonts, interactive_elements, indent, parent_tag):
     padding_x = LEFT_MARGIN + indent
+    child_indent = indent + style["padding-left"]
 
     # Determine current font
-    current_tag = node.tag if node.tag != "text" else parent_tag or "p"
-    font = fonts.get(current_tag, fonts["p"])
-    line_height = int(font.get_sized_height() * 1.3)
+    font = font_for(style)
+    line_height = line_height_for(style, font)
 
     # --- Text nodes ---
-    if node.tag in ("h1","h2","h3","h4","h5","h6","p","a","text"):
-        text = node.text.strip() if node.text else ""
-        if text:
-            max_width_px = SCREEN_WIDTH - LEFT_MARGIN*2 - indent
-            wrapped_lines = wrap_text_pixel(text, font, max_width_px)
-
-            for line in wrapped_lines:
-                font.fgcolor = (0,0,255) if current_tag == "a" else (0,0,0)
-                font.render_to(screen, (padding_x, y), line)
-
-                # Handle <a> tag links
-                if current_tag == "a":
-                    link_text = get_node_text(node)  # get full text from children
-                    text_rect = font.get_rect(link_text)
-                    rect_tuple = (padding_x, y, text_rect.width, text_rect.height)
-                
-                    # Safely get href
-                    href = ""
-                    if hasattr(node, "attrs") and "href" in node.attrs:
-                        href = node.attrs["href"].strip()
-                
-                    # Create or update Link instance
-                    if getattr(node, "link_instance", None) is None:
-                        node.link_instance = Link(rect_tuple, link_text, href=href)
-                    else:
-                        node.link_instance.rect = pygame.Rect(*rect_tuple)
-                        node.link_instance.text = link_text
-                        node.link_instance.href = href
-                
-                    interactive_elements.append(node.link_instance)
-                
-                    # Draw underline
-                    underline_y = y + text_rect.height - 2
-                    pygame.draw.line(screen, (0,0,255),
-                                     (padding_x, underline_y),
-                                     (padding_x + text_rect.width, underline_y), 1)
-    
-                y += line_height
+    if node.tag == "text":
+        return layout_inline([node], y, display_list, interactive_elements, indent)
+
+    # --- Text set directly on an element ---
+    if node.tag in TEXT_TAGS and node.text:
+        anchor = node if node.tag == "a" else None
+        y = layout_pieces([(node, style, anchor)], y, display_list, interactive_elements, indent)
 
     # --- Line break ---
     if node.tag == "br":
@@ -87,162 +524,103 @@ def draw_node(node, y, screen, fonts, interactive_elements, indent=0, parent_tag
 
     # --- Lists ---
     if node.tag in ("ul", "ol"):
-        child_indent = indent + 20
         counter = 1
         for child in node.children:
             if child.tag == "li":
                 bullet = "• " if node.tag == "ul" else f"{counter}. "
-                li_font = fonts.get("p", fonts["p"])
-                li_text = " ".join(c.text.strip() for c in child.children if c.tag=="text")
-                max_width_px = SCREEN_WIDTH - LEFT_MARGIN*2 - child_indent - li_font.get_rect(bullet).width
+                li_style = computed_style(child)
+                li_font = font_for(li_style)
+                li_text = run_text(child)
+                bullet_width = li_font.get_rect(bullet).width
+                li_line_height = line_height_for(li_style, li_font)
+                max_width_px = SCREEN_WIDTH - LEFT_MARGIN*2 - child_indent - bullet_width
                 wrapped_lines = wrap_text_pixel(li_text, li_font, max_width_px)
 
+                offset = 0
                 for i, line in enumerate(wrapped_lines):
                     draw_x = LEFT_MARGIN + child_indent
                     if i == 0:
-                        li_font.render_to(screen, (draw_x, y), bullet)
-                        draw_x += li_font.get_rect(bullet).width
-                    li_font.fgcolor = (0,0,0)
-                    li_font.render_to(screen, (draw_x, y), line)
-                    y += int(li_font.get_sized_height() * 1.3)
+                        display_list.text(li_font, (draw_x, y), bullet, li_style["color"])
+                        draw_x += bullet_width
+                    offset = line_offset(li_text, line, offset)
+                    display_list.text(li_font, (draw_x, y), line, li_style["color"], (child, offset))
+                    offset += len(line)
+                    y += li_line_height
                 if node.tag == "ol":
                     counter += 1
             else:
-                y = draw_node(child, y, screen, fonts, interactive_elements, child_indent)
+                y = draw_node(child, y, display_list, fonts, interactive_elements, child_indent)
         return y
 
     # --- Input ---
     if node.tag == "input":
         width, height = 200, max(30, line_height+8)
         rect = pygame.Rect(padding_x, y, width, height)
-        initial_text = node.attrs.get("value", node.text)
-    
-        # Determine input type
-        input_type = node.attrs.get("type", "text").lower()
-    
-        # Create the appropriate Input/Control subclass
-        if getattr(node, "input_instance", None) is None:
-            if input_type == "password":
-                from PasswordInput import PasswordInput
-                node.input_instance = PasswordInput(rect, initial_text)
-            elif input_type == "number":
-                from NumberInput import NumberInput
-                node.input_instance = NumberInput(rect, initial_text)
-            elif input_type == "color":
-                from ColorInput import ColorPicker
-                node.input_instance = ColorPicker(rect)
-            elif input_type == "range":
-                min_val = float(node.attrs.get("min", 0))
-                max_val = float(node.attrs.get("max", 100))
-                value = float(node.attrs.get("value", (min_val+max_val)/2))
-                from Slider import Slider
-                node.input_instance = Slider(rect, min_val, max_val, value)
-            elif input_type == "radio":
-                group_name = node.attrs.get("name")  # HTML uses 'name' to group radios
-                selected = node.attrs.get("checked") is not None
-                # Make height a square for the circle button
-                button_size = min(width, height)
-                node.input_instance = RadioButton(
-                    pygame.Rect(padding_x, y, button_size, button_size),
-                    label=initial_text,
-                    group=group_name,
-                    selected=selected
-                )
-            else:
-                node.input_instance = Input(rect, initial_text)
-        else:
-            node.input_instance.rect = rect
-    
-        # Draw and register the interactive element
-        if hasattr(node.input_instance, "draw"):
-            node.input_instance.draw(screen, fonts["p"])
-        interactive_elements.append(node.input_instance)
+        if node.attrs.get("type", "text").lower() == "radio":
+            # Make height a square for the circle button
+            button_size = min(width, height)
+            rect = pygame.Rect(padding_x, y, button_size, button_size)
+
+        # Register the interactive element (the main loop draws it)
+        interactive_elements.append(input_widget(node, rect))
         y += height + 10
         return y
 
     # --- Button ---
     if node.tag == "button":
-        button_text = node.text.strip() if node.text else ""
-        if not button_text:
-            button_text = " ".join(c.text.strip() for c in node.children if c.tag=="text")
-        if not button_text:
-            button_text = "Button"
+        button_text = button_label(node)
 
-        font_btn = fonts["button"]
+        font_btn = font
         text_width = font_btn.get_rect(button_text).width
         text_height = font_btn.get_sized_height()
         padding_btn_x, padding_btn_y = 12, 6
         width = max(60, text_width + padding_btn_x*2)
         height = max(text_height + padding_btn_y*2, 30)
         rect = pygame.Rect(padding_x, y, width, height)
-
-        if getattr(node, "button_instance", None) is None:
-            node.button_instance = Button(
-                (rect.x, rect.y, rect.width, rect.height),
-                button_text,
-                callback=lambda n=node: print(f"Clicked '{button_text}'")
-            )
-
-        node.button_instance.rect = rect
-        node.button_instance.label = button_text
-        node.button_instance.draw(screen, font_btn)
-        interactive_elements.append(node.button_instance)
+        interactive_elements.append(button_widget(node, rect))
         y += height + 6
         return y
 
     # --- Horizontal rule ---
     if node.tag == "hr":
         hr_height = 2
-        hr_color = (160,160,160)
+        hr_color = style["color"]
         rect = pygame.Rect(LEFT_MARGIN+indent, y + line_height//2, SCREEN_WIDTH - 2*(LEFT_MARGIN+indent), hr_height)
-        pygame.draw.rect(screen, hr_color, rect)
+        display_list.rect(hr_color, rect)
         y += line_height
 
     # --- Containers ---
     if node.tag in ("div","body","html"):
-        child_indent = indent + (20 if node.tag=="div" else 0)
-        for child in node.children:
-            y = draw_node(child, y, screen, fonts, interactive_elements, child_indent, parent_tag=node.tag)
-        return y
+        return layout_children(node, y, display_list, interactive_elements, child_indent)
 
     # --- SVG ---
     if node.tag == "svg":
         width = int(node.attrs.get("width", 200))
         height = int(node.attrs.get("height", 200))
-        src = node.attrs.get("src")
         svg_offset = (LEFT_MARGIN + indent, y)
 
-        if getattr(node, "svg_elements", None) is None and src:
-            try:
-                node.svg_elements = parse_svg_file(src)
-                node.svg_elements = scale_points(node.svg_elements, width, height, viewBox=(0,0,100,100), margin=0)
-            except FileNotFoundError:
-                node.svg_elements = []
-
-        if getattr(node, "svg_elements", None):
-            draw_svg(node.svg_elements, screen, offset=svg_offset)
+        elements = svg_elements(node, y)
+        if elements:
+            # Shapes may spill out of the box; the bounds cover what is drawn
+            bounds = svg_bounds(elements, svg_offset[0], svg_offset[1], width, height)
+            inset = (svg_offset[0] - bounds[0], svg_offset[1] - bounds[1])
+            display_list.call(bounds, paint_svg, elements, inset)
 
         y += height + 10
         return y
     
     # --- Tables ---
     if node.tag == "table":
-        # Start with a reasonable initial rect height; Table will compute exact height
-        initial_rect = pygame.Rect(padding_x, y, 400, 200)
-    
-        # Create Table instance if it doesn't exist
-        if getattr(node, "table_instance", None) is None:
-            node.table_instance = Table(initial_rect, node)
+        # Only reached when the table or its rows changed (or on first
+        # layout), so rebuild the Table from the current rows
+        table = table_widget(node, padding_x, y)
     
-        # Draw the table
-        node.table_instance.draw(screen, fonts["p"])
+        # Record the table
+        display_list.call(table.rect.copy(), paint_table, table, fonts["p"])
     
         # Increment y by the actual height of the table plus some spacing
         y += node.table_instance.height + 10
         return y
     
     # --- Recursively draw children ---
-    for child in node.children:
-        y = draw_node(child, y, screen, fonts, interactive_elements, indent, parent_tag=node.tag)
-
-    return y
+    return layout_children(node, y, display_list, interactive_elements, child_indent)
@@ -0,0 +1,267 @@
+"""
+resources
+
+Description:
+Asynchronous resource loader. Files a page needs after it has been
+parsed (SVG images, the pages links point to) are read, or downloaded
+for http:// URLs (see network.py), by an asyncio event loop on a
+background thread, so layout and painting never wait on the filesystem
+or the network:
+
+    - at most max_concurrency reads run at once
+    - concurrent requests for the same file share one read
+    - queued reads start in priority order (lower first), and asking
+      again with a lower priority moves a queued read up
+    - a ResourceGroup (one per document) cancels all its requests at
+      once when the tab navigates away or closes
+
+Callbacks run on the UI thread, from deliver(), which the main loop
+calls every frame. notify, if set, is called from the loader thread when
+results are waiting, so a main loop sleeping on input can be woken.
+"""
+import asyncio, itertools, os, queue, threading, time
+from concurrent.futures import ThreadPoolExecutor
+from network import fetch, is_url, content_charset
+
+MAX_CONCURRENCY = 4
+DELIVER_BUDGET = 0.004  # seconds of callbacks per deliver() call
+URGENT = -1             # priority of loads the user asked for (e.g. a link click)
+
+
+class Resource:
+    """
+    A finished read: data and mtime, or the error that stopped it. For
+    downloads mtime is the response's version (see network.Response) and
+    url is where the data came from after redirects, and charset the
+    encoding the server declared for it.
+    """
+    __slots__ = ("path", "url", "data", "mtime", "error", "charset")
+
+    def __init__(self, path, data=None, mtime=None, error=None, url=None, charset=None):
+        self.path = path
+        self.url = url or path
+        self.data = data
+        self.mtime = mtime
+        self.error = error
+        self.charset = charset
+
+
+def read(path):
+    try:
+        if is_url(path):
+            response = fetch(path)
+            return Resource(path, response.body, response.version, url=response.url,
+                            charset=content_charset(response.headers))
+        with open(path, "rb") as f:
+            return Resource(path, f.read(), os.fstat(f.fileno()).st_mtime)
+    except Exception as error:  # not only OSError: a bad response or body must not stop a worker
+        return Resource(path, error=error)
+
+
+class Request:
+    """One caller's interest in a file. cancel() drops its callback."""
+    __slots__ = ("loader", "path", "callback", "group", "cancelled")
+
+    def __init__(self, loader, path, callback, group=None):
+        self.loader = loader
+        self.path = path
+        self.callback = callback
+        self.group = group
+        self.cancelled = False
+
+    def cancel(self):
+        if not self.cancelled:
+            self.cancelled = True
+            self.loader._drop(self)
+
+
+class _Load:
+    """A read shared by every request for its path."""
+    __slots__ = ("path", "priority", "requests", "started", "cancelled")
+
+    def __init__(self, path, priority):
+        self.path = path
+        self.priority = priority
+        self.requests = []
+        self.started = False
+        self.cancelled = False
+
+
+class ResourceLoader:
+    def __init__(self, max_concurrency=MAX_CONCURRENCY, notify=None):
+        self.max_concurrency = max_concurrency
+        self.notify = notify
+        self.loads = {}             # path -> _Load, until its callbacks have run
+        self.lock = threading.Lock()
+        self.finished = queue.SimpleQueue()  # (_Load, Resource) waiting for deliver()
+        self.counter = itertools.count()     # tie-breaker for equal priorities
+        self.loop = None
+        self.reads = 0              # files actually read (for profiling)
+
+    # --- Loop thread ---
+    def _start(self):
+        self.loop = asyncio.new_event_loop()
+        ready = threading.Event()
+        thread = threading.Thread(target=self._run, args=(ready,), name="resources", daemon=True)
+        thread.start()
+        ready.wait()
+
+    def _run(self, ready):
+        asyncio.set_event_loop(self.loop)
+        self.queue = asyncio.PriorityQueue()
+        executor = ThreadPoolExecutor(self.max_concurrency, thread_name_prefix="resources")
+        for _ in range(self.max_concurrency):
+            self.loop.create_task(self._worker(executor))
+        ready.set()
+        self.loop.run_forever()
+
+    async def _worker(self, executor):
+        while True:
+            priority, _, load = await self.queue.get()
+            try:
+                await self._load(executor, priority, load)
+            except Exception as error:
+                # A worker outlives any one load: finish it with the error so
+                # it leaves self.loads (a second finish delivers nothing)
+                self.finished.put((load, Resource(load.path, error=error)))
+
+    async def _load(self, executor, priority, load):
+        with self.lock:
+            # Skip loads that were cancelled, already started or re-queued with a better priority
+            if load.cancelled or load.started or priority != load.priority:
+                return
+            load.started = True
+        resource = await self.loop.run_in_executor(executor, read, load.path)
+        with self.lock:
+            self.reads += 1
+        # One wake-up per batch: the UI keeps delivering while results are ready
+        wake = self.finished.empty()
+        self.finished.put((load, resource))
+        if wake and self.notify is not None:
+            self.notify()
+
+    def _enqueue(self, load):
+        self.loop.call_soon_threadsafe(self.queue.put_nowait, (load.priority, next(self.counter), load))
+
+    # --- Requests (UI thread) ---
+    def request(self, path, callback, priority=0, group=None):
+        """
+        Read path in the background and call callback(resource) on the UI
+        thread (from deliver) when it is done. Returns a Request.
+        """
+        if self.loop is None:
+            self._start()
+        if not is_url(path):
+            path = os.path.abspath(path)
+        request = Request(self, path, callback, group)
+        with self.lock:
+            load = self.loads.get(path)
+            if load is None:
+                load = self.loads[path] = _Load(path, priority)
+                self._enqueue(load)
+            elif not load.started and priority < load.priority:
+                load.priority = priority
+                self._enqueue(load)
+            load.requests.append(request)
+        return request
+
+    def _drop(self, request):
+        with self.lock:
+            load = self.loads.get(request.path)
+            if load is None or request not in load.requests:
+                return
+            load.requests.remove(request)
+            # Nobody wants a read that hasn't started any more
+            if not load.requests and not load.started:
+                load.cancelled = True
+                del self.loads[request.path]
+
+    @property
+    def pending(self):
+        """Reads queued, running or waiting for deliver()."""
+        return len(self.loads)
+
+    @property
+    def ready(self):
+        """Finished reads waiting for deliver()."""
+        return not self.finished.empty()
+
+    # --- Delivery (UI thread) ---
+    def deliver(self, budget=DELIVER_BUDGET):
+        """Run the callbacks of finished reads for up to budget seconds. Returns how many ran."""
+        deadline = time.perf_counter() + budget
+        ran = 0
+        while time.perf_counter() < deadline:
+            try:
+                load, resource = self.finished.get_nowait()
+            except queue.Empty:
+                break
+            with self.lock:
+                # Requests made up to now got this read; later ones start a new one
+                if self.loads.get(load.path) is load:
+                    del self.loads[load.path]
+                requests, load.requests = load.requests, []
+            for request in requests:
+                if request.group is not None:
+                    request.group.requests.discard(request)
+                if not request.cancelled:
+                    request.cancelled = True  # done; cancel() is a no-op now
+                    request.callback(resource)
+                    ran += 1
+        return ran
+
+    def wait_idle(self, timeout=None):
+        """Block until every read has finished and been delivered (for headless tools)."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self.pending or self.ready:
+            self.deliver(budget=float("inf"))
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            time.sleep(0.001)
+        return True
+
+
+class ResourceGroup:
+    """
+    The requests made for one document. Priorities come from where the
+    resource is on the page: 0 inside view, then one more per screen away.
+    """
+
+    def __init__(self, loader):
+        self.loader = loader
+        self.requests = set()
+        self.view = None  # visible document rect, kept up to date by the tab
+
+    def priority(self, top=None):
+        view = self.view
+        if top is None or view is None:
+            return 0
+        distance = max(0, view.top - top, top - view.bottom)
+        return -(-distance // max(1, view.height))
+
+    def request(self, path, callback, top=None):
+        """Load path for something laid out at document y top (see ResourceLoader.request)."""
+        request = self.loader.request(path, callback, self.priority(top), group=self)
+        self.requests.add(request)
+        return request
+
+    def cancel(self):
+        """Drop every outstanding request (navigation)."""
+        requests, self.requests = self.requests, set()
+        for request in requests:
+            request.cancel()
+
+
+class DeferredResources:
+    """
+    Stands in for a ResourceGroup where files must not be loaded (layout
+    in the page loader's worker, see loader.py): requests are dropped,
+    and the files are asked for again once the document is in the UI.
+    """
+
+    def request(self, path, callback, top=None):
+        return None
+
+
+# Shared by every tab
+resources = ResourceLoader()
@@ -0,0 +1,299 @@
+"""
+snapshot
+
+Description:
+Compact binary snapshots of parsed DOM trees, so reopening a page skips
+dom.parse_html. A snapshot is a string table (tags, attribute keys and
+values, text, stylesheets) plus flat arrays describing the tree in
+pre-order. Snapshots live in a .sequoia_cache directory next to the
+source file (downloaded pages: in the disk cache, see diskcache.py),
+named after a hash of the source, and are read through mmap: text is
+only decoded when a node's text is accessed. A snapshot holds the page
+uncompressed, so that of a compressed page (.gz, .bz2, .xz) would be
+many times the size of the file it stands for: it is compressed the
+same way (page.txt.bz2 -> ....dom.bz2) and read whole instead of mapped.
+
+Layout (little-endian, all fields 4-byte aligned):
+    header   magic, version, string/node/attr/sheet counts
+    uint32   string offsets (string_count + 1)
+    uint32   node tag, node text, node parent (+1, 0 = root), attr start, attr count
+    uint32   attr keys, attr values
+    uint32   stylesheet string ids
+    bytes    UTF-8 string blob
+"""
+import bz2, gc, gzip, hashlib, lzma, mmap, os, struct, zlib
+from array import array
+from dom import Node, parse_html
+from pagesource import PageFile, parse_file, decode_page
+from style import StyleResolver
+from network import is_url
+from diskcache import disk_cache, content_hash
+
+MAGIC = b"SQDOM\0\0\0"
+SNAPSHOT_VERSION = 3  # 3: pages decoded in their declared encoding
+HEADER = struct.Struct("<8sIIIII")
+CACHE_DIR_NAME = ".sequoia_cache"
+# (compress, decompress) for the snapshots of compressed pages, by extension
+SNAPSHOT_CODECS = {".gz": (gzip.compress, gzip.decompress), ".bz2": (bz2.compress, bz2.decompress),
+                   ".xz": (lzma.compress, lzma.decompress)}
+
+
+class StringTable:
+    """Strings stored in a buffer, decoded on first access."""
+
+    def __init__(self, buffer, offsets):
+        self.buffer = buffer
+        self.offsets = offsets
+        self.decoded = {}
+
+    def __getitem__(self, index):
+        value = self.decoded.get(index)
+        if value is None:
+            start, end = self.offsets[index], self.offsets[index + 1]
+            value = str(self.buffer[start:end], "utf-8")
+            self.decoded[index] = value
+        return value
+
+
+class SnapshotNode(Node):
+    """Node whose text and attributes are decoded from the snapshot on first access."""
+
+    @property
+    def attrs(self):
+        attrs = self._attrs
+        if attrs is None:
+            strings, (keys, values) = self._strings, self._attr_table
+            start = self._attr_start
+            attrs = self._attrs = {strings[keys[j]]: strings[values[j]]
+                                   for j in range(start, start + self._attr_count)}
+        return attrs
+
+    @attrs.setter
+    def attrs(self, value):
+        self._attrs = value
+
+    @property
+    def text(self):
+        text = self._text
+        if text is None:
+            text = self._text = self._strings[self._text_id]
+        return text
+
+    @text.setter
+    def text(self, value):
+        self._text = value
+
+
+# ----------------- Writing -----------------
+
+def serialize(root):
+    strings, string_ids = [], {}
+
+    def intern(value):
+        index = string_ids.get(value)
+        if index is None:
+            index = string_ids[value] = len(strings)
+            strings.append(value)
+        return index
+
+    tags, texts, parents = array("I"), array("I"), array("I")
+    attr_starts, attr_counts = array("I"), array("I")
+    keys, values = array("I"), array("I")
+
+    # Pre-order walk; parent indices are stored +1 so 0 means "no parent"
+    stack = [(root, 0)]
+    while stack:
+        node, parent = stack.pop()
+        index = len(tags)
+        tags.append(intern(node.tag))
+        texts.append(intern(node.text or ""))
+        parents.append(parent)
+        attr_starts.append(len(keys))
+        attr_counts.append(len(node.attrs))
+        for key, value in node.attrs.items():
+            keys.append(intern(key))
+            values.append(intern(value if value is not None else ""))
+        for child in reversed(node.children):
+            stack.append((child, index + 1))
+
+    resolver = getattr(root, "style_resolver", None)
+    sheets = array("I", (intern(css) for css in getattr(resolver, "sources", ())))
+
+    blob, offsets = bytearray(), array("I", [0])
+    for value in strings:
+        blob += value.encode("utf-8", "surrogatepass")
+        offsets.append(len(blob))
+
+    header = HEADER.pack(MAGIC, SNAPSHOT_VERSION, len(strings), len(tags), len(keys), len(sheets))
+    parts = [header, offsets, tags, texts, parents, attr_starts, attr_counts, keys, values, sheets]
+    return b"".join(bytes(p) for p in parts) + bytes(blob)
+
+
+def save_snapshot(root, path):
+    """
+    Write atomically so concurrent readers never see a partial file.
+    A path ending in .gz, .bz2 or .xz gets the snapshot compressed.
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    data = serialize(root)
+    codec = SNAPSHOT_CODECS.get(os.path.splitext(path)[1])
+    if codec is not None:
+        data = codec[0](data)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+
+
+# ----------------- Reading -----------------
+
+def deserialize(buffer):
+    view = memoryview(buffer)
+    magic, version, string_count, node_count, attr_count, sheet_count = HEADER.unpack_from(view)
+    if magic != MAGIC or version != SNAPSHOT_VERSION:
+        raise ValueError("not a DOM snapshot (or an incompatible version)")
+
+    pos = HEADER.size
+    def take(count):
+        nonlocal pos
+        data = view[pos:pos + 4 * count].cast("I")
+        pos += 4 * count
+        return data
+
+    offsets = take(string_count + 1)
+    tags, texts, parents = take(node_count), take(node_count), take(node_count)
+    attr_starts, attr_counts = take(node_count), take(node_count)
+    keys, values = take(attr_count), take(attr_count)
+    sheets = take(sheet_count)
+    strings = StringTable(view[pos:], offsets)
+
+    # Build nodes without Node.__init__; this loop dominates load time
+    tags, texts, parents = tags.tolist(), texts.tolist(), parents.tolist()
+    attr_starts, attr_counts = attr_starts.tolist(), attr_counts.tolist()
+    tag_names = {i: strings[i] for i in set(tags)}
+    new_node = SnapshotNode.__new__
+    attr_table = (keys, values)
+    nodes = []
+    append = nodes.append
+    document = None
+    # The cyclic GC would rescan the growing tree again and again while it
+    # is allocated; nothing here creates garbage, so pause it
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        for i in range(node_count):
+            node = new_node(SnapshotNode)
+            parent = parents[i]
+            parent = nodes[parent - 1] if parent else None
+            node.__dict__ = {
+                "tag": tag_names[tags[i]], "parent": parent, "children": [], "document": document,
+                "link_instance": None, "_strings": strings, "_text_id": texts[i], "_text": None,
+                "_attr_table": attr_table, "_attr_start": attr_starts[i],
+                "_attr_count": attr_counts[i], "_attrs": None,
+            }
+            if parent is not None:
+                parent.children.append(node)
+            else:
+                document = node.document = node
+            append(node)
+    finally:
+        if gc_was_enabled:
+            gc.enable()
+
+    # The query index is built on first use (Node.document_index)
+    root = nodes[0]
+    root.style_resolver = StyleResolver([strings[s] for s in sheets])
+    return root
+
+
+def load_snapshot(path):
+    codec = SNAPSHOT_CODECS.get(os.path.splitext(path)[1])
+    with open(path, "rb") as f:
+        if codec is not None:
+            try:
+                return deserialize(codec[1](f.read()))
+            except (OSError, EOFError, zlib.error, lzma.LZMAError) as error:
+                raise ValueError(f"corrupt snapshot: {error}") from None
+        mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    return deserialize(mapped)
+
+
+# ----------------- Cached parsing -----------------
+
+def snapshot_path(source_path, data):
+    """Cache file for a source, keyed by a hash of its content, compressed like the source."""
+    digest = hashlib.blake2b(data, digest_size=16).hexdigest()
+    directory = os.path.join(os.path.dirname(os.path.abspath(source_path)), CACHE_DIR_NAME)
+    extension = os.path.splitext(source_path)[1].lower()
+    suffix = ".dom" + (extension if extension in SNAPSHOT_CODECS else "")
+    return os.path.join(directory, f"{os.path.basename(source_path)}.{digest}{suffix}")
+
+
+def parse_html_cached(data, source_path, encoding=None):
+    """
+    Parse raw page bytes, reusing a snapshot of an earlier parse of the
+    same content when one exists and writing one when it doesn't.
+    Snapshots of downloaded pages go to the disk cache (see diskcache.py).
+    encoding: the charset the page came with, if any (see
+    pagesource.detect_encoding).
+    """
+    if is_url(source_path):
+        key = disk_cache.key("dom", SNAPSHOT_VERSION, content_hash(data), encoding)
+        path = disk_cache.lookup(key)
+        if path is not None:
+            try:
+                return load_snapshot(path)
+            except (OSError, ValueError, struct.error):
+                pass
+        root = parse_html(decode_page(data, encoding))
+        disk_cache.put(key, serialize(root))
+        return root
+    path = snapshot_path(source_path, data)
+    try:
+        return load_snapshot(path)
+    except (OSError, ValueError, struct.error):
+        pass
+    root = parse_html(decode_page(data, encoding))
+    save_local_snapshot(root, source_path, path)
+    return root
+
+
+def parse_file_cached(source_path, progress=None):
+    """
+    Like parse_html_cached for a page file, plain or compressed (see
+    pagesource.py). The snapshot is keyed by the file as stored, hashed
+    through mmap for big files; on a miss the page is parsed as it is
+    read. progress(done, total) reports bytes of the file parsed.
+    """
+    with PageFile(source_path) as page:
+        path = snapshot_path(source_path, page.raw)
+        try:
+            return load_snapshot(path)
+        except (OSError, ValueError, struct.error):
+            pass
+        root = parse_file(page, progress=progress)
+    save_local_snapshot(root, source_path, path)
+    return root
+
+
+def save_local_snapshot(root, source_path, path):
+    try:
+        save_snapshot(root, path)
+        remove_stale_snapshots(source_path, keep=path)
+    except OSError:
+        pass  # read-only location: just don't cache
+
+
+def remove_stale_snapshots(source_path, keep):
+    """Delete snapshots of older versions of source_path."""
+    directory = os.path.dirname(keep)
+    prefix = os.path.basename(source_path) + "."
+    suffix = keep[keep.rindex(".dom"):]
+    for name in os.listdir(directory):
+        path = os.path.join(directory, name)
+        # page.txt.<digest>.dom, not page.txt.gz.<digest>.dom.gz
+        if name.startswith(prefix) and name[len(prefix):].partition(".")[2] == suffix[1:] and path != keep:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
@@ -0,0 +1,461 @@
+"""
+style
+
+Description:
+Parses CSS from <style> blocks and style="" attributes and resolves the
+computed style of every DOM node. Rules are bucketed by the id, class and
+tag of their rightmost compound selector, so an element is only tested
+against rules that could match it. Computed styles are cached on the
+nodes and shared between siblings with identical attributes until an
+attribute change invalidates them.
+"""
+import re
+
+# --- Properties ---
+INHERITED = {
+    "color", "font-family", "font-size", "font-weight", "font-style",
+    "line-height", "text-align", "text-decoration",
+}
+
+INITIAL_STYLE = {
+    "display": "inline",
+    "color": (0, 0, 0),
+    "background-color": None,
+    "font-family": "Arial",
+    "font-size": 16,
+    "font-weight": "normal",
+    "font-style": "normal",
+    "line-height": 1.3,
+    "text-align": "left",
+    "text-decoration": "none",
+    "margin-top": 0, "margin-right": 0, "margin-bottom": 0, "margin-left": 0,
+    "padding-top": 0, "padding-right": 0, "padding-bottom": 0, "padding-left": 0,
+    "width": None,
+    "height": None,
+}
+
+# Default (user agent) stylesheet. These are the values that used to be
+# hard-coded in render.draw_node and config.fonts.
+UA_STYLESHEET = """
+html, body, div, p, h1, h2, h3, h4, h5, h6, ul, ol, li, table, hr, form { display: block; }
+head, title, style, script, meta, link { display: none; }
+h1 { font-size: 32px; }
+h2 { font-size: 24px; }
+h3 { font-size: 19px; }
+h4 { font-size: 16px; }
+h5 { font-size: 13px; }
+h6 { font-size: 11px; }
+a { color: #0000ff; text-decoration: underline; }
+b, strong { font-weight: bold; }
+i, em { font-style: italic; }
+u { text-decoration: underline; }
+div { margin-left: 20px; }
+ul, ol { padding-left: 20px; }
+hr { color: #a0a0a0; }
+button { font-size: 14px; }
+"""
+
+COLOR_NAMES = {
+    "black": (0, 0, 0), "white": (255, 255, 255), "red": (255, 0, 0),
+    "green": (0, 128, 0), "lime": (0, 255, 0), "blue": (0, 0, 255),
+    "yellow": (255, 255, 0), "cyan": (0, 255, 255), "aqua": (0, 255, 255),
+    "magenta": (255, 0, 255), "fuchsia": (255, 0, 255), "gray": (128, 128, 128),
+    "grey": (128, 128, 128), "silver": (192, 192, 192), "maroon": (128, 0, 0),
+    "olive": (128, 128, 0), "navy": (0, 0, 128), "purple": (128, 0, 128),
+    "teal": (0, 128, 128), "orange": (255, 165, 0),
+}
+
+FONT_SIZE_KEYWORDS = {
+    "xx-small": 9, "x-small": 10, "small": 13, "medium": 16,
+    "large": 19, "x-large": 24, "xx-large": 32,
+}
+
+BOX_SHORTHANDS = ("margin", "padding")
+
+
+# ----------------- Value parsing -----------------
+
+def parse_color(value):
+    value = value.strip().lower()
+    if value.startswith("#"):
+        if len(value) == 7:
+            return tuple(int(value[i:i+2], 16) for i in (1, 3, 5))
+        if len(value) == 4:
+            return tuple(int(value[i]*2, 16) for i in (1, 2, 3))
+        return None
+    if value.startswith("rgb"):
+        parts = re.findall(r"-?\d+", value)
+        if len(parts) >= 3:
+            return tuple(max(0, min(255, int(p))) for p in parts[:3])
+        return None
+    if value in ("transparent", "none"):
+        return None
+    return COLOR_NAMES.get(value)
+
+
+def parse_length(value, font_size=16):
+    """Convert a CSS length to pixels. Returns None if it can't be parsed."""
+    match = re.match(r"^(-?\d*\.?\d+)(px|em|rem|pt|%)?$", value.strip().lower())
+    if not match:
+        return None
+    number, unit = float(match.group(1)), match.group(2)
+    if unit == "em":
+        number *= font_size
+    elif unit == "rem":
+        number *= INITIAL_STYLE["font-size"]
+    elif unit == "pt":
+        number *= 4 / 3
+    elif unit == "%":
+        number *= font_size / 100
+    return int(round(number))
+
+
+def parse_declarations(text):
+    """Parse "a: b; c: d" into (normal, important) lists of (name, value)."""
+    normal, important = [], []
+    for decl in text.split(";"):
+        if ":" not in decl:
+            continue
+        name, value = decl.split(":", 1)
+        name, value = name.strip().lower(), value.strip()
+        if not name or not value:
+            continue
+        if value.lower().endswith("!important"):
+            important.append((name, value[:-len("!important")].strip()))
+        else:
+            normal.append((name, value))
+    return normal, important
+
+
+# ----------------- Selectors -----------------
+
+_COMPOUND_RE = re.compile(r"(\*|[A-Za-z][\w-]*)?((?:[#.][\w-]+)*)$")
+
+
+def parse_compound(text):
+    """'div#main.note' -> (tag, id, frozenset(classes)), or None if unsupported."""
+    match = _COMPOUND_RE.match(text)
+    if not match or not text:
+        return None
+    tag = match.group(1)
+    tag = None if tag in (None, "*") else tag.lower()
+    id_, classes = None, []
+    for part in re.findall(r"[#.][\w-]+", match.group(2)):
+        if part[0] == "#":
+            id_ = part[1:]
+        else:
+            classes.append(part[1:])
+    return tag, id_, frozenset(classes)
+
+
+def parse_selector(text):
+    """
+    Parse a complex selector into a list of (compound, combinator) pairs
+    ordered right to left. The combinator links a compound to the next
+    one in the list: " " for descendant and ">" for child.
+    Returns None for selectors we can't match (pseudo-classes, siblings...).
+    """
+    text = re.sub(r"\s*>\s*", " > ", text.strip())
+    tokens = text.split()
+    parts, combinator = [], " "
+    for token in reversed(tokens):
+        if token == ">":
+            combinator = ">"
+            continue
+        compound = parse_compound(token)
+        if compound is None:
+            return None
+        if parts:
+            parts[-1] = (parts[-1][0], combinator)
+        parts.append((compound, None))
+        combinator = " "
+    return parts or None
+
+
+def specificity(parts):
+    ids = classes = tags = 0
+    for (tag, id_, class_set), _ in parts:
+        ids += id_ is not None
+        classes += len(class_set)
+        tags += tag is not None
+    return ids, classes, tags
+
+
+def _matches_compound(node, compound):
+    tag, id_, classes = compound
+    if tag is not None and node.tag != tag:
+        return False
+    if id_ is not None and node.attrs.get("id") != id_:
+        return False
+    if classes and not classes <= node.classes:
+        return False
+    return True
+
+
+def matches(node, parts, i=0):
+    """Right-to-left match of a parsed selector against node."""
+    compound, combinator = parts[i]
+    if not _matches_compound(node, compound):
+        return False
+    if i + 1 == len(parts):
+        return True
+    ancestor = node.parent
+    if combinator == ">":
+        return ancestor is not None and matches(ancestor, parts, i + 1)
+    while ancestor is not None:
+        if matches(ancestor, parts, i + 1):
+            return True
+        ancestor = ancestor.parent
+    return False
+
+
+# ----------------- Stylesheets -----------------
+
+def parse_stylesheet(css):
+    """Yield (selector_text, declaration_text) pairs. At-rules are skipped."""
+    css = re.sub(r"/\*.*?\*/", "", css, flags=re.DOTALL)
+    pos, length = 0, len(css)
+    while pos < length:
+        open_brace = css.find("{", pos)
+        if open_brace == -1:
+            break
+        prelude = css[pos:open_brace].strip()
+        # Find the matching close brace (at-rule blocks can nest)
+        depth, end = 1, open_brace + 1
+        while end < length and depth:
+            if css[end] == "{":
+                depth += 1
+            elif css[end] == "}":
+                depth -= 1
+            end += 1
+        body = css[open_brace+1:end-1]
+        pos = end
+        # Drop statement at-rules such as @import that precede the block
+        prelude = re.sub(r"@[^;{]*;", "", prelude).strip()
+        if not prelude or prelude.startswith("@"):
+            continue
+        yield prelude, body
+
+
+class Rule:
+    __slots__ = ("parts", "declarations", "specificity", "origin", "order")
+
+    def __init__(self, parts, declarations, origin, order):
+        self.parts = parts
+        self.declarations = declarations
+        self.specificity = specificity(parts)
+        self.origin = origin
+        self.order = order
+
+
+class StyleResolver:
+    """Holds the rules of one document and computes styles for its nodes."""
+
+    UA_ORIGIN = 0
+    AUTHOR_ORIGIN = 1
+
+    def __init__(self, stylesheets=()):
+        self.by_id = {}
+        self.by_class = {}
+        self.by_tag = {}
+        self.universal = []
+        self.rule_count = 0
+        self.sources = []  # author stylesheets, in order
+        self.add_stylesheet(UA_STYLESHEET, origin=self.UA_ORIGIN)
+        for css in stylesheets:
+            self.add_stylesheet(css)
+
+    def add_stylesheet(self, css, origin=AUTHOR_ORIGIN):
+        if origin == self.AUTHOR_ORIGIN:
+            self.sources.append(css)
+        for selector_text, body in parse_stylesheet(css):
+            normal, important = parse_declarations(body)
+            if not normal and not important:
+                continue
+            for selector in selector_text.split(","):
+                parts = parse_selector(selector)
+                if parts is None:
+                    continue
+                for layer, declarations in ((0, normal), (1, important)):
+                    if declarations:
+                        rule = Rule(parts, declarations, (layer, origin), self.rule_count)
+                        self.rule_count += 1
+                        self._index(rule)
+
+    def _index(self, rule):
+        # Bucket on the most selective key of the rightmost compound
+        tag, id_, classes = rule.parts[0][0]
+        if id_ is not None:
+            self.by_id.setdefault(id_, []).append(rule)
+        elif classes:
+            self.by_class.setdefault(min(classes), []).append(rule)
+        elif tag is not None:
+            self.by_tag.setdefault(tag, []).append(rule)
+        else:
+            self.universal.append(rule)
+
+    def matching_rules(self, node):
+        candidates = []
+        id_ = node.attrs.get("id")
+        if id_ is not None and id_ in self.by_id:
+            candidates.extend(self.by_id[id_])
+        for class_name in node.classes:
+            if class_name in self.by_class:
+                candidates.extend(self.by_class[class_name])
+        if node.tag in self.by_tag:
+            candidates.extend(self.by_tag[node.tag])
+        candidates.extend(self.universal)
+
+        matched = [rule for rule in candidates if matches(node, rule.parts)]
+        matched.sort(key=lambda r: (r.origin, r.specificity, r.order))
+        return matched
+
+    def resolve(self, node):
+        style = node._style
+        if style is not None:
+            return style
+
+        parent = node.parent
+        parent_style = self.resolve(parent) if parent is not None else INITIAL_STYLE
+
+        if node.tag == "text":
+            style = parent_style
+        else:
+            attrs = node.attrs
+            key = (node.tag, attrs.get("id"), attrs.get("class"), attrs.get("style"))
+            share = None
+            if parent is not None:
+                share = parent._style_share
+                if share is None:
+                    share = parent._style_share = {}
+            style = share.get(key) if share is not None else None
+            if style is None:
+                style = self.compute(node, parent_style)
+                if share is not None:
+                    share[key] = style
+        node._style = style
+        return style
+
+    def compute(self, node, parent_style):
+        style = {name: (parent_style[name] if name in INHERITED else value)
+                 for name, value in INITIAL_STYLE.items()}
+
+        normal, important = [], []
+        for rule in self.matching_rules(node):
+            (important if rule.origin[0] else normal).extend(rule.declarations)
+        inline = node.attrs.get("style")
+        if inline:
+            inline_normal, inline_important = parse_declarations(inline)
+            normal.extend(inline_normal)
+            important.extend(inline_important)
+
+        # font-size first so em units in the other properties resolve against it
+        declarations = normal + important
+        for name, value in declarations:
+            if name == "font-size" or name == "font":
+                apply_declaration(style, name, value, parent_style)
+        for name, value in declarations:
+            if name != "font-size" and name != "font":
+                apply_declaration(style, name, value, parent_style)
+        return style
+
+
+def apply_declaration(style, name, value, parent_style):
+    lowered = value.lower()
+    if lowered == "inherit":
+        if name in parent_style:
+            style[name] = parent_style[name]
+        return
+    if lowered == "initial":
+        if name in INITIAL_STYLE:
+            style[name] = INITIAL_STYLE[name]
+        return
+
+    if name in ("color", "background-color", "background"):
+        color = parse_color(value.split()[0]) if value.split() else None
+        if color is not None or lowered in ("transparent", "none"):
+            style["color" if name == "color" else "background-color"] = color
+    elif name == "font-size":
+        if lowered in FONT_SIZE_KEYWORDS:
+            style[name] = FONT_SIZE_KEYWORDS[lowered]
+        else:
+            size = parse_length(value, parent_style["font-size"])
+            if size is not None and size > 0:
+                style[name] = size
+    elif name == "font-family":
+        family = value.split(",")[0].strip().strip("'\"")
+        if family:
+            style[name] = family
+    elif name == "font-weight":
+        if lowered in ("bold", "bolder") or (lowered.isdigit() and int(lowered) >= 600):
+            style[name] = "bold"
+        elif lowered in ("normal", "lighter") or lowered.isdigit():
+            style[name] = "normal"
+    elif name == "font-style":
+        style[name] = "italic" if lowered in ("italic", "oblique") else "normal"
+    elif name == "font":
+        # Only the size and family parts of the shorthand are honored
+        for token in value.split():
+            if token.lower() in ("bold", "italic"):
+                apply_declaration(style, "font-" + ("weight" if token.lower() == "bold" else "style"),
+                                  token, parent_style)
+            elif parse_length(token) is not None:
+                apply_declaration(style, "font-size", token, parent_style)
+                family = value.split(token, 1)[1].strip()
+                if family:
+                    apply_declaration(style, "font-family", family, parent_style)
+                break
+    elif name == "line-height":
+        try:
+            style[name] = float(value)
+        except ValueError:
+            if lowered == "normal":
+                style[name] = INITIAL_STYLE[name]
+            else:
+                height = parse_length(value, style["font-size"])
+                if height is not None:
+                    style[name] = height
+    elif name in BOX_SHORTHANDS:
+        lengths = [parse_length(v, style["font-size"]) for v in value.split()]
+        if not lengths or None in lengths:
+            return
+        if len(lengths) == 1:
+            lengths *= 4
+        elif len(lengths) == 2:
+            lengths *= 2
+        elif len(lengths) == 3:
+            lengths.append(lengths[1])
+        top, right, bottom, left = lengths[:4]
+        style[name + "-top"], style[name + "-right"] = top, right
+        style[name + "-bottom"], style[name + "-left"] = bottom, left
+    elif name in ("width", "height") or name.startswith(BOX_SHORTHANDS):
+        if name in INITIAL_STYLE:
+            length = parse_length(value, style["font-size"])
+            if length is not None:
+                style[name] = length
+            elif lowered == "auto":
+                style[name] = INITIAL_STYLE[name]
+    elif name in ("display", "text-align", "text-decoration"):
+        style[name] = lowered.split()[0]
+
+
+_default_resolver = None
+
+
+def computed_style(node):
+    """Return the (cached) computed style dict for a DOM node."""
+    style = node._style
+    if style is not None:
+        return style
+    root = node.document
+    if root is None:
+        root = node
+        while root.parent is not None:
+            root = root.parent
+    resolver = getattr(root, "style_resolver", None)
+    if resolver is None:
+        global _default_resolver
+        if _default_resolver is None:
+            _default_resolver = StyleResolver()
+        resolver = _default_resolver
+    return resolver.resolve(node)
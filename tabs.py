@@ -0,0 +1,462 @@
+"""
+tabs
+
+Description:
+Multi-tab browsing. Each Tab owns its document, display list, page
+backing surface, widgets and timer scheduler; fonts and parsed SVGs come
+from module-level caches shared by every tab. Only the active tab ticks
+timers and paints. Background tabs that have been idle for a while, or
+that push the total over the memory budget, drop their layout and paint
+state and rebuild it when they are activated again.
+
+Pages can be local files or http:// URLs (see network.py). Files a
+page refers to (SVG images) are read by the shared resource loader (see
+resources.py) for the tab's ResourceGroup, nearest to the viewport
+first, and the requests are cancelled when the tab closes.
+
+Tabs opened with load_in_worker load their page in a worker process (see
+loader.py) and show the part of the page that has arrived, with a
+progress bar, until it is complete.
+
+The active tab watches its page file and the SVG files it shows, and
+patches the document in place when they are edited (see hotreload.py).
+"""
+import os, time
+import pygame
+from dom import Node
+from query import iter_subtree
+from snapshot import parse_html_cached, parse_file_cached
+from pagesource import PageFile, parse_file
+from render import draw_node, place_widget, forget_svg
+from tiles import TileCache
+from loader import PageLoader
+from resources import resources, ResourceGroup
+from network import fetch, is_url, content_charset
+from displaylist import DisplayList, LayoutDamage
+from timers import TimerScheduler
+from hotreload import watcher, patch
+from config import SCREEN_WIDTH, SCREEN_HEIGHT, fonts
+
+BG_COLOR = (255, 255, 255)
+PAGE_TOP = 20  # y of the first line when scrolled to the top
+PRERENDER_DELAY = 0.1  # idle seconds before painting tiles next to the viewport
+PROGRESS_HEIGHT = 4
+PROGRESS_COLOR = (40, 120, 230)
+
+# Rough per-object costs used for memory accounting
+NODE_BYTES = 600
+DISPLAY_ITEM_BYTES = 250
+WIDGET_BYTES = 2000
+
+
+def load_page(file_path):
+    if is_url(file_path):
+        try:
+            response = fetch(file_path)
+        except OSError as error:
+            return page_not_found(file_path, f"Could not load {file_path}: {error}")
+        root = parse_html_cached(response.body, response.url, content_charset(response.headers))
+        root.base_url = response.url
+        return root
+    try:
+        return parse_file_cached(file_path)
+    except FileNotFoundError:
+        return page_not_found(file_path)
+
+
+def page_not_found(file_path, message=None):
+    root = Node("document")
+    root.add_child(Node("p", text=message or f"Page not found: {file_path}"))
+    return root
+
+
+def surface_bytes(surface):
+    return surface.get_width() * surface.get_height() * surface.get_bytesize()
+
+
+def widget_bytes(widget):
+    """Estimated size of a widget, including any surfaces it keeps."""
+    total = WIDGET_BYTES
+    for value in vars(widget).values():
+        if isinstance(value, pygame.Surface):
+            total += surface_bytes(value)
+        elif isinstance(value, list):
+            total += sum(widget_bytes(v) for v in value if hasattr(v, "draw"))
+    return total
+
+
+class Tab:
+    def __init__(self, path, load_in_worker=False):
+        self.path = path
+        self.title = os.path.basename(path.rstrip("/")) or path
+        self.load_in_worker = load_in_worker
+        self.loader = None  # PageLoader while the page is arriving from a worker
+        self.scheduler = TimerScheduler()
+        self.scheduler.paused = True
+        self.resources = ResourceGroup(resources)  # the document's requests, for its whole life
+        self.last_active = time.monotonic()
+        self.watch = None  # hotreload.Watch on the page's files while active
+        self.reload_pending = False  # the page changed while it was loading
+
+        self.dom = None
+        self.node_count = 0
+        self.text_bytes = 0
+
+        # Layout and paint state (can be discarded)
+        self.display_list = None
+        self.tiles = TileCache(background=BG_COLOR)
+        self.page = None
+        self.page_dirty = True
+        self.page_version = 0  # bumped whenever the page surface is repainted (see compositor.py)
+        self.prerender_timer = None
+        self.interactive_elements = []
+        self.widget_rects = []  # (widget, rect in document coordinates)
+        self.layout_dirty = True
+        self.scroll_y = 0
+        self.display_scroll = 0  # scroll_y the page surface shows
+
+    # --- Document ---
+    def load(self):
+        if self.load_in_worker:
+            self.loader = PageLoader(self.path, self.scheduler)
+            self.dom = self.loader.root
+            self.dom.resources = self.resources
+            return
+        self.dom = load_page(self.path)
+        self.dom.scheduler = self.scheduler
+        self.dom.resources = self.resources
+        self.count_nodes()
+        self.layout_dirty = True
+
+    @property
+    def loading(self):
+        return self.loader is not None
+
+    def pump_loader(self):
+        """Take in what the worker has sent so far; finish up once it is all here."""
+        loader = self.loader
+        damage = loader.pump()
+        if self.display_list is not loader.display_list:
+            self.display_list = loader.display_list
+            self.interactive_elements = loader.widgets
+            self.widget_rects = loader.widget_rects
+            self.tiles.set_display_list(self.display_list)
+        # Items only arrive, so a tile costs as much to repaint as to paint
+        # afresh: drop it, and only the ones on screen are painted this frame
+        for rect in damage:
+            self.tiles.discard(rect)
+        if not loader.finished:
+            return
+        self.loader = None
+        # Nodes arrived without Node.insert_child; rebuild the indexes on first use
+        self.dom.index = self.dom._text_index = None
+        if loader.error is not None:
+            self.resources.cancel()
+            self.dom.unload()
+            self.discard()
+            self.dom = page_not_found(self.path, f"Could not load {self.path}: {loader.error}")
+            self.dom.scheduler = self.scheduler
+            self.dom.resources = self.resources
+            self.count_nodes()
+            svg_nodes = None
+        else:
+            # Counted as they arrived: a big page isn't walked again in this frame
+            self.node_count, self.text_bytes = len(loader.nodes), loader.text_bytes
+            svg_nodes = loader.svg_nodes
+        # The worker's layout is complete, with every node's cache filled in
+        self.layout_dirty = self.dom._layout is None
+        if self.watch is not None:
+            self.watch_files(svg_nodes)
+        if self.reload_pending:
+            self.reload_pending = False
+            self.reload()
+
+    def unload(self):
+        """Close the document, releasing its widgets' timers and radio groups."""
+        if self.loader is not None:
+            self.loader.cancel()
+            self.loader = None
+        self.resources.cancel()
+        if self.dom is not None:
+            self.dom.unload()
+        self.discard()
+        self.dom = None
+
+    # --- Hot reload ---
+    def watched_files(self, svg_nodes=None):
+        """
+        The page file and the local SVG files it shows. svg_nodes: the
+        document's svg nodes, when known, instead of searching it.
+        """
+        if is_url(self.path):
+            return []
+        paths = [self.path]
+        if self.dom is not None and self.loader is None:
+            if svg_nodes is None:
+                svg_nodes = (node for node in iter_subtree(self.dom) if node.tag == "svg")
+            for node in svg_nodes:
+                src = node.attrs.get("src")
+                if src and not is_url(src):
+                    paths.append(src)
+        return paths
+
+    def watch_files(self, svg_nodes=None):
+        paths = self.watched_files(svg_nodes)
+        if self.watch is None:
+            self.watch = watcher.watch(paths, self.files_changed)
+        else:
+            self.watch.update(paths)
+
+    def unwatch_files(self):
+        if self.watch is not None:
+            self.watch.cancel()
+            self.watch = None
+
+    def files_changed(self, paths):
+        if os.path.abspath(self.path) in paths:
+            if self.loader is not None:
+                self.reload_pending = True
+            else:
+                self.reload()
+            return
+        for node in iter_subtree(self.dom):
+            src = node.attrs.get("src") if node.tag == "svg" else None
+            if src and os.path.abspath(src) in paths:
+                forget_svg(node)
+
+    def reload(self):
+        """
+        Parse the edited page again and patch the document to match: only
+        the nodes that changed are laid out and painted again.
+        """
+        # Not through the snapshot cache: a page being edited changes every time
+        try:
+            with PageFile(self.path) as page:
+                document = parse_file(page)
+        except FileNotFoundError:
+            document = page_not_found(self.path)
+        patch(self.dom, document)
+        self.count_nodes()
+        self.watch_files()
+
+    def count_nodes(self):
+        self.node_count = self.text_bytes = 0
+        stack = [self.dom]
+        while stack:
+            node = stack.pop()
+            self.node_count += 1
+            self.text_bytes += len(node.text)
+            stack.extend(node.children)
+
+    # --- Activation ---
+    def activate(self):
+        if self.dom is None:
+            self.load()
+        self.scheduler.paused = False
+        self.last_active = time.monotonic()
+        self.watch_files()
+
+    def deactivate(self):
+        """Stop ticking: background tabs neither run timers nor paint."""
+        self.scheduler.paused = True
+        self.last_active = time.monotonic()
+        self.unwatch_files()
+
+    @property
+    def discarded(self):
+        return self.page is None and self.display_list is None
+
+    def discard(self):
+        """Drop layout and paint state. Widget state lives on the DOM nodes and survives."""
+        if self.loader is not None:
+            return  # the layout is still arriving and can't be rebuilt here
+        if self.dom is not None:
+            for node in iter_subtree(self.dom):
+                node._layout = node._stale = None
+        self.display_list = None
+        self.tiles.clear()
+        self.page = None
+        self.interactive_elements = []
+        self.widget_rects = []
+        self.layout_dirty = True
+        self.cancel_prerender()
+
+    # --- Scrolling ---
+    @property
+    def content_height(self):
+        if self.loader is not None:
+            return self.display_list.height + PAGE_TOP if self.display_list is not None else 0
+        layout = self.dom._layout if self.dom is not None else None
+        return layout[3] + 2 * PAGE_TOP if layout is not None else 0
+
+    def scroll_to(self, y):
+        self.scroll_y = max(0, min(int(y), self.content_height - SCREEN_HEIGHT))
+
+    @property
+    def view(self):
+        """The visible part of the page, in document coordinates."""
+        return pygame.Rect(0, self.scroll_y, SCREEN_WIDTH, SCREEN_HEIGHT)
+
+    def scroll_by(self, dy):
+        self.scroll_to(self.scroll_y + dy)
+
+    # --- Painting ---
+    def render(self):
+        """
+        Lay out again if the document changed, then show the viewport.
+        The display list and tiles are in document coordinates, so
+        scrolling is only tile blits plus moving the widgets.
+        """
+        if self.loader is not None:
+            self.pump_loader()
+            self.page_dirty = True  # progress bar
+        # A DOM mutation clears the root's cached layout (Node.mark_dirty)
+        elif self.layout_dirty or self.display_list is None or self.dom._layout is None:
+            self.resources.view = self.view  # load what is on screen first
+            previous = self.display_list
+            display_list = DisplayList()
+            if previous is not None:
+                display_list.damage = LayoutDamage(previous)
+            self.interactive_elements = []
+            draw_node(self.dom, PAGE_TOP, display_list, fonts, self.interactive_elements)
+            self.widget_rects = [(w, w.rect.copy()) for w in self.interactive_elements]
+            damage, display_list.damage = display_list.damage, None
+            if damage is not None:
+                # Only a relayout from scratch needs the full diff
+                damage = damage.rects() if damage.complete else display_list.diff(previous)
+            self.tiles.set_display_list(display_list, damage)
+            self.display_list = display_list
+            self.layout_dirty = False
+            self.page_dirty = True
+
+        if self.page is None:
+            self.page = pygame.Surface((SCREEN_WIDTH, SCREEN_HEIGHT))
+            self.page_dirty = True
+        if self.page_dirty or self.display_scroll != self.scroll_y:
+            self.page.fill(BG_COLOR)
+            self.tiles.compose(self.page, self.view)
+            for widget, rect in self.widget_rects:
+                place_widget(widget, rect.move(0, -self.scroll_y))
+            if self.loader is not None:
+                self.draw_progress(self.page)
+            self.display_scroll = self.scroll_y
+            self.page_dirty = False
+            self.page_version += 1
+            self.schedule_prerender()
+        return self.page
+
+    def draw_progress(self, surface):
+        label, fraction = self.loader.progress
+        width = surface.get_width()
+        if fraction is None:
+            # Unknown length: a block sweeping across
+            x = int(time.monotonic() * width) % (width + 200) - 200
+            pygame.draw.rect(surface, PROGRESS_COLOR, (x, 0, 200, PROGRESS_HEIGHT))
+        else:
+            pygame.draw.rect(surface, PROGRESS_COLOR, (0, 0, int(width * fraction), PROGRESS_HEIGHT))
+        font = fonts["p"]
+        text = f"{label} {self.title}..."
+        rect = font.get_rect(text)
+        box = pygame.Rect(width - rect.width - 20, PROGRESS_HEIGHT + 4, rect.width + 12, rect.height + 10)
+        pygame.draw.rect(surface, (245, 245, 245), box)
+        font.render_to(surface, (box.x + 6, box.y + 5), text, fgcolor=(80, 80, 80))
+
+    def schedule_prerender(self):
+        self.cancel_prerender()
+        if self.tiles.missing_nearby(self.view, self.content_height):
+            self.prerender_timer = self.scheduler.call_later(PRERENDER_DELAY, self.prerender)
+
+    def cancel_prerender(self):
+        if self.prerender_timer is not None:
+            self.prerender_timer.cancel()
+            self.prerender_timer = None
+
+    def prerender(self):
+        """Paint one tile next to the viewport, and come back for the next one."""
+        self.prerender_timer = None
+        missing = self.tiles.missing_nearby(self.view, self.content_height)
+        if missing:
+            self.tiles.tile(missing[0])
+            if len(missing) > 1:
+                self.prerender_timer = self.scheduler.call_later(0, self.prerender)
+
+    # --- Memory accounting ---
+    def memory_usage(self):
+        """Estimated bytes held by this tab, by category."""
+        usage = {
+            "dom": self.node_count * NODE_BYTES + self.text_bytes,
+            "layout": len(self.display_list) * DISPLAY_ITEM_BYTES if self.display_list else 0,
+            "paint": (surface_bytes(self.page) if self.page is not None else 0) + self.tiles.memory_usage,
+            "widgets": sum(widget_bytes(w) for w in self.interactive_elements),
+        }
+        usage["total"] = sum(usage.values())
+        return usage
+
+
+class TabManager:
+    def __init__(self, memory_budget=256 * 1024 * 1024, discard_after=300, load_in_worker=False):
+        """
+        memory_budget: bytes all tabs together should stay under
+        discard_after: seconds a background tab may stay idle before its
+                       layout and paint state are dropped
+        load_in_worker: load pages in a worker process (see loader.py)
+        """
+        self.load_in_worker = load_in_worker
+        self.tabs = []
+        self.active = None
+        self.memory_budget = memory_budget
+        self.discard_after = discard_after
+
+    def open(self, path, activate=True):
+        return self.add(Tab(path, load_in_worker=self.load_in_worker), activate)
+
+    def add(self, tab, activate=True):
+        """Take in a tab built elsewhere (the benchmarks set theirs up by hand)."""
+        self.tabs.append(tab)
+        if activate or self.active is None:
+            self.switch_to(tab)
+        return tab
+
+    def close(self, tab):
+        index = self.tabs.index(tab)
+        self.tabs.remove(tab)
+        tab.deactivate()
+        tab.unload()
+        if tab is self.active:
+            self.active = None
+            if self.tabs:
+                self.switch_to(self.tabs[min(index, len(self.tabs) - 1)])
+
+    def switch_to(self, tab):
+        if tab is self.active:
+            return
+        if self.active is not None:
+            self.active.deactivate()
+        self.active = tab
+        tab.activate()
+        self.enforce_budget()
+
+    def cycle(self, step=1):
+        if self.tabs:
+            index = self.tabs.index(self.active) if self.active in self.tabs else 0
+            self.switch_to(self.tabs[(index + step) % len(self.tabs)])
+
+    # --- Memory ---
+    def memory_usage(self):
+        return sum(tab.memory_usage()["total"] for tab in self.tabs)
+
+    def background_tabs(self):
+        """Background tabs holding layout/paint state, least recently used first."""
+        tabs = [t for t in self.tabs if t is not self.active and not t.discarded]
+        return sorted(tabs, key=lambda t: t.last_active)
+
+    def enforce_budget(self):
+        """Discard idle background tabs, then the least recently used ones until under budget."""
+        now = time.monotonic()
+        for tab in self.background_tabs():
+            if now - tab.last_active >= self.discard_after:
+                tab.discard()
+        for tab in self.background_tabs():
+            if self.memory_usage() <= self.memory_budget:
+                break
+            tab.discard()
@@ -0,0 +1,13 @@
+from diskcache import DiskCache
+
+
+def test_size_counts_each_entry_once(tmp_path):
+    cache = DiskCache(str(tmp_path), max_bytes=1000)
+    cache.put("aa1", b"x" * 100)
+    cache.put("aa2", b"x" * 100)
+    for _ in range(20):  # rewrites, as after a revalidation
+        cache.put("aa1", b"y" * 150)
+    assert cache.size == cache.disk_usage() == 250
+    assert cache.get("aa2") is not None  # nothing was trimmed
+    cache.remove("aa1")
+    assert cache.size == cache.disk_usage() == 100
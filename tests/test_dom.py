@@ -0,0 +1,50 @@
+import dom
+from dom import DocumentParser, parse_html
+
+PAGE = ("<html><head><title>A <b>title</b></title><style>p { color: red; }\n" + "/* padding */\n" * 2000
+        + "div { color: blue; }</STYLE></head><body><p>one</p><div>two <b>three</b></div></body></html>")
+
+
+def tree(node):
+    return (node.tag, node.text, dict(node.attrs), [tree(child) for child in node.children])
+
+
+def parsed_in_chunks(html, size):
+    parser = DocumentParser()
+    for start in range(0, len(html), size):
+        parser.feed(html[start:start + size])
+    return parser.close()
+
+
+def test_the_tree_is_the_same_however_the_text_is_split():
+    whole = parse_html(PAGE)
+    for size in (1, 7, 100, 4096):
+        document = parsed_in_chunks(PAGE, size)
+        assert tree(document) == tree(whole)
+        assert document.style_resolver.sources == whole.style_resolver.sources
+
+
+class Scanned:
+    """A regex that adds up how many characters it was asked to look at."""
+
+    def __init__(self, regex, counts):
+        self.regex, self.pattern, self.counts = regex, regex.pattern, counts
+
+    def finditer(self, html, start, end):
+        self.counts.append(end - start)
+        return self.regex.finditer(html, start, end)
+
+    def search(self, html, start):
+        self.counts.append(len(html) - start)
+        return self.regex.search(html, start)
+
+
+def test_an_unclosed_style_is_not_rescanned_on_every_feed(monkeypatch):
+    counts = []
+    monkeypatch.setattr(dom, "OPEN_BLOCK_REGEX", Scanned(dom.OPEN_BLOCK_REGEX, counts))
+    monkeypatch.setattr(dom, "CLOSE_BLOCK_REGEX", {tag: Scanned(regex, counts)
+                                                   for tag, regex in dom.CLOSE_BLOCK_REGEX.items()})
+    page = "<style>" + "div > p { color: red; }\n" * 2000 + "</style><p>x</p>"
+    document = parsed_in_chunks(page, 64)
+    assert tree(document) == tree(parse_html(page))
+    assert sum(counts) < 4 * len(page)
@@ -0,0 +1,43 @@
+import random
+from dom import parse_html
+from hotreload import patch
+
+TAGS = ("div", "p", "b", "span", "em")
+
+
+def tree(node):
+    return (node.tag, node.text, dict(node.attrs), [tree(child) for child in node.children])
+
+
+def patched(old_html, new_html):
+    document = parse_html(old_html)
+    stats = patch(document, parse_html(new_html))
+    return document, stats
+
+
+def test_an_id_is_not_matched_across_tags():
+    document, stats = patched('<body><b id="z">hi</b></body>', '<body><div id="z">hi</div></body>')
+    assert stats.changed
+    assert tree(document) == tree(parse_html('<body><div id="z">hi</div></body>'))
+
+
+def random_page(rng, depth=0):
+    parts = []
+    for _ in range(rng.randint(1, 4)):
+        if depth < 3 and rng.random() < 0.6:
+            tag = rng.choice(TAGS)
+            attrs = f' id="n{rng.randint(0, 3)}"' if rng.random() < 0.4 else ""
+            if rng.random() < 0.3:
+                attrs += f' class="c{rng.randint(0, 2)}"'
+            parts.append(f"<{tag}{attrs}>{random_page(rng, depth + 1)}</{tag}>")
+        else:
+            parts.append(rng.choice(("alpha", "beta", "gamma", "delta")))
+    return " ".join(parts)
+
+
+def test_patching_gives_the_tree_of_a_fresh_parse():
+    rng = random.Random(46)
+    for _ in range(500):
+        old_html, new_html = (f"<body>{random_page(rng)}</body>" for _ in range(2))
+        document, _ = patched(old_html, new_html)
+        assert tree(document) == tree(parse_html(new_html)), (old_html, new_html)
@@ -0,0 +1,67 @@
+import pygame
+from dom import parse_html
+from tabs import Tab
+
+PAGE = "<html><body>" + "".join(
+    f"<div><div><p>block {i} with a few words</p><div><p>inner {i}</p></div></div></div>" for i in range(40)
+) + "</body></html>"
+
+
+def setup_module():
+    pygame.init()
+    pygame.display.set_mode((800, 600))
+
+
+def open_tab():
+    tab = Tab("page.txt")
+    tab.dom = parse_html(PAGE)
+    tab.render()
+    return tab
+
+
+def layout(tab):
+    return sorted((kind, tuple(bounds), args[2] if kind == "text" else None)
+                  for kind, bounds, args in tab.display_list.items)
+
+
+def edit(tab, node, text):
+    """Change node's text and render; returns the damage and what a full diff finds."""
+    previous = tab.display_list
+    node.set_text(text)
+    damage = []
+    set_display_list = tab.tiles.set_display_list
+
+    def record(display_list, rects=None):
+        damage.extend(rects)
+        set_display_list(display_list, rects)
+    tab.tiles.set_display_list = record
+    tab.render()
+    del tab.tiles.set_display_list
+    changed = [pygame.Rect(key[1]) for key in previous.keys() ^ tab.display_list.keys()]
+    return damage, changed
+
+
+def covered(rect, damage):
+    return sum(rect.clip(d).width * rect.clip(d).height for d in damage) >= rect.width * rect.height
+
+
+def test_damage_covers_every_changed_item():
+    tab = open_tab()
+    inner = tab.dom.get_elements_by_tag_name("p")
+    for node, text in ((inner[21], "short"), (inner[5].children[0], "much longer text " * 12), (inner[40], "")):
+        damage, changed = edit(tab, node, text)
+        assert changed and all(covered(rect, damage) for rect in changed)
+        # Not the whole page: the blocks above the edit didn't change
+        assert min(rect.top for rect in damage) > tab.display_list.bounds.top
+
+
+def test_incremental_layout_matches_a_fresh_one():
+    tab = open_tab()
+    paragraphs = tab.dom.get_elements_by_tag_name("p")
+    for i in (30, 3, 17, 3):
+        paragraphs[i].set_text(f"edited paragraph {i} " * i)
+        tab.render()
+    incremental = layout(tab)
+    tab.discard()
+    tab.render()
+    assert incremental == layout(tab)
@@ -0,0 +1,43 @@
+import gc, os
+import pygame
+from loader import PageLoader
+
+SAMPLES = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "samples")
+DEMO = os.path.join(SAMPLES, "demo_page", "demo.txt")
+
+
+def setup_module():
+    pygame.init()
+    pygame.display.set_mode((800, 600))
+
+
+def load(budget):
+    loader = PageLoader(DEMO)
+    frames = 0
+    while not loader.finished:
+        loader.pump(budget)
+        frames += 1
+    return loader, frames
+
+
+def test_what_doesnt_fit_in_a_frame_waits_for_the_next():
+    threshold = gc.get_threshold()
+    whole, _ = load(budget=10.0)
+    sliced, frames = load(budget=0.0001)
+    assert sliced.error is None and frames > 1
+    assert whole.process.returncode == sliced.process.returncode == 0  # reaped, not left a zombie
+    assert len(sliced.nodes) == len(whole.nodes) == sliced.node_count
+    assert [item[0] for item in sliced.display_list.items] == [item[0] for item in whole.display_list.items]
+    assert len(sliced.widgets) == len(whole.widgets)
+    assert ([node._layout is None for node in sliced.nodes]
+            == [node._layout is None for node in whole.nodes])
+    assert gc.get_threshold() == threshold  # full collections run again
+
+
+def test_cancel_lets_full_collections_run_again():
+    threshold = gc.get_threshold()
+    loader = PageLoader(DEMO)
+    assert gc.get_threshold() != threshold
+    loader.cancel()
+    loader.cancel()
+    assert gc.get_threshold() == threshold
@@ -0,0 +1,67 @@
+import gzip, threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+import pytest
+from network import fetch, HTTPError, ConnectionPool, ResponseCache
+
+BODY = gzip.compress(b"<svg></svg>" * 100)
+
+
+class TruncatedGzip(BaseHTTPRequestHandler):
+    """Serves half of a gzip body, declared as complete."""
+
+    def do_GET(self):
+        body = BODY[:len(BODY) // 2]
+        self.send_response(200)
+        self.send_header("Content-Encoding", "gzip")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class BadAge(TruncatedGzip):
+    """Serves a cacheable body with an Age that isn't a number."""
+
+    def do_GET(self):
+        self.send_response(200)
+        self.send_header("Cache-Control", "max-age=60")
+        self.send_header("Age", "abc")
+        self.send_header("Content-Length", "11")
+        self.end_headers()
+        self.wfile.write(b"<svg></svg>")
+
+
+def serve(handler):
+    httpd = HTTPServer(("127.0.0.1", 0), handler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{httpd.server_port}"
+    httpd.shutdown()
+    httpd.server_close()
+
+
+@pytest.fixture
+def server():
+    yield from serve(TruncatedGzip)
+
+
+@pytest.fixture
+def bad_age_server():
+    yield from serve(BadAge)
+
+
+def test_truncated_gzip_body_raises_http_error(server):
+    cache = ResponseCache()
+    with pytest.raises(HTTPError):
+        fetch(server + "/image.svg", pool=ConnectionPool(), cache=cache)
+    assert cache.get(server + "/image.svg") is None
+
+
+def test_bad_age_header_is_revalidated_not_an_error(bad_age_server):
+    cache = ResponseCache()
+    response = fetch(bad_age_server + "/image.svg", pool=ConnectionPool(), cache=cache)
+    assert response.body == b"<svg></svg>"
+    entry = cache.get(bad_age_server + "/image.svg")
+    assert entry is not None and not entry.fresh
@@ -0,0 +1,54 @@
+import random
+import pytest
+from dom import parse_html
+from query import iter_subtree
+from style import parse_selector, matches
+
+PAGE = ('<body><div id="a" class="box"><p>x</p>hello<span class="note">y <b>z</b></span></div>'
+        '<div class="box"><p id="b">w</p>tail</div></body>')
+
+
+def brute_force(document, selector):
+    parts = parse_selector(selector)
+    return [node for node in iter_subtree(document)
+            if node is not document and node.tag != "text" and matches(node, parts)]
+
+
+@pytest.mark.parametrize("selector", ["div > *", "#a > *", "#a *", "* > p", ".box > *", "#a > span > *"])
+def test_universal_selectors_match_elements_only(selector):
+    document = parse_html(PAGE)
+    found = document.query_selector_all(selector)
+    assert found and all(node.tag != "text" for node in found)
+    assert found == brute_force(document, selector)
+
+
+def test_queries_agree_with_matching_every_element():
+    rng = random.Random(33)
+    tags, ids, classes = ("div", "p", "span", "b"), ("a", "b", "c"), ("x", "y")
+
+    def compound():
+        text = rng.choice(tags + ("*",))
+        if rng.random() < 0.3:
+            text += "#" + rng.choice(ids)
+        if rng.random() < 0.3:
+            text += "." + rng.choice(classes)
+        return text
+
+    def page(depth=0):
+        parts = []
+        for _ in range(rng.randint(1, 3)):
+            if depth < 4 and rng.random() < 0.7:
+                tag = rng.choice(tags)
+                attrs = f' id="{rng.choice(ids)}"' if rng.random() < 0.2 else ""
+                attrs += f' class="{rng.choice(classes)}"' if rng.random() < 0.4 else ""
+                parts.append(f"<{tag}{attrs}>{page(depth + 1)}</{tag}>")
+            else:
+                parts.append("text")
+        return "".join(parts)
+
+    for _ in range(200):
+        document = parse_html(f"<body>{page()}</body>")
+        selector = compound()
+        for _ in range(rng.randint(0, 2)):
+            selector = compound() + rng.choice((" ", " > ")) + selector
+        assert document.query_selector_all(selector) == brute_force(document, selector), selector
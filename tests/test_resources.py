@@ -0,0 +1,15 @@
+import resources
+from resources import ResourceLoader
+
+
+def test_unexpected_read_error_is_delivered(monkeypatch):
+    def fetch(path):
+        raise ValueError("bad Content-Length")
+    monkeypatch.setattr(resources, "fetch", fetch)
+    loader = ResourceLoader(max_concurrency=1)
+    results = []
+    for _ in range(2):  # the worker must survive the first failure
+        loader.request("http://example.invalid/image.svg", results.append)
+        assert loader.wait_idle(timeout=5)
+    assert [type(resource.error) for resource in results] == [ValueError, ValueError]
+    assert loader.pending == 0
@@ -0,0 +1,30 @@
+import bz2, os
+from dom import parse_html
+from snapshot import parse_file_cached, snapshot_path
+
+PAGE = "<html><body>" + "<p>the same paragraph, over and over</p>" * 20000 + "</body></html>"
+
+
+def tree(node):
+    return (node.tag, node.text, dict(node.attrs), [tree(child) for child in node.children])
+
+
+def test_compressed_pages_get_compressed_snapshots(tmp_path):
+    source = tmp_path / "page.txt.bz2"
+    source.write_bytes(bz2.compress(PAGE.encode("utf-8")))
+    first = parse_file_cached(str(source))
+    path = snapshot_path(str(source), source.read_bytes())
+    assert path.endswith(".dom.bz2") and os.path.exists(path)
+    assert os.path.getsize(path) < 100 * os.path.getsize(source) < len(PAGE)
+    assert tree(parse_file_cached(str(source))) == tree(first) == tree(parse_html(PAGE))
+
+
+def test_a_plain_page_keeps_the_snapshot_of_its_compressed_copy(tmp_path):
+    (tmp_path / "page.txt.bz2").write_bytes(bz2.compress(PAGE.encode("utf-8")))
+    (tmp_path / "page.txt").write_text("<p>plain</p>")
+    parse_file_cached(str(tmp_path / "page.txt.bz2"))
+    parse_file_cached(str(tmp_path / "page.txt"))
+    names = os.listdir(tmp_path / ".sequoia_cache")
+    assert len(names) == 2
+    assert any(name.startswith("page.txt.bz2.") and name.endswith(".dom.bz2") for name in names)
+    assert any(name.count(".") == 3 and name.endswith(".dom") for name in names)
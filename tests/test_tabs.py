@@ -0,0 +1,25 @@
+import os
+import pygame
+import render
+from resources import resources
+from tabs import TabManager
+
+SAMPLES = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "samples")
+
+
+def setup_module():
+    pygame.init()
+    pygame.display.set_mode((800, 600))
+
+
+def test_closing_a_tab_drops_its_pending_loads(monkeypatch):
+    delivered = []
+    monkeypatch.setattr(render, "svg_loaded", lambda node, *args: delivered.append(node))
+    tabs = TabManager()
+    tab = tabs.open(os.path.join(SAMPLES, "image_loading", "images.txt"))
+    tab.render()  # lays out the <svg>s, which ask for their files
+    assert tab.resources.requests
+    tabs.open(os.path.join(SAMPLES, "demo_page", "demo.txt"))  # tab goes to the background first
+    tabs.close(tab)
+    assert resources.wait_idle(timeout=5)
+    assert delivered == []
@@ -0,0 +1,39 @@
+import random
+from dom import parse_html
+from textindex import FindSession, TextIndex
+
+
+def typed(index, query):
+    """Matches after typing query one character at a time."""
+    session = FindSession(index)
+    for size in range(1, len(query) + 1):
+        session.search(query[:size])
+    return [chunk.locate(pos) for chunk, pos in session.matches]
+
+
+def fresh(index, query):
+    return [chunk.locate(pos) for chunk, pos in index.find_all(query)[0]]
+
+
+def test_typing_a_query_that_overlaps_itself():
+    index = TextIndex(parse_html("<body><p>aaab</p></body>"))
+    assert len(fresh(index, "aab")) == 1
+    assert typed(index, "aab") == fresh(index, "aab")
+
+
+def test_typing_finds_what_a_fresh_search_finds():
+    rng = random.Random(35)
+    for _ in range(300):
+        words = ["".join(rng.choice("abA") for _ in range(rng.randint(1, 6))) for _ in range(rng.randint(1, 8))]
+        index = TextIndex(parse_html("<body>" + "".join(f"<p>{word}</p>" for word in words) + "</body>"))
+        query = "".join(rng.choice("ab") for _ in range(rng.randint(1, 4)))
+        assert typed(index, query) == fresh(index, query), (words, query)
+
+
+def test_typing_after_an_edit_searches_again():
+    document = parse_html("<body><p>abc</p><p>xyz</p></body>")
+    session = FindSession(document.text_index())
+    session.search("a")
+    document.get_elements_by_tag_name("p")[1].children[0].set_text("abd")
+    session.search("ab")
+    assert len(session.matches) == 2
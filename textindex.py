@@ -0,0 +1,274 @@
+"""
+textindex
+
+Description:
+Flattened text of a document for find-in-page. The text is kept as runs:
+one per piece of text that layout wraps as a unit (a text node, or a list
+item whose text nodes are joined). Runs are grouped in document order
+into chunks; each chunk concatenates its runs into one string with
+offsets back to the runs, so a search is a plain str.find per chunk.
+DOM mutations only mark the affected chunks stale, and a chunk's string
+is rebuilt the next time it is searched.
+"""
+import re
+from bisect import bisect_right
+
+TEXT_TAGS = ("h1", "h2", "h3", "h4", "h5", "h6", "p", "a", "text")
+LIST_TAGS = ("ul", "ol")
+CHUNK_RUNS = 512          # runs per chunk; chunks split at twice this
+MAX_MATCHES = 10000       # stop counting after this many matches
+
+
+# --- Runs ---
+def is_list_item(node):
+    return node.tag == "li" and node.parent is not None and node.parent.tag in LIST_TAGS
+
+
+def is_run(node):
+    if node.tag == "text":
+        return not (node.parent is not None and is_list_item(node.parent))
+    return is_list_item(node) or (node.tag in TEXT_TAGS and bool(node.text))
+
+
+def run_text(node):
+    """The text layout wraps for a run, as drawn (see render.layout_node)."""
+    if is_list_item(node):
+        return " ".join(c.text.strip() for c in node.children if c.tag == "text")
+    return node.text.strip() if node.text else ""
+
+
+def run_of(node):
+    """The run containing node's text, or None."""
+    if node.tag == "text" and node.parent is not None and is_list_item(node.parent):
+        return node.parent
+    return node if is_run(node) else None
+
+
+def iter_runs(root):
+    stack = [root]
+    while stack:
+        node = stack.pop()
+        if is_run(node):
+            yield node
+            if node.tag == "li":
+                continue
+        stack.extend(reversed(node.children))
+
+
+def last_run(node):
+    """Last run in node's subtree in document order."""
+    if node.tag != "li" or not is_list_item(node):
+        for child in reversed(node.children):
+            run = last_run(child)
+            if run is not None:
+                return run
+    return node if is_run(node) else None
+
+
+# --- Index ---
+class Chunk:
+    __slots__ = ("runs", "text", "folded", "starts")
+
+    def __init__(self, runs):
+        self.runs = runs
+        self.text = None    # None while stale
+        self.folded = None
+        self.starts = None
+
+    def build(self):
+        if self.text is None:
+            texts = [run_text(run) for run in self.runs]
+            starts, offset = [], 0
+            for text in texts:
+                starts.append(offset)
+                offset += len(text) + 1
+            self.text = "\n".join(texts)
+            self.starts = starts
+            # lower() keeps offsets valid unless some character changes length
+            folded = self.text.lower()
+            self.folded = folded if len(folded) == len(self.text) else None
+        return self
+
+    def locate(self, offset):
+        """(run, offset within the run) for an offset into the chunk text."""
+        i = bisect_right(self.starts, offset) - 1
+        return self.runs[i], offset - self.starts[i]
+
+
+class TextIndex:
+    def __init__(self, document):
+        self.chunks = []
+        self.chunk_of = {}   # run -> Chunk
+        self.version = 0     # bumped on every change, so searches know to rerun
+        runs = list(iter_runs(document))
+        for i in range(0, len(runs), CHUNK_RUNS):
+            self._add_chunk(len(self.chunks), runs[i:i + CHUNK_RUNS])
+
+    def _add_chunk(self, position, runs):
+        chunk = Chunk(runs)
+        self.chunks.insert(position, chunk)
+        for run in runs:
+            self.chunk_of[run] = chunk
+        return chunk
+
+    def __len__(self):
+        return sum(len(chunk.build().text) for chunk in self.chunks)
+
+    # --- Maintenance (called from dom.Node) ---
+    def text_changed(self, node):
+        run = run_of(node)
+        chunk = self.chunk_of.get(run)
+        if chunk is not None:
+            chunk.text = None
+            self.version += 1
+
+    def insert_subtree(self, root):
+        if root.parent is not None and is_list_item(root.parent):
+            self.text_changed(root.parent)  # text added to a list item's run
+            return
+        runs = list(iter_runs(root))
+        if not runs:
+            return
+        previous = self.previous_run(root)
+        if previous is not None:
+            chunk = self.chunk_of[previous]
+            position = chunk.runs.index(previous) + 1
+        elif self.chunks:
+            chunk, position = self.chunks[0], 0
+        else:
+            chunk, position = self._add_chunk(0, []), 0
+        chunk.runs[position:position] = runs
+        for run in runs:
+            self.chunk_of[run] = chunk
+        chunk.text = None
+        if len(chunk.runs) > 2 * CHUNK_RUNS:
+            self._split(chunk)
+        self.version += 1
+
+    def remove_subtree(self, root):
+        if root.parent is not None and is_list_item(root.parent):
+            self.text_changed(root.parent)
+            return
+        for run in iter_runs(root):
+            chunk = self.chunk_of.pop(run, None)
+            if chunk is not None:
+                chunk.runs.remove(run)
+                chunk.text = None
+        self.chunks = [chunk for chunk in self.chunks if chunk.runs]
+        self.version += 1
+
+    def previous_run(self, node):
+        """Closest run before node in document order, or None."""
+        while node.parent is not None:
+            parent = node.parent
+            siblings = parent.children
+            for sibling in reversed(siblings[:siblings.index(node)]):
+                run = last_run(sibling)
+                if run is not None and run in self.chunk_of:
+                    return run
+            if parent in self.chunk_of:
+                return parent
+            node = parent
+        return None
+
+    def _split(self, chunk):
+        position = self.chunks.index(chunk)
+        runs = chunk.runs
+        del self.chunks[position]
+        for i in range(0, len(runs), CHUNK_RUNS):
+            self._add_chunk(position, runs[i:i + CHUNK_RUNS])
+            position += 1
+
+    # --- Search ---
+    def find_all(self, query, limit=MAX_MATCHES):
+        """
+        Case-insensitive, non-overlapping matches of query as (chunk,
+        offset) pairs in document order, and whether the search stopped
+        at limit. Chunk.locate maps a match back to its run.
+        """
+        matches = []
+        if not query:
+            return matches, False
+        needle = query.lower()
+        pattern = re.compile(re.escape(query), re.IGNORECASE)
+        for chunk in self.chunks:
+            chunk.build()
+            if chunk.folded is not None:
+                find = chunk.folded.find
+                pos = find(needle)
+                while pos != -1:
+                    matches.append((chunk, pos))
+                    if len(matches) >= limit:
+                        return matches, True
+                    pos = find(needle, pos + len(needle))
+            else:
+                for match in pattern.finditer(chunk.text):
+                    matches.append((chunk, match.start()))
+                    if len(matches) >= limit:
+                        return matches, True
+        return matches, False
+
+    def refine(self, matches, query):
+        """Keep the matches that still match after query was extended."""
+        needle = query.lower()
+        size = len(needle)
+        kept, last_chunk, last_end = [], None, 0
+        for chunk, pos in matches:
+            if chunk is last_chunk and pos < last_end:
+                continue  # would overlap the previous match
+            if chunk.text[pos:pos + size].lower() == needle:
+                kept.append((chunk, pos))
+                last_chunk, last_end = chunk, pos + size
+        return kept
+
+
+def overlaps_itself(text):
+    """Whether two occurrences of text can overlap: a proper prefix is also a suffix."""
+    return any(text.endswith(text[:size]) for size in range(1, len(text)))
+
+
+class FindSession:
+    """Incremental search state: the query as typed so far and its matches."""
+
+    def __init__(self, index):
+        self.index = index
+        self.query = ""
+        self.matches = []
+        self.truncated = False
+        self.current = -1
+        self.version = index.version
+
+    def search(self, query):
+        index = self.index
+        previous = self.query
+        # Typing more characters can only narrow the matches, so filter the
+        # previous result instead of scanning the document again. Only when
+        # the previous query can't overlap itself: "aa" in "aaab" is found
+        # at 0 but not at 1, where "aab" starts
+        if (previous and query.startswith(previous) and not self.truncated
+                and self.version == index.version and not overlaps_itself(previous.lower())):
+            self.matches = index.refine(self.matches, query)
+        else:
+            self.matches, self.truncated = index.find_all(query)
+        self.query = query
+        self.version = index.version
+        self.current = 0 if self.matches else -1
+        return self.matches
+
+    def refresh(self):
+        """Rerun the search if the document changed since the last one."""
+        if self.version != self.index.version:
+            self.query, query = "", self.query
+            self.search(query)
+
+    def step(self, direction=1):
+        if self.matches:
+            self.current = (self.current + direction) % len(self.matches)
+        return self.current_match()
+
+    def current_match(self):
+        """(run, start) of the selected match, or None."""
+        if self.current < 0:
+            return None
+        chunk, pos = self.matches[self.current]
+        return chunk.locate(pos)
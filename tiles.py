@@ -0,0 +1,127 @@
+"""
+tiles
+
+Description:
+Tiled backing store for a page. The display list is painted into
+fixed-size offscreen tiles in document coordinates, kept in an LRU cache
+with a memory cap. Showing the viewport at any scroll offset is a few
+tile blits; tiles are only repainted where the display list changed, and
+tiles just outside the viewport can be painted ahead of time while the
+browser is idle.
+"""
+from collections import OrderedDict
+import pygame
+
+TILE_SIZE = 512
+TILE_CACHE_BYTES = 48 * 1024 * 1024
+PRERENDER_MARGIN = 1  # rows of tiles above and below the viewport painted when idle
+
+
+class TileCache:
+    def __init__(self, tile_size=TILE_SIZE, max_bytes=TILE_CACHE_BYTES, background=(255, 255, 255)):
+        self.tile_size = tile_size
+        self.max_bytes = max_bytes
+        self.background = background
+        self.display_list = None
+        self.tiles = OrderedDict()  # (col, row) -> Surface, least recently used first
+        self.tile_bytes = tile_size * tile_size * 4
+        self.painted = 0  # tiles painted so far (for profiling)
+
+    def __len__(self):
+        return len(self.tiles)
+
+    @property
+    def memory_usage(self):
+        return sum(t.get_width() * t.get_height() * t.get_bytesize() for t in self.tiles.values())
+
+    # --- Content ---
+    def set_display_list(self, display_list, damage=None):
+        """
+        Switch to a new display list. damage: document rects that changed
+        since the previous list (None repaints everything lazily).
+        """
+        self.display_list = display_list
+        if damage is None:
+            self.tiles.clear()
+            return
+        for rect in damage:
+            self.invalidate(rect)
+
+    def invalidate(self, rect):
+        """Repaint the part of every cached tile that overlaps rect."""
+        size = self.tile_size
+        for key in self.keys_for(rect):
+            tile = self.tiles.get(key)
+            if tile is None:
+                continue
+            origin = (key[0] * size, key[1] * size)
+            local = pygame.Rect(rect).move(-origin[0], -origin[1]).clip(tile.get_rect())
+            tile.fill(self.background, local)
+            self.display_list.replay(tile, clip=local.move(origin), origin=origin)
+
+    def discard(self, rect):
+        """Drop the cached tiles that overlap rect; they are painted again when needed."""
+        for key in self.keys_for(rect):
+            self.tiles.pop(key, None)
+
+    def clear(self):
+        self.tiles.clear()
+
+    # --- Tiles ---
+    def keys_for(self, rect):
+        rect = pygame.Rect(rect)
+        size = self.tile_size
+        if rect.width <= 0 or rect.height <= 0:
+            return []
+        return [(col, row)
+                for row in range(rect.top // size, (rect.bottom - 1) // size + 1)
+                for col in range(rect.left // size, (rect.right - 1) // size + 1)]
+
+    def tile(self, key):
+        """The tile for key, painting it if it isn't cached."""
+        tile = self.tiles.get(key)
+        if tile is not None:
+            self.tiles.move_to_end(key)
+            return tile
+        tile = self.paint(key)
+        self.tiles[key] = tile
+        self.evict()
+        return tile
+
+    def paint(self, key):
+        size = self.tile_size
+        # Reuse the surface of the least recently used tile if the cache is full
+        if self.tiles and (len(self.tiles) + 1) * self.tile_bytes > self.max_bytes:
+            _, tile = self.tiles.popitem(last=False)
+        else:
+            tile = pygame.Surface((size, size))
+        tile.fill(self.background)
+        if self.display_list is not None:
+            self.display_list.replay(tile, origin=(key[0] * size, key[1] * size))
+        self.painted += 1
+        return tile
+
+    def evict(self):
+        while len(self.tiles) > 1 and len(self.tiles) * self.tile_bytes > self.max_bytes:
+            self.tiles.popitem(last=False)
+
+    # --- Drawing ---
+    def compose(self, target, view):
+        """Blit the tiles covering view (a document rect) onto target."""
+        view = pygame.Rect(view)
+        size = self.tile_size
+        for key in self.keys_for(view):
+            target.blit(self.tile(key), (key[0] * size - view.x, key[1] * size - view.y))
+
+    def missing_nearby(self, view, height):
+        """Uncached tiles within PRERENDER_MARGIN rows of view, nearest first."""
+        view = pygame.Rect(view)
+        margin = PRERENDER_MARGIN * self.tile_size
+        keys = []
+        below = pygame.Rect(view.x, view.bottom, view.width, min(margin, max(0, height - view.bottom)))
+        above = pygame.Rect(view.x, max(0, view.top - margin), view.width, view.top - max(0, view.top - margin))
+        for region in (below, above):
+            keys.extend(key for key in self.keys_for(region) if key not in self.tiles)
+        # Never prerender more than fits next to the visible tiles
+        room = self.max_bytes // self.tile_bytes - len(self.keys_for(view))
+        return keys[:max(0, room)]
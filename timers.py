@@ -0,0 +1,87 @@
+"""
+timers
+
+Description:
+Shared timer scheduler for widget animations (cursor blink, button flash)
+and key auto-repeat. Timers live in a heap ordered by deadline, so the
+per-frame cost depends on the number of timers that are due, not on the
+number of widgets on the page. The main loop sleeps until the next
+deadline.
+"""
+import heapq, itertools, time
+
+
+class Timer:
+    """Handle returned by TimerScheduler.call_later. Call cancel() to stop it."""
+    __slots__ = ("deadline", "callback", "interval", "cancelled")
+
+    def __init__(self, deadline, callback, interval=None):
+        self.deadline = deadline
+        self.callback = callback
+        self.interval = interval
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+
+class TimerScheduler:
+    def __init__(self, clock=time.monotonic):
+        self.clock = clock
+        self.heap = []
+        self.counter = itertools.count()  # tie-breaker for equal deadlines
+        self.paused = False
+
+    def call_later(self, delay, callback, interval=None):
+        """
+        Run callback after delay seconds. If interval is given the timer
+        keeps firing every interval seconds until it is cancelled.
+        """
+        timer = Timer(self.clock() + delay, callback, interval)
+        heapq.heappush(self.heap, (timer.deadline, next(self.counter), timer))
+        return timer
+
+    def call_every(self, interval, callback):
+        return self.call_later(interval, callback, interval)
+
+    def _drop_cancelled(self):
+        while self.heap and self.heap[0][2].cancelled:
+            heapq.heappop(self.heap)
+
+    def time_until_next(self):
+        """Seconds until the next timer is due, or None if there are no timers."""
+        if self.paused:
+            return None
+        self._drop_cancelled()
+        if not self.heap:
+            return None
+        return max(0.0, self.heap[0][0] - self.clock())
+
+    def run_due(self):
+        """Fire every timer whose deadline has passed. Returns how many fired."""
+        if self.paused:
+            return 0
+        now = self.clock()
+        fired = 0
+        while self.heap and self.heap[0][0] <= now:
+            _, _, timer = heapq.heappop(self.heap)
+            if timer.cancelled:
+                continue
+            if timer.interval is not None:
+                # Reschedule from the old deadline so repeats don't drift,
+                # but don't try to catch up on missed ticks
+                timer.deadline += timer.interval
+                if timer.deadline <= now:
+                    timer.deadline = now + timer.interval
+                heapq.heappush(self.heap, (timer.deadline, next(self.counter), timer))
+            else:
+                timer.cancelled = True
+            timer.callback()
+            fired += 1
+        return fired
+
+    def __len__(self):
+        return sum(1 for _, _, timer in self.heap if not timer.cancelled)
+
+
+scheduler = TimerScheduler()
@@ -0,0 +1,55 @@
+"""
+widgetpool
+
+Description:
+Free lists of widgets, one per widget class, so the widgets of a page
+that is closed or hot reloaded (and the surfaces they hold) are handed
+to the next page laid out instead of being dropped and built again. A
+ColorPicker, for one, allocates two surfaces and paints its hue slider
+when it is built; a recycled picker of the same size already has both.
+
+render.py gets widgets with acquire(cls, *args), which builds one only
+when no free widget of that class is left. Documents give theirs back
+with release() when they are closed or hot reload removes their nodes
+(see Node.unload). A class can be pooled if it has reset(*args): it
+takes the constructor's arguments and leaves the widget as if freshly
+built.
+
+Tables are not pooled: display lists record them by identity (see
+displaylist.diff), so a reused table would hide its changed rows.
+"""
+MAX_FREE = 64  # free widgets kept per class
+
+
+class WidgetPool:
+    def __init__(self, max_free=MAX_FREE):
+        self.max_free = max_free
+        self.free = {}  # class -> [widget]
+        self.created = self.reused = 0  # for profiling
+
+    def acquire(self, cls, *args, **kwargs):
+        """A cls widget built from args: a free one reset, or a new one."""
+        free = self.free.get(cls)
+        if free:
+            widget = free.pop()
+            widget.reset(*args, **kwargs)
+            self.reused += 1
+            return widget
+        self.created += 1
+        return cls(*args, **kwargs)
+
+    def release(self, widget):
+        """Keep widget for a later acquire(). Its old owner must not use it again."""
+        cls = type(widget)
+        if not hasattr(cls, "reset"):
+            return
+        free = self.free.setdefault(cls, [])
+        if len(free) < self.max_free and not any(other is widget for other in free):
+            free.append(widget)
+
+    def clear(self):
+        self.free.clear()
+
+
+# Shared by every tab
+widget_pool = WidgetPool()
@@ -0,0 +1,149 @@
+"""
+window
+
+Description:
+One frame of the browser window: fire due timers, take in loaded
+resources and edited files, lay out the active tab, hand the frame's
+input to the tab shortcuts, the find bar and the widgets, and composite
+what changed onto the screen. main.py runs a frame whenever there is
+input or something was invalidated; the benchmarks (see
+benchmarks/replay.py) run the very same frames, so what they time is
+what the browser does.
+"""
+import pygame
+import timers
+from FindBar import FindBar
+from resources import resources
+from hotreload import watcher
+from compositor import Compositor
+from config import fonts
+
+SCROLL_STEP = 60  # pixels per mouse wheel notch
+PHASES = ("timers", "resources", "layout", "events", "composite")  # parts of a frame, in order
+
+
+def ignore(phase):
+    pass
+
+
+class Window:
+    def __init__(self, screen, tabs):
+        self.screen = screen
+        self.tabs = tabs
+        self.compositor = Compositor()
+        self.find_bar = None  # open Ctrl+F bar, bound to the tab it was opened in
+        self.carried = []     # input for the next frame: what came after a tab switch
+        self.running = True
+
+    def frame(self, events, phases=None, prepare=None):
+        """
+        Run one frame with the input that arrived since the last one.
+        Returns True when another frame is wanted right away (a page is
+        still arriving, resources were delivered, input was left over).
+        phases.end(name) is called as each of PHASES ends, and
+        prepare(event) before each event is handled (see replay.py).
+        """
+        end = phases.end if phases is not None else ignore
+        events, self.carried = self.carried + events, []
+        needs_frame = False
+        tabs = self.tabs
+        tab = tabs.active
+
+        # Fire due timers (cursor blink, key repeat, button flash). Background tabs are paused.
+        timers.scheduler.run_due()
+        tab.scheduler.run_due()
+        end("timers")
+        # Files that finished loading (SVG images mark their nodes for layout)
+        resources.deliver()
+        if resources.ready:
+            needs_frame = True
+        # Edited page files are patched into the document (see hotreload.py)
+        watcher.deliver()
+        end("resources")
+
+        find_bar = self.find_bar
+        if find_bar is not None and (find_bar.closed or find_bar.tab is not tab):
+            find_bar.close()
+            find_bar = self.find_bar = None
+        # Re-record paint commands only when layout or style changed
+        page = tab.render()
+        interactive_elements = tab.interactive_elements
+        if tab.loading:
+            needs_frame = True  # keep taking in the page as it arrives
+        end("layout")
+
+        for event in events:
+            if prepare is not None:
+                prepare(event)
+            if event.type == pygame.QUIT:
+                self.running = False
+            if event.type in (pygame.VIDEOEXPOSE, pygame.WINDOWEXPOSED):
+                self.compositor.invalidate()
+
+            if self.handle_tab_shortcut(event):
+                if not tabs.tabs:
+                    self.running = False
+                    return False
+                # The rest of the batch belongs to the new tab's frame
+                self.carried = events[events.index(event) + 1:]
+                needs_frame = True
+                break
+
+            # Find in page gets the keyboard while it is open; scrolling and
+            # jumping to a match show up on the next frame
+            if event.type == pygame.KEYDOWN and event.key == pygame.K_f and event.mod & pygame.KMOD_CTRL:
+                if find_bar is None and not tab.loading:
+                    find_bar = self.find_bar = FindBar(tab)
+                needs_frame = True
+                continue
+            if find_bar is not None and find_bar.handle_event(event):
+                needs_frame = True
+                continue
+            if event.type == pygame.MOUSEWHEEL:
+                tab.scroll_by(-event.y * SCROLL_STEP)
+                needs_frame = True
+                continue
+
+            for elem in interactive_elements:
+                if hasattr(elem, "handle_event"):
+                    elem.handle_event(event)
+                if hasattr(elem, "check_click") and event.type == pygame.MOUSEBUTTONDOWN:
+                    elem.check_click(event.pos)
+        end("events")
+
+        # Composite the page and the widgets that changed on it
+        screen = self.screen
+        damage = self.compositor.compose(screen, page, tab.page_version, interactive_elements,
+                                         fonts.get("p", None), overlay=find_bar is not None)
+        if find_bar is not None:
+            if find_bar.sync():  # picks up key-repeat edits and DOM changes
+                needs_frame = True
+            find_bar.draw_highlights(screen, tab.display_list, tab.display_scroll)
+            find_bar.draw(screen, fonts.get("p", None))
+        self.update_caption()
+        pygame.display.update(damage)
+        end("composite")
+        return needs_frame
+
+    def handle_tab_shortcut(self, event):
+        """Ctrl+Tab / Ctrl+Shift+Tab cycle tabs, Ctrl+1..9 select one, Ctrl+W closes. Returns True if consumed."""
+        if event.type != pygame.KEYDOWN or not event.mod & pygame.KMOD_CTRL:
+            return False
+        tabs = self.tabs
+        if event.key == pygame.K_TAB:
+            tabs.cycle(-1 if event.mod & pygame.KMOD_SHIFT else 1)
+        elif pygame.K_1 <= event.key <= pygame.K_9:
+            index = event.key - pygame.K_1
+            if index < len(tabs.tabs):
+                tabs.switch_to(tabs.tabs[index])
+        elif event.key == pygame.K_w:
+            tabs.close(tabs.active)
+        else:
+            return False
+        return True
+
+    def update_caption(self):
+        tabs = self.tabs
+        if tabs.active is not None:
+            index = tabs.tabs.index(tabs.active) + 1
+            pygame.display.set_caption(f"Sequoia - [{index}/{len(tabs.tabs)}] {tabs.active.title}")